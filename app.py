@@ -1,26 +1,24 @@
 import streamlit as st
-from langchain_google_genai import ChatGoogleGenerativeAI
-import google.generativeai as genai
-from langchain_core.prompts import PromptTemplate
-from langchain.chains import RetrievalQA
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_pinecone import PineconeVectorStore
-from langchain_community.vectorstores import FAISS
 from datetime import datetime
 from fpdf import FPDF
 import io
+import time
+import functools
 import textwrap
-from typing import Literal
 from components.email_ui import show_email_ui
 
 # Import authentication modules
 from auth.authenticator import FirebaseAuthenticator
 from auth.chat_history import ChatHistoryManager
-from auth.ui import auth_page, user_sidebar, chat_history_sidebar, sync_chat_message, load_user_preferences, save_user_preferences
+from auth.ui import auth_page, user_sidebar, chat_history_sidebar, sync_chat_message, get_chat_session_id, load_user_preferences, save_user_preferences
 
 # Import email service
 from services.email_service import EmailService
 
+# Import the shared RAG engine
+from rag.engine import get_engine
+from rag.emergency import EMERGENCY_CONTACTS, match_emergency
+
 # Emergency authority email mapping
 EMERGENCY_AUTHORITIES = {
     "Flood": "flood.authority@example.com",
@@ -30,33 +28,11 @@ EMERGENCY_AUTHORITIES = {
     "General": "general.emergency@example.com"
 }
 
-# Emergency phrases for detection
-EMERGENCY_PHRASES = [
-    "help me", "emergency", "danger", "trapped", "injured", "bleeding", 
-    "fire", "flood now", "earthquake", "urgent", "hurt", "dying",
-    "need help", "sos", "save", "critical", "life threatening",
-    "i need help", "help", "accident", "stuck","evacuate",
-    "rescue", "medical emergency", "ambulance", "police", "danger",
-    "in trouble", "stranded", "drowning", "collapsed", "explosion"
-]
-
-# Emergency contact information
-EMERGENCY_CONTACTS = {
-    "English": {
-        "rescue_team": "1736 or +92 335 5557362",
-        "emergency": "15 or 1122",
-        "local_authorities": "+92 335 5557362"
-    },
-    "Urdu": {
-        "rescue_team": "1736 یا +92 335 5557362",
-        "emergency": "15 یا 1122",
-        "local_authorities": "+92 335 5557362"
-    },
-    "Sindhi": {
-        "rescue_team": "1736 يا +92 335 5557362",
-        "emergency": "15 يا 1122",
-        "local_authorities": "+92 335 5557362"
-    }
+# Shown when detailed emergency guidance misses its deadline
+ENRICHMENT_TIMEOUT_NOTES = {
+    "English": "_Detailed guidance is taking longer than expected. Follow the steps above and call the emergency numbers now._",
+    "Urdu": "_تفصیلی ہدایات میں توقع سے زیادہ وقت لگ رہا ہے۔ اوپر دیے گئے اقدامات پر عمل کریں اور فوراً ایمرجنسی نمبر پر کال کریں۔_",
+    "Sindhi": "_تفصيلي هدايتن ۾ توقع کان وڌيڪ وقت لڳي رهيو آهي. مٿي ڏنل قدمن تي عمل ڪريو ۽ هينئر ئي ايمرجنسي نمبر تي ڪال ڪريو._"
 }
 
 # Initialize session state for chat history and language preferences
@@ -67,14 +43,6 @@ if "input_language" not in st.session_state:
 if "output_language" not in st.session_state:
     st.session_state.output_language = "English"
 
-def get_language_prompt(output_lang: Literal["English", "Sindhi", "Urdu"]) -> str:
-    """Get the language-specific prompt instruction."""
-    if output_lang == "Sindhi":
-        return """سنڌي ۾ جواب ڏيو. مهرباني ڪري صاف ۽ سادي سنڌي استعمال ڪريو، اردو لفظن کان پاسو ڪريو. جواب تفصيلي ۽ سمجهه ۾ اچڻ جوڳو هجڻ گهرجي."""
-    elif output_lang == "Urdu":
-        return """اردو میں جواب دیں۔ براہ کرم واضح اور سادہ اردو استعمال کریں۔ جواب تفصیلی اور سمجھنے کے قابل ہونا چاہیے۔"""
-    return "Respond in English using clear and professional language."
-
 def create_chat_pdf():
     """Generate a PDF file of chat history with proper formatting."""
     try:
@@ -216,53 +184,28 @@ def get_general_response(query):
         else:
             return "I'm specialized in disaster management topics. While I can't help with general topics, I'd be happy to answer any questions about disaster management, emergency procedures, or safety protocols."
 
-def get_rag_response(qa_chain, query):
-    """
-    Get a response from the RAG system for a domain-specific query.
-    
-    Args:
-        qa_chain: The initialized QA chain
-        query: User's question
-        
-    Returns:
-        str: Generated response
-    """
-    try:
-        # Add language-specific instructions based on output language
-        lang_instruction = get_language_prompt(st.session_state.output_language)
-        
-        # Get response from RAG system
-        response = qa_chain({"query": f"{query}\n\n{lang_instruction}"})
-        return response['result']
-    except Exception as e:
-        st.error(f"Error generating RAG response: {str(e)}")
-        return f"I'm sorry, I couldn't generate a response. Error: {str(e)}"
-
-def get_response_type(query):
+def get_response_type(query, match=None):
     """
     Determine the type of response needed based on the query content.
     
     Args:
         query: User's question or statement
+        match: ``match_emergency(query)`` result, if already computed
         
     Returns:
         str: Response type - "emergency", "greeting", or "information"
     """
     query_lower = query.lower().strip()
+    match = match or match_emergency(query)
     
-    # Simple emergency detection for very short messages like "help"
-    if query_lower in ["help", "sos", "emergency", "help me", "i need help"]:
-        return "emergency"
-    
-    # Check if it's an emergency situation with more complex phrases
-    if any(phrase in query_lower for phrase in EMERGENCY_PHRASES):
+    # Emergency phrases in English, Urdu, Sindhi or Roman Urdu
+    if match.is_emergency:
         return "emergency"
     
-    # Check for specific emergency keywords at the beginning of sentences
+    # Reports such as "there is a flood" or "I am in trouble"
     emergency_starters = ["i am in", "i'm in", "there is a", "there's a", "we have a"]
     if any(query_lower.startswith(starter) for starter in emergency_starters):
-        emergency_contexts = ["trouble", "danger", "emergency", "disaster", "flood", "fire", "earthquake"]
-        if any(context in query_lower for context in emergency_contexts):
+        if match.has_context:
             return "emergency"
     
     # Check if it's a general greeting
@@ -273,28 +216,19 @@ def get_response_type(query):
     else:
         return "information"
 
-def get_emergency_response(query, qa_chain):
+def get_emergency_prefix(output_lang):
     """
-    Generate a response for emergency situations with prioritized action steps.
+    Build the localized emergency action steps and contact numbers.
     
     Args:
-        query: User's emergency question/statement
-        qa_chain: The initialized QA chain
+        output_lang: Output language selected by the user
         
     Returns:
-        str: Prioritized emergency response
+        str: Emergency-focused response prefix
     """
-    output_lang = st.session_state.output_language
-    
     # Get the appropriate contact information based on language
     contacts = EMERGENCY_CONTACTS.get(output_lang, EMERGENCY_CONTACTS["English"])
     
-    # First, get relevant information from the RAG system
-    try:
-        rag_response = get_rag_response(qa_chain, query)
-    except Exception as e:
-        rag_response = "I couldn't retrieve specific information for your emergency."
-    
     # Create emergency-focused prefix based on language
     if output_lang == "Sindhi":
         prefix = f"""🚨 **ايمرجنسي جواب**
@@ -333,104 +267,63 @@ IMMEDIATE ACTIONS:
 
 """
     
-    # Extract the most actionable information from the RAG response
-    # and create a concise, action-oriented response
-    return prefix + rag_response
+    return prefix
 
-def initialize_rag():
-    try:
-        # API Keys from secrets
-        PINECONE_API_KEY = st.secrets["PINECONE_API_KEY"]
-        GOOGLE_API_KEY = st.secrets["GOOGLE_API_KEY"]
+def stream_rag_response(engine, query, placeholder, prefix="", response_type="information", tokens=None):
+    """
+    Stream a RAG response into a placeholder as tokens arrive.
+    
+    Args:
+        engine: The shared RAG engine
+        query: User's question
+        placeholder: Streamlit placeholder to render into
+        prefix: Text shown before the generated answer
+        response_type: Response type used to pick the answer cache TTL
+        tokens: Already started token stream (streams from the engine if None)
         
-        if not GOOGLE_API_KEY or not PINECONE_API_KEY:
-            st.error("Please set up API keys in Streamlit Cloud secrets")
-            st.stop()
-            
-        genai.configure(api_key=GOOGLE_API_KEY)
-
-        # Initialize Pinecone
-        from pinecone import Pinecone
-        pc = Pinecone(api_key=PINECONE_API_KEY)
-
-        # Initialize embeddings
-        try:
-            embeddings = HuggingFaceEmbeddings(
-                model_name='all-MiniLM-L6-v2',
-                model_kwargs={'device': 'cpu'},
-                encode_kwargs={
-                    'normalize_embeddings': True,
-                    'batch_size': 32
-                }
-            )
-        except Exception as e:
-            st.error(f"Error initializing embeddings: {str(e)}")
-            st.stop()
-
-        # Initialize vector store
-        index_name = "pdfinfo"
-        vectorstore = PineconeVectorStore(
-            index=pc.Index(index_name),
-            embedding=embeddings,
-            text_key="text"
-        )
-
-        # Create Gemini LLM
-        llm = ChatGoogleGenerativeAI(
-            model="gemini-2.0-flash-exp",
-            temperature=0.1,
-            google_api_key=GOOGLE_API_KEY,
-            max_retries=3,
-            timeout=30,
-            max_output_tokens=2048
-        )
-
-        # Create the QA chain with improved prompt
-        qa_chain = RetrievalQA.from_chain_type(
-            llm=llm,
-            chain_type="stuff",
-            retriever=vectorstore.as_retriever(search_kwargs={"k": 6}),
-            return_source_documents=False,
-            chain_type_kwargs={
-                "prompt": PromptTemplate(
-                    template=f"""You are a knowledgeable disaster management assistant focused on providing timely, actionable help. {get_language_prompt(st.session_state.output_language)}
-
-Use the following guidelines to answer questions:
-
-1. If the context contains relevant information:
-   - Start with the most urgent and actionable information first
-   - Provide clear, step-by-step instructions when applicable
-   - Use concise language and bullet points for critical information
-   - Prioritize life-saving actions over general information
-   - Include specific details and procedures from the source
-
-2. If the context does NOT contain sufficient information:
-   - Start with general safety advice relevant to the situation
-   - Be honest about not having specific details
-   - Provide actionable steps based on common disaster management principles
-   - Suggest contacting local emergency services when appropriate
-   - Never make up specific numbers or procedures
-
-3. For all responses:
-   - Keep information organized and easy to scan quickly
-   - Use clear headings and short paragraphs
-   - Emphasize the most critical information
-   - Be reassuring but realistic
-   - Focus on immediate needs first, then recovery information
-
-Context: {{context}}
-
-Question: {{question}}
-
-Response (remember to be concise, action-oriented, and helpful):""",
-                    input_variables=["context", "question"],
-                )
-            }
-        )
-        return qa_chain, llm
+    Returns:
+        str: The complete response as rendered
+    """
+    response = prefix
+    if prefix:
+        placeholder.markdown(response + "▌")
+    if tokens is None:
+        tokens = engine.stream_answer(query, st.session_state.output_language, response_type)
+    started = time.perf_counter()
+    st.session_state.last_ttft = None
+    try:
+        for token in tokens:
+            if st.session_state.last_ttft is None:
+                # Time-to-first-token as seen by this session
+                st.session_state.last_ttft = time.perf_counter() - started
+            response += token
+            placeholder.markdown(response + "▌")
+    except TimeoutError:
+        # Enrichment missed its deadline; keep what is already shown
+        output_lang = st.session_state.output_language
+        response += ENRICHMENT_TIMEOUT_NOTES.get(output_lang, ENRICHMENT_TIMEOUT_NOTES["English"])
     except Exception as e:
-        st.error(f"Error initializing RAG system: {str(e)}")
+        st.error(f"Error generating RAG response: {str(e)}")
+        response += f"I'm sorry, I couldn't generate a response. Error: {str(e)}"
+    
+    placeholder.markdown(response)
+    return response
+
+def initialize_rag():
+    """
+    Get the process-wide RAG engine.
+
+    The engine is built once per server process and shared by every
+    session and rerun; configuration changes trigger a hot reload.
+
+    Returns:
+        RAGEngine: The shared engine
+    """
+    engine = get_engine()
+    if not engine.is_ready():
+        st.error(f"Error initializing RAG system: {engine.last_error}")
         st.stop()
+    return engine
 
 def main():
     # Page config
@@ -728,7 +621,7 @@ def main():
         """, unsafe_allow_html=True)
 
     # Initialize RAG system
-    qa_chain, llm = initialize_rag()
+    engine = initialize_rag()
 
     # Sidebar with clean layout
     with st.sidebar:
@@ -842,18 +735,14 @@ def main():
     # Create a dedicated container for the email UI
     email_ui_container = st.container()
 
-    # Check if the last message might be an emergency
+    # Check if the user's last message might be an emergency
     is_emergency = False
-    if st.session_state.messages and len(st.session_state.messages) > 0:
-        last_message = st.session_state.messages[-1]
-        if last_message["role"] == "user":
-            is_emergency = any(phrase in last_message["content"].lower() for phrase in EMERGENCY_PHRASES)
-        elif last_message["role"] == "assistant" and len(st.session_state.messages) > 1:
-            # Check the user's last message too
-            user_messages = [m for m in st.session_state.messages if m["role"] == "user"]
-            if user_messages:
-                last_user_message = user_messages[-1]
-                is_emergency = any(phrase in last_user_message["content"].lower() for phrase in EMERGENCY_PHRASES)
+    emergency_type = "General"
+    user_messages = [m for m in st.session_state.messages if m["role"] == "user"]
+    if user_messages:
+        last_match = match_emergency(user_messages[-1]["content"])
+        is_emergency = last_match.is_emergency
+        emergency_type = last_match.emergency_type
 
     # Show email sharing UI in the dedicated container
     with email_ui_container:
@@ -861,43 +750,77 @@ def main():
             user_email = user.get('email', 'Anonymous')
         else:
             user_email = "Anonymous"
-        show_email_ui(st.session_state.messages, user_email, is_emergency)
+        show_email_ui(st.session_state.messages, user_email, is_emergency, emergency_type)
 
     # Chat input
     if prompt := st.chat_input("Ask Your Questions Here..."):
         st.session_state.messages.append({"role": "user", "content": prompt})
         
-        if is_authenticated:
-            metadata = {
-                'language': st.session_state.input_language,
-                'timestamp': datetime.now().isoformat()
-            }
-            sync_chat_message(user_id, "user", prompt, metadata)
-        
         with st.chat_message("user"):
             st.markdown(prompt)
         
+        prompt_match = match_emergency(prompt)
+        response_type = get_response_type(prompt, prompt_match)
+        
         with st.chat_message("assistant"):
             message_placeholder = st.empty()
+            playbook = None
             
-            # Show thinking animation
-            message_placeholder.markdown("""
-            <div class="thinking-container">
-                <div class="thinking-spinner"></div>
-                <span class="thinking-text">Thinking...</span>
-            </div>
-            """, unsafe_allow_html=True)
+            if response_type == "emergency":
+                # Show the offline action steps and contacts before any network I/O
+                prefix = get_emergency_prefix(st.session_state.output_language)
+                playbook = engine.playbooks.get(prompt_match.emergency_type, st.session_state.output_language)
+                if playbook:
+                    # Vetted offline playbook, no RAG call needed
+                    message_placeholder.markdown(prefix + playbook)
+                else:
+                    message_placeholder.markdown(prefix)
+            else:
+                # Show thinking animation
+                message_placeholder.markdown("""
+                <div class="thinking-container">
+                    <div class="thinking-spinner"></div>
+                    <span class="thinking-text">Thinking...</span>
+                </div>
+                """, unsafe_allow_html=True)
+            
+            # Start retrieval and generation before anything else
+            tokens = None
+            if response_type == "information" or (response_type == "emergency" and not playbook):
+                tokens = engine.start_turn(
+                    prompt,
+                    st.session_state.output_language,
+                    response_type,
+                    first_token_timeout=engine.config["emergency_enrichment_timeout"] if response_type == "emergency" else None,
+                    user_id=user_id
+                )
+            
+            # Messages are written on the engine's event loop, so resolve the
+            # chat session here while session state is available (cached
+            # after the first message of a chat; the lookup overlaps generation)
+            user_persisted = None
+            session_id = None
+            if is_authenticated:
+                session_id = get_chat_session_id(user_id)
+                metadata = {
+                    'language': st.session_state.input_language,
+                    'timestamp': datetime.now().isoformat()
+                }
+                user_persisted = engine.persist_in_background(
+                    functools.partial(sync_chat_message, user_id, "user", prompt, metadata, session_id)
+                )
             
             try:
-                response_type = get_response_type(prompt)
-                if response_type == "emergency":
-                    response = get_emergency_response(prompt, qa_chain)
+                if response_type == "emergency" and playbook:
+                    response = prefix + playbook
+                elif response_type == "emergency":
+                    response = stream_rag_response(engine, prompt, message_placeholder, prefix, response_type, tokens)
                 elif response_type == "greeting":
                     response = get_general_response(prompt)
+                    message_placeholder.markdown(response)
                 else:
-                    response = get_rag_response(qa_chain, prompt)
+                    response = stream_rag_response(engine, prompt, message_placeholder, tokens=tokens)
                 
-                message_placeholder.markdown(response)
                 st.session_state.messages.append({"role": "assistant", "content": response})
                 
                 if is_authenticated:
@@ -906,7 +829,16 @@ def main():
                         'timestamp': datetime.now().isoformat(),
                         'type': response_type
                     }
-                    sync_chat_message(user_id, "assistant", response, metadata)
+                    if response_type == "emergency":
+                        metadata['emergency_type'] = prompt_match.emergency_type
+                        metadata['source'] = 'playbook' if playbook else 'rag'
+                    if response_type != "greeting" and not playbook and st.session_state.get('last_ttft') is not None:
+                        metadata['ttft'] = round(st.session_state.last_ttft, 3)
+                    # Written after the user message, off the critical path
+                    engine.persist_in_background(
+                        functools.partial(sync_chat_message, user_id, "assistant", response, metadata, session_id),
+                        after=user_persisted
+                    )
                 
                 # Force Streamlit to rerun to refresh the UI and show the email sharing component
                 st.rerun()
@@ -2,12 +2,15 @@
 Chat history management module.
 Handles storing, retrieving, and managing user chat histories in Firebase.
 """
+import logging
 import streamlit as st
 from typing import List, Dict, Optional
 from datetime import datetime
 from firebase_admin import firestore
 from .firebase_config import get_firestore_db
 
+logger = logging.getLogger(__name__)
+
 class ChatHistoryManager:
     """
     Manages chat history storage and retrieval from Firebase Firestore.
@@ -20,7 +23,8 @@ class ChatHistoryManager:
         """Initialize the chat history manager with Firestore database."""
         self.db = get_firestore_db()
     
-    def save_message(self, user_id: str, role: str, content: str, metadata: Optional[Dict] = None) -> bool:
+    def save_message(self, user_id: str, role: str, content: str, metadata: Optional[Dict] = None,
+                     session_id: Optional[str] = None) -> bool:
         """
         Save a chat message to Firestore.
         
@@ -29,6 +33,8 @@ class ChatHistoryManager:
             role: Message role ('user' or 'assistant')
             content: Message content
             metadata: Additional message metadata (language, etc.)
+            session_id: Optional session ID (uses current session if None).
+                Pass it explicitly when saving from a background thread.
             
         Returns:
             bool: Success status
@@ -38,7 +44,8 @@ class ChatHistoryManager:
             
         try:
             # Get or create a chat session
-            session_id = self._get_current_session_id(user_id)
+            if not session_id:
+                session_id = self.get_current_session_id(user_id)
             
             # Create message document
             message_data = {
@@ -54,8 +61,10 @@ class ChatHistoryManager:
                 .collection('messages').add(message_data)
                 
             return True
-        except Exception as e:
-            st.error(f"Error saving message: {str(e)}")
+        except Exception:
+            # Usually called from the engine's event loop, outside any
+            # Streamlit script, so st.error would have nowhere to render
+            logger.exception("Error saving message for user %s", user_id)
             return False
     
     def get_session_history(self, user_id: str, session_id: Optional[str] = None) -> List[Dict]:
@@ -75,7 +84,7 @@ class ChatHistoryManager:
         try:
             # Get session ID (current or specified)
             if not session_id:
-                session_id = self._get_current_session_id(user_id)
+                session_id = self.get_current_session_id(user_id)
             
             # Query messages
             messages_ref = self.db.collection('users').document(user_id) \
@@ -187,7 +196,7 @@ class ChatHistoryManager:
                 .collection('chat_sessions').document(session_id).delete()
                 
             # If this was the current session, create a new one
-            if self._get_current_session_id(user_id) == session_id:
+            if self.get_current_session_id(user_id) == session_id:
                 self.create_new_session(user_id)
                 
             return True
@@ -224,9 +233,12 @@ class ChatHistoryManager:
             st.error(f"Error updating session title: {str(e)}")
             return False
     
-    def _get_current_session_id(self, user_id: str) -> str:
+    def get_current_session_id(self, user_id: str) -> str:
         """
         Get the current session ID or create a new one.
+
+        The ID is kept in ``st.session_state``, so Firestore is only asked
+        once per chat. Call it on the script thread.
         
         Args:
             user_id: The user's ID
@@ -406,7 +406,8 @@ def chat_history_sidebar(user_id: str, on_session_change: Callable = None) -> No
                                     st.session_state.current_session_id = None
                                 st.rerun()
 
-def sync_chat_message(user_id: str, role: str, content: str, metadata: Optional[Dict] = None) -> None:
+def sync_chat_message(user_id: str, role: str, content: str, metadata: Optional[Dict] = None,
+                      session_id: Optional[str] = None) -> None:
     """
     Sync a chat message with Firebase.
     
@@ -417,12 +418,34 @@ def sync_chat_message(user_id: str, role: str, content: str, metadata: Optional[
         role: Message role ('user' or 'assistant')
         content: Message content
         metadata: Additional message metadata
+        session_id: Optional chat session ID. Resolve it with
+            get_chat_session_id() on the script thread when syncing from
+            a background thread, which has no access to session state.
     """
     if not user_id:
         return
         
     history_manager = ChatHistoryManager()
-    history_manager.save_message(user_id, role, content, metadata)
+    history_manager.save_message(user_id, role, content, metadata, session_id)
+
+def get_chat_session_id(user_id: str) -> str:
+    """
+    Get the current chat session ID, creating a session if needed.
+
+    Firestore is only queried for the first message of a chat; the ID is
+    then cached in session state.
+    
+    Args:
+        user_id: User ID
+        
+    Returns:
+        str: Current chat session ID
+    """
+    if not user_id:
+        return ""
+    
+    history_manager = ChatHistoryManager()
+    return history_manager.get_current_session_id(user_id)
 
 def load_user_preferences(user: Dict) -> Dict:
     """
@@ -50,12 +50,12 @@ def main():
         # Import only the necessary functions from app.py
         app_module = importlib.import_module('app')
         initialize_rag = getattr(app_module, 'initialize_rag')
-        get_rag_response = getattr(app_module, 'get_rag_response')
+        stream_rag_response = getattr(app_module, 'stream_rag_response')
         is_general_chat = getattr(app_module, 'is_general_chat')
         get_general_response = getattr(app_module, 'get_general_response')
         
         # Initialize RAG system
-        qa_chain = initialize_rag()
+        engine = initialize_rag()
         
         # Display chat messages
         for message in st.session_state.messages:
@@ -86,12 +86,10 @@ def main():
                     # Check if it's a general chat query
                     if is_general_chat(prompt):
                         response = get_general_response(prompt)
+                        message_placeholder.markdown(response)
                     else:
-                        # Use RAG for domain-specific questions
-                        response = get_rag_response(qa_chain, prompt)
-                    
-                    # Display response
-                    message_placeholder.markdown(response)
+                        # Stream the RAG answer for domain-specific questions
+                        response = stream_rag_response(engine, prompt, message_placeholder)
                     
                     # Add assistant response to chat history
                     st.session_state.messages.append({"role": "assistant", "content": response})
@@ -4,7 +4,7 @@ import time
 from services.email_service import EmailService
 from components.location_picker import show_location_picker
 
-def show_email_ui(messages, user_email="Anonymous", is_emergency=False):
+def show_email_ui(messages, user_email="Anonymous", is_emergency=False, emergency_type="General"):
     """
     Display the email sharing interface.
     
@@ -12,6 +12,7 @@ def show_email_ui(messages, user_email="Anonymous", is_emergency=False):
         messages: Chat history messages
         user_email: User's email address
         is_emergency: Whether this is an emergency situation (auto-expands UI)
+        emergency_type: Emergency type detected in the user's last message
     """
     # Only show after some conversation
     if len(messages) < 2:
@@ -280,18 +281,10 @@ def show_email_ui(messages, user_email="Anonymous", is_emergency=False):
             elif current_language == "Sindhi":
                 select_label = "ايمرجنسي جو قسم چونڊيو"
                 
-            # Auto-select emergency type if we can detect it from the messages
+            # Auto-select the emergency type detected in the messages
             default_index = 0
-            if is_emergency:
-                last_message = messages[-1]["content"].lower() if messages else ""
-                if "flood" in last_message or "water" in last_message:
-                    default_index = display_options.index(emergency_labels["Flood"])
-                elif "earthquake" in last_message:
-                    default_index = display_options.index(emergency_labels["Earthquake"])
-                elif "fire" in last_message:
-                    default_index = display_options.index(emergency_labels["Fire"])
-                elif "medical" in last_message or "hurt" in last_message or "injured" in last_message:
-                    default_index = display_options.index(emergency_labels["Medical"])
+            if is_emergency and emergency_type in emergency_types and emergency_type != "General":
+                default_index = display_options.index(emergency_labels[emergency_type])
             
             selected_index = st.selectbox(
                 select_label,
@@ -0,0 +1,53 @@
+"""
+Retrieval augmented generation (RAG) engine package.
+
+Exports are imported on first use, so importing one module (admission,
+rate limiting, phrase matching...) does not load the LLM, vector store
+and embedding clients of the others.
+"""
+from importlib import import_module
+
+# Exported name -> module that defines it
+_EXPORTS = {
+    'RAGEngine': '.engine',
+    'get_engine': '.engine',
+    'reload_engine': '.engine',
+    'ChainRegistry': '.chains',
+    'QAPipeline': '.pipeline',
+    'CachedEmbeddings': '.embeddings',
+    'BatchingEmbeddings': '.embedding_service',
+    'OnnxEmbeddings': '.onnx_embeddings',
+    'SemanticCache': '.semantic_cache',
+    'SingleFlight': '.singleflight',
+    'AdmissionController': '.admission',
+    'AdmissionRejected': '.admission',
+    'TokenBucketLimiter': '.rate_limit',
+    'RateLimited': '.rate_limit',
+    'ResilientLLM': '.resilience',
+    'CircuitBreaker': '.resilience',
+    'LLMUnavailable': '.resilience',
+    'FakeLLM': '.resilience',
+    'EMERGENCY_TYPES': '.emergency',
+    'classify_emergency_type': '.emergency',
+    'classify_disaster_type': '.emergency',
+    'match_emergency': '.emergency',
+    'PlaybookStore': '.playbooks',
+    'load_rag_config': '.config',
+    'get_setting': '.config',
+    'get_language_prompt': '.prompts',
+    'build_qa_prompt': '.prompts',
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    """Import an exported name from its module on first access."""
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
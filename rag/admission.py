@@ -0,0 +1,290 @@
+"""
+Admission control for LLM work.
+
+Limits how many generations run against Gemini at once and queues the
+rest by priority: emergencies first, then information requests, then
+greetings. Within a priority, users are served round-robin so one user
+sending many questions cannot starve the others. A request that waits
+longer than its queue deadline, or arrives at a full queue, is rejected
+so the caller can serve a degraded answer instead of hanging.
+
+When a rate-limit budget is attached and it falls below the reserve,
+only emergencies are started; other requests stay queued (and are
+re-checked as the budget refills) until their deadline passes.
+
+Everything here runs on the engine's event loop, so no locking is needed.
+"""
+import time
+import asyncio
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Optional
+
+from .metrics import LatencyTracker
+
+# Lower value = served first
+PRIORITIES = {"emergency": 0, "information": 1, "greeting": 2}
+
+# Seconds between budget re-checks while work is deferred
+BUDGET_RECHECK_INTERVAL = 0.5
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted in time."""
+
+    def __init__(self, reason: str):
+        super().__init__(f"LLM request not admitted: {reason}")
+        self.reason = reason
+
+class _Waiter:
+    """A queued request."""
+
+    def __init__(self, priority: int, user: str):
+        self.priority = priority
+        self.user = user
+        self.granted = False
+        self.rejected: Optional[str] = None
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+class AdmissionController:
+    """
+    Bounded, prioritized and per-user fair queue in front of the LLM.
+    """
+
+    def __init__(self, max_concurrency: int = 4, max_queue: int = 32,
+                 queue_timeouts: Optional[Dict[str, float]] = None, default_timeout: float = 15,
+                 budget: Optional[Callable[[], float]] = None, reserve: float = 0.0):
+        """
+        Initialize the controller.
+
+        Args:
+            max_concurrency: Generations allowed to run at once
+            max_queue: Requests allowed to wait
+            queue_timeouts: Maximum queue wait per response type
+            default_timeout: Maximum queue wait of other response types
+            budget: Callable returning the remaining rate-limit budget as a
+                fraction (None disables budget checks)
+            reserve: Budget fraction kept for emergencies
+        """
+        self.configure(max_concurrency, max_queue, queue_timeouts, default_timeout, budget, reserve)
+        self.active = 0
+        self.deferred = 0
+        self._recheck: Optional[asyncio.TimerHandle] = None
+        # priority -> user -> waiters, users in round-robin order
+        self._queues: Dict[int, "OrderedDict[str, Deque[_Waiter]]"] = {
+            priority: OrderedDict() for priority in sorted(set(PRIORITIES.values()))
+        }
+        # Waiters per priority, kept as counters so stats() is safe to
+        # call from other threads
+        self._queued_by_priority = {priority: 0 for priority in self._queues}
+        self.admitted = 0
+        self.rejected = {"queue_full": 0, "deadline": 0, "shed": 0}
+        self.queue_wait = LatencyTracker()
+
+    def configure(self, max_concurrency: int, max_queue: int,
+                  queue_timeouts: Optional[Dict[str, float]] = None, default_timeout: float = 15,
+                  budget: Optional[Callable[[], float]] = None, reserve: float = 0.0) -> None:
+        """
+        Update the limits, e.g. after a configuration reload.
+
+        Args:
+            max_concurrency: Generations allowed to run at once
+            max_queue: Requests allowed to wait
+            queue_timeouts: Maximum queue wait per response type
+            default_timeout: Maximum queue wait of other response types
+            budget: Callable returning the remaining rate-limit budget as a
+                fraction (None disables budget checks)
+            reserve: Budget fraction kept for emergencies
+        """
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeouts = queue_timeouts or {}
+        self.default_timeout = default_timeout
+        self.budget = budget
+        self.reserve = reserve
+
+    @property
+    def queued(self) -> int:
+        """Number of waiting requests."""
+        return sum(self._queued_by_priority.values())
+
+    @staticmethod
+    def priority_of(response_type: str) -> int:
+        """Map a response type to its priority class."""
+        return PRIORITIES.get(response_type, PRIORITIES["information"])
+
+    def _enqueue(self, waiter: _Waiter) -> None:
+        """Add a waiter behind the other requests of its user."""
+        users = self._queues[waiter.priority]
+        users.setdefault(waiter.user, deque()).append(waiter)
+        self._queued_by_priority[waiter.priority] += 1
+
+    def _remove(self, waiter: _Waiter) -> None:
+        """Take a waiter out of the queue."""
+        users = self._queues[waiter.priority]
+        waiters = users.get(waiter.user)
+        if waiters and waiter in waiters:
+            waiters.remove(waiter)
+            self._queued_by_priority[waiter.priority] -= 1
+            if not waiters:
+                del users[waiter.user]
+
+    def _budget_allows(self, priority: int) -> bool:
+        """Check whether the rate-limit budget lets a priority class start."""
+        if self.budget is None or priority == PRIORITIES["emergency"]:
+            return True
+        return self.budget() >= self.reserve
+
+    def _next(self) -> Optional[_Waiter]:
+        """Pop the next waiter: best priority, then round-robin over users."""
+        for priority, users in self._queues.items():
+            if users and not self._budget_allows(priority):
+                # Lower priorities are blocked too; look again once the budget refills
+                self._schedule_recheck()
+                return None
+            if users:
+                user, waiters = next(iter(users.items()))
+                waiter = waiters.popleft()
+                self._queued_by_priority[priority] -= 1
+                if waiters:
+                    users.move_to_end(user)
+                else:
+                    del users[user]
+                return waiter
+        return None
+
+    def _shed(self, priority: int) -> bool:
+        """Reject a lower-priority waiter, from the user queuing the most, to make room."""
+        for lower in sorted(self._queues, reverse=True):
+            if lower <= priority:
+                return False
+            users = self._queues[lower]
+            if users:
+                user = max(reversed(users), key=lambda u: len(users[u]))
+                waiter = users[user][-1]
+                self._remove(waiter)
+                waiter.rejected = "shed"
+                waiter.future.set_result(False)
+                self.rejected["shed"] += 1
+                return True
+        return False
+
+    def _schedule_recheck(self) -> None:
+        """Re-run dispatch shortly while work is deferred for budget."""
+        if self._recheck is None:
+            self._recheck = asyncio.get_running_loop().call_later(BUDGET_RECHECK_INTERVAL, self._on_recheck)
+
+    def _on_recheck(self) -> None:
+        """Timer callback re-checking deferred work."""
+        self._recheck = None
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Grant free slots to waiting requests."""
+        while self.active < self.max_concurrency:
+            waiter = self._next()
+            if waiter is None:
+                return
+            if waiter.future.done():
+                continue
+            waiter.granted = True
+            self.active += 1
+            waiter.future.set_result(True)
+
+    async def acquire(self, response_type: str = "information", user: Optional[str] = None) -> None:
+        """
+        Wait for a generation slot.
+
+        Args:
+            response_type: Response type from ``get_response_type``
+            user: User the request belongs to (for fairness)
+
+        Raises:
+            AdmissionRejected: If the queue is full or the deadline passes
+        """
+        started = time.perf_counter()
+        priority = self.priority_of(response_type)
+        allowed = self._budget_allows(priority)
+        if not allowed:
+            self.deferred += 1
+        elif self.active < self.max_concurrency and not self.queued:
+            self.active += 1
+            self.admitted += 1
+            self.queue_wait.record(0.0)
+            return
+
+        if self.queued >= self.max_queue and not self._shed(priority):
+            self.rejected["queue_full"] += 1
+            raise AdmissionRejected("queue_full")
+
+        waiter = _Waiter(priority, user or "anonymous")
+        self._enqueue(waiter)
+        self._dispatch()
+        timeout = self.queue_timeouts.get(response_type, self.default_timeout)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+
+        if waiter.granted:
+            self.admitted += 1
+            self.queue_wait.record(time.perf_counter() - started)
+            return
+        if waiter.rejected is None:
+            self._remove(waiter)
+            waiter.future.cancel()
+            self.rejected["deadline"] += 1
+        raise AdmissionRejected(waiter.rejected or "deadline")
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        """Clean up after a caller that was cancelled while queued."""
+        if waiter.granted:
+            self.release()
+        else:
+            self._remove(waiter)
+            waiter.future.cancel()
+
+    def release(self) -> None:
+        """Return a slot and admit the next waiter."""
+        self.active -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, response_type: str = "information", user: Optional[str] = None) -> AsyncIterator[None]:
+        """
+        Hold a generation slot for the duration of a block.
+
+        Args:
+            response_type: Response type from ``get_response_type``
+            user: User the request belongs to
+
+        Raises:
+            AdmissionRejected: If the request is not admitted
+        """
+        await self.acquire(response_type, user)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report admission counters.
+
+        Returns:
+            Dict[str, Any]: Active slots, queue lengths per priority,
+            admitted, deferred (for rate-limit budget) and rejected counts
+            and queue wait percentiles
+        """
+        names = {priority: name for name, priority in PRIORITIES.items()}
+        return {
+            "active": self.active,
+            "max_concurrency": self.max_concurrency,
+            "queued": {names[priority]: count for priority, count in self._queued_by_priority.items()},
+            "admitted": self.admitted,
+            "deferred": self.deferred,
+            "rejected": dict(self.rejected),
+            "queue_wait": self.queue_wait.summary(),
+        }
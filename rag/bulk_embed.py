@@ -0,0 +1,326 @@
+"""
+Multiprocess bulk re-embedding of the whole corpus.
+
+Where ``rag.ingest`` embeds only what changed, this re-embeds everything
+(e.g. after switching the embedding model) using every core, in three
+resumable steps inside a work directory:
+
+1. **Plan:** the source is chunked once into ``chunks.jsonl`` and cut into
+   shards of ``RAG_BULK_SHARD_SIZE`` chunks (``plan.json`` records the byte
+   offset of each shard).
+2. **Embed:** a process pool, one worker per core, embeds the shards.
+   Each worker loads the model once, reads its shard straight from
+   ``chunks.jsonl`` and streams the vectors into ``shard-NNNNN.npy``
+   (float32). A shard file only appears once it is complete, so after a
+   crash the run resumes with the missing shards.
+3. **Merge:** the shards are written to the target through the same
+   sinks and ledger as ``rag.ingest``, so later incremental runs only
+   embed what changes.
+
+Usage:
+    python -m rag.bulk_embed run --target faiss
+    python -m rag.bulk_embed status
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .ingest import (IngestError, IngestLedger, batched, build_sink, default_workers, embed_in_worker,
+                     init_worker, iter_chunks, ledger_path, prepare_target)
+from .local_index import SnapshotError, iter_source_documents, source_fingerprint
+
+PLAN_FILE = "plan.json"
+CHUNKS_FILE = "chunks.jsonl"
+
+def shard_file(work_dir: str, shard: int) -> Path:
+    """Vectors file of a shard."""
+    return Path(work_dir) / f"shard-{shard:05d}.npy"
+
+def plan_key(config: Dict[str, Any], source_dir: str) -> Dict[str, Any]:
+    """Settings and source files a plan and its shards are only valid for."""
+    return {
+        "source_dir": str(source_dir),
+        "source": source_fingerprint(source_dir),
+        "chunk_size": config["chunk_size"],
+        "chunk_overlap": config["chunk_overlap"],
+        "embedding_backend": config["embedding_backend"],
+        "embedding_model": config["onnx_model_dir"] if config["embedding_backend"] == "onnx"
+        else config["embedding_model"],
+    }
+
+def make_plan(work_dir: str, source_dir: str, config: Dict[str, Any], shard_size: int) -> Dict[str, Any]:
+    """
+    Chunk the source into the work directory and cut it into shards.
+
+    An existing plan made with the same settings from the same source
+    files (path, size and modification time) is reused, so a resumed run
+    embeds exactly the chunks it started with.
+
+    Args:
+        work_dir: Work directory
+        source_dir: Directory containing the source documents
+        config: Engine configuration (chunking and embedding model)
+        shard_size: Chunks per shard
+
+    Returns:
+        Dict[str, Any]: The plan (chunk count, shard size, shard offsets)
+
+    Raises:
+        IngestError: If the work directory holds a plan made with other
+            settings or before the source files changed
+    """
+    root = Path(work_dir)
+    key = plan_key(config, source_dir)
+    plan_path = root / PLAN_FILE
+    if plan_path.exists():
+        with open(plan_path, encoding="utf-8") as f:
+            plan = json.load(f)
+        planned = dict(plan["key"])
+        if planned.pop("source", None) != key["source"] and planned == {k: v for k, v in key.items() if k != "source"}:
+            raise IngestError(f"The source files changed since {work_dir} was planned; pass --restart")
+        if plan["key"] != key:
+            raise IngestError(f"{work_dir} holds a plan made with other settings; pass --restart")
+        return plan
+
+    root.mkdir(parents=True, exist_ok=True)
+    offsets: List[int] = []
+    count = 0
+    page, page_ids = None, set()
+    tmp_path = root / (CHUNKS_FILE + ".tmp")
+    with open(tmp_path, "wb") as f:
+        chunks = iter_chunks(iter_source_documents(source_dir), config["chunk_size"], config["chunk_overlap"])
+        for chunk in chunks:
+            # Repeated chunks (same page and text) are one chunk
+            page_key = (chunk.metadata.get("source"), chunk.metadata.get("page"))
+            if page_key != page:
+                page, page_ids = page_key, set()
+            if chunk.id in page_ids:
+                continue
+            page_ids.add(chunk.id)
+            if count % shard_size == 0:
+                offsets.append(f.tell())
+            record = {"id": chunk.id, "text": chunk.page_content, "metadata": chunk.metadata}
+            f.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+            count += 1
+    if not count:
+        tmp_path.unlink()
+        raise IngestError(f"No documents found in {source_dir}")
+    os.replace(tmp_path, root / CHUNKS_FILE)
+
+    plan = {"key": key, "count": count, "shard_size": shard_size, "offsets": offsets, "created_at": time.time()}
+    with open(plan_path, "w", encoding="utf-8") as f:
+        json.dump(plan, f, indent=2)
+    return plan
+
+def shard_sizes(plan: Dict[str, Any]) -> List[int]:
+    """Number of chunks in each shard."""
+    sizes = [plan["shard_size"]] * len(plan["offsets"])
+    sizes[-1] = plan["count"] - plan["shard_size"] * (len(sizes) - 1)
+    return sizes
+
+def shard_done(work_dir: str, shard: int, size: int) -> bool:
+    """Check whether a shard's vectors are complete on disk."""
+    path = shard_file(work_dir, shard)
+    if not path.exists():
+        return False
+    try:
+        return np.load(path, mmap_mode="r").shape[0] == size
+    except (ValueError, OSError):
+        return False
+
+def _iter_records(work_dir: str, offset: int, count: int) -> Iterator[Dict[str, Any]]:
+    """Read ``count`` chunk records starting at a byte offset."""
+    with open(Path(work_dir) / CHUNKS_FILE, "rb") as f:
+        f.seek(offset)
+        for _ in range(count):
+            yield json.loads(f.readline())
+
+def _embed_shard(work_dir: str, shard: int, offset: int, size: int, batch_size: int) -> Tuple[int, int]:
+    """
+    Embed one shard in a worker process and write its vectors.
+
+    Vectors are streamed batch by batch into a memory-mapped temporary
+    file that is renamed into place only when complete.
+
+    Returns:
+        Tuple[int, int]: Shard number and chunks embedded
+    """
+    path = shard_file(work_dir, shard)
+    tmp_path = path.with_suffix(".npy.tmp")
+    vectors = None
+    row = 0
+    for batch in batched(_iter_records(work_dir, offset, size), batch_size):
+        embedded = embed_in_worker([record["text"] for record in batch])
+        if vectors is None:
+            vectors = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32,
+                                                shape=(size, embedded.shape[1]))
+        vectors[row:row + len(batch)] = embedded
+        row += len(batch)
+    vectors.flush()
+    del vectors
+    os.replace(tmp_path, path)
+    return shard, size
+
+def embed_shards(work_dir: str, plan: Dict[str, Any], config: Dict[str, Any], workers: int = 0,
+                 batch_size: int = 256, progress=print) -> Dict[str, Any]:
+    """
+    Embed every shard that is not complete yet.
+
+    Args:
+        work_dir: Work directory with a plan
+        plan: Plan from ``make_plan``
+        config: Engine configuration selecting the embedding model
+        workers: Worker processes (0 = one per core)
+        batch_size: Chunks per ``embed_documents`` call
+        progress: Callable receiving a progress line per finished shard
+
+    Returns:
+        Dict[str, Any]: Shards and chunks embedded now, shards resumed
+        (already complete), seconds and chunks per second
+    """
+    sizes = shard_sizes(plan)
+    todo = [shard for shard, size in enumerate(sizes) if not shard_done(work_dir, shard, size)]
+    report = {"shards": len(sizes), "embedded_shards": 0, "resumed_shards": len(sizes) - len(todo),
+              "chunks": 0, "seconds": 0.0, "chunks_per_second": 0.0}
+    if not todo:
+        return report
+
+    workers = min(workers or default_workers(), len(todo))
+    started = time.perf_counter()
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+        initargs=(config,)
+    ) as executor:
+        futures = [
+            executor.submit(_embed_shard, work_dir, shard, plan["offsets"][shard], sizes[shard], batch_size)
+            for shard in todo
+        ]
+        for future in as_completed(futures):
+            shard, size = future.result()
+            report["embedded_shards"] += 1
+            report["chunks"] += size
+            elapsed = time.perf_counter() - started
+            progress(f"shard {shard} done ({report['embedded_shards']}/{len(todo)}): "
+                     f"{report['chunks']} chunks, {report['chunks'] / elapsed:.1f} chunks/s")
+
+    report["seconds"] = round(time.perf_counter() - started, 2)
+    report["chunks_per_second"] = round(report["chunks"] / report["seconds"], 1) if report["seconds"] else 0.0
+    return report
+
+def merge_shards(work_dir: str, plan: Dict[str, Any], sink, ledger: IngestLedger,
+                 batch_size: int = 256, reset: bool = False) -> Dict[str, Any]:
+    """
+    Write the embedded shards to a target and tombstone everything else.
+
+    Args:
+        work_dir: Work directory with complete shards
+        plan: Plan from ``make_plan``
+        sink: ``PineconeSink`` or ``FaissSink`` from ``rag.ingest``
+        ledger: Ledger of the target
+        batch_size: Chunks per write
+        reset: Empty the target and the ledger first (see ``rag.ingest.prepare_target``)
+
+    Returns:
+        Dict[str, Any]: Chunks written and deleted
+
+    Raises:
+        IngestError: If a shard is missing or incomplete, or the target
+            holds vectors the ledger does not know
+    """
+    sizes = shard_sizes(plan)
+    missing = [shard for shard, size in enumerate(sizes) if not shard_done(work_dir, shard, size)]
+    if missing:
+        raise IngestError(f"{len(missing)} shards are not embedded yet; run 'python -m rag.bulk_embed embed'")
+
+    prepare_target(sink, ledger, reset)
+    run = ledger.begin_run()
+    stats = {"run": run, "written": 0, "deleted": 0}
+    for shard, size in enumerate(sizes):
+        vectors = np.load(shard_file(work_dir, shard), mmap_mode="r")
+        records = _iter_records(work_dir, plan["offsets"][shard], size)
+        for start, batch in zip(range(0, size, batch_size), batched(records, batch_size)):
+            chunks = [Document(page_content=r["text"], metadata=r["metadata"], id=r["id"]) for r in batch]
+            block = np.asarray(vectors[start:start + len(chunks)])
+            sink.upsert(chunks, block)
+            ledger.add(chunks, run, block if sink.stores_vectors else None)
+            stats["written"] += len(chunks)
+
+    for ids in ledger.stale(run, batch_size):
+        sink.delete(ids)
+        ledger.forget(ids)
+        stats["deleted"] += len(ids)
+    sink.finish(ledger, changed=True)
+    ledger.finish_run(run, dict(stats, bulk=True))
+    return stats
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point."""
+    from .config import load_rag_config
+
+    config = load_rag_config()
+    parser = argparse.ArgumentParser(prog="python -m rag.bulk_embed", description=__doc__.split("\n\n")[0])
+    parser.add_argument("command", choices=["run", "embed", "merge", "status"],
+                        help="run = embed + merge")
+    parser.add_argument("--target", choices=["pinecone", "faiss"], default=config["retrieval_backend"])
+    parser.add_argument("--source-dir", default=config["source_dir"])
+    parser.add_argument("--work-dir", default=config["bulk_embed_dir"])
+    parser.add_argument("--workers", type=int, default=config["ingest_workers"],
+                        help="Embedding processes (0 = one per core)")
+    parser.add_argument("--shard-size", type=int, default=config["bulk_shard_size"], help="Chunks per shard")
+    parser.add_argument("--batch-size", type=int, default=config["ingest_batch_size"],
+                        help="Chunks per embedding call")
+    parser.add_argument("--restart", action="store_true", help="Discard the plan and shards of an earlier run")
+    parser.add_argument("--reset-index", action="store_true",
+                        help="Delete everything in the target before merging (needed once for an index built by other means)")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.restart and args.command in ("run", "embed"):
+            shutil.rmtree(args.work_dir, ignore_errors=True)
+
+        if args.command == "status":
+            plan_path = Path(args.work_dir) / PLAN_FILE
+            if not plan_path.exists():
+                print(f"No bulk embedding plan in {args.work_dir}")
+                return 0
+            with open(plan_path, encoding="utf-8") as f:
+                plan = json.load(f)
+            sizes = shard_sizes(plan)
+            done = sum(shard_done(args.work_dir, shard, size) for shard, size in enumerate(sizes))
+            print(f"{plan['count']} chunks in {len(sizes)} shards, {done} embedded ({args.work_dir})")
+            return 0
+
+        plan = make_plan(args.work_dir, args.source_dir, config, args.shard_size)
+        if args.command in ("run", "embed"):
+            print(f"Plan: {plan['count']} chunks in {len(plan['offsets'])} shards")
+            report = embed_shards(args.work_dir, plan, config, args.workers, args.batch_size)
+            print(f"Embedded {report['chunks']} chunks in {report['embedded_shards']} shards "
+                  f"({report['resumed_shards']} resumed) in {report['seconds']}s: "
+                  f"{report['chunks_per_second']} chunks/s")
+        if args.command in ("run", "merge"):
+            ledger = IngestLedger(ledger_path(config, args.target))
+            try:
+                stats = merge_shards(args.work_dir, plan, build_sink(config, args.target), ledger,
+                                     config["ingest_upsert_batch_size"], reset=args.reset_index)
+            finally:
+                ledger.close()
+            print(f"Merged into {args.target}: {stats['written']} chunks written, {stats['deleted']} deleted")
+    except (IngestError, SnapshotError) as e:
+        print(f"Bulk embedding error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
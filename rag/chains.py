@@ -0,0 +1,105 @@
+"""
+Per-output-language QA pipeline registry.
+"""
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_core.prompts import PromptTemplate
+
+from .pipeline import STAGES, QAPipeline
+from .prompts import SUPPORTED_LANGUAGES, build_qa_prompt
+
+class ChainRegistry:
+    """
+    Registry of compiled QA pipelines keyed by output language.
+
+    Each language gets its own precompiled prompt and pipeline, built
+    lazily on first use and then reused by every session. All pipelines
+    share the same LLM, retriever, context budgeter, rate limiter and
+    stage hooks, so switching language in the sidebar costs a dictionary
+    lookup.
+    """
+
+    def __init__(self, llm, retriever, hooks: Optional[Dict[str, List[Callable[[Any], None]]]] = None,
+                 budgeter=None, limiter=None):
+        """
+        Initialize an empty registry.
+
+        Args:
+            llm: Shared chat model
+            retriever: Shared document retriever
+            hooks: Stage hooks shared by every pipeline (new lists if None)
+            budgeter: Shared ``ContextBudgeter`` (optional)
+            limiter: Shared ``TokenBucketLimiter`` (optional)
+        """
+        self.llm = llm
+        self.retriever = retriever
+        self.budgeter = budgeter
+        self.limiter = limiter
+        self.hooks = hooks if hooks is not None else {stage: [] for stage in STAGES}
+        self._prompts: Dict[str, PromptTemplate] = {}
+        self._chains: Dict[str, QAPipeline] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize_language(output_lang: str) -> str:
+        """Map unknown output languages to English."""
+        return output_lang if output_lang in SUPPORTED_LANGUAGES else "English"
+
+    def add_hook(self, stage: str, hook: Callable[[Any], None]) -> None:
+        """
+        Register a hook on a pipeline stage of every language.
+
+        Args:
+            stage: One of ``retrieve``, ``context``, ``prompt`` or ``answer``
+            hook: Callable receiving the stage output
+        """
+        if stage not in self.hooks:
+            raise ValueError(f"Unknown pipeline stage: {stage}")
+        self.hooks[stage].append(hook)
+
+    def get_prompt(self, output_lang: str) -> PromptTemplate:
+        """
+        Get the compiled prompt for an output language.
+
+        Args:
+            output_lang: Output language
+
+        Returns:
+            PromptTemplate: Language-specific QA prompt
+        """
+        output_lang = self.normalize_language(output_lang)
+        prompt = self._prompts.get(output_lang)
+        if prompt is None:
+            with self._lock:
+                prompt = self._prompts.get(output_lang)
+                if prompt is None:
+                    prompt = build_qa_prompt(output_lang)
+                    self._prompts[output_lang] = prompt
+        return prompt
+
+    def get(self, output_lang: str) -> QAPipeline:
+        """
+        Get the QA pipeline for an output language, building it on first use.
+
+        Args:
+            output_lang: Output language
+
+        Returns:
+            QAPipeline: Language-specific QA pipeline
+        """
+        output_lang = self.normalize_language(output_lang)
+        chain = self._chains.get(output_lang)
+        if chain is None:
+            prompt = self.get_prompt(output_lang)
+            with self._lock:
+                chain = self._chains.get(output_lang)
+                if chain is None:
+                    chain = QAPipeline(self.retriever, prompt, self.llm, hooks=self.hooks,
+                                       budgeter=self.budgeter, limiter=self.limiter)
+                    self._chains[output_lang] = chain
+        return chain
+
+    def compiled_languages(self):
+        """List the languages whose pipelines have been compiled."""
+        return sorted(self._chains)
@@ -0,0 +1,185 @@
+"""
+RAG engine configuration.
+Reads settings from Streamlit secrets with an environment variable fallback.
+"""
+import os
+import json
+import hashlib
+from pathlib import Path
+from typing import Any, Dict
+
+# Repository root; relative data paths are resolved against it
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# Settings holding file or directory paths (see ``resolve_path``)
+PATH_SUFFIXES = ("_dir", "_path")
+
+# Default engine settings. Each key can be overridden with an upper-case
+# ``RAG_<KEY>`` entry in Streamlit secrets or the environment.
+DEFAULT_RAG_CONFIG = {
+    "index_name": "pdfinfo",
+    "embedding_model": "all-MiniLM-L6-v2",
+    "embedding_batch_size": 32,
+    "embedding_backend": "huggingface",
+    "onnx_model_dir": "data/onnx/all-MiniLM-L6-v2",
+    "onnx_threads": 0,
+    "query_embedding_cache_bytes": 8 * 1024 * 1024,
+    "embedding_service_enabled": True,
+    "embedding_service_max_wait_ms": 5,
+    "embedding_service_max_batch": 32,
+    "llm_backend": "gemini",
+    "llm_model": "gemini-2.0-flash-exp",
+    "llm_temperature": 0.1,
+    "llm_max_retries": 3,
+    "llm_timeout": 30,
+    "llm_max_output_tokens": 2048,
+    "llm_max_concurrency": 4,
+    "llm_max_queue": 32,
+    "llm_queue_timeout": 15,
+    "emergency_queue_timeout": 5,
+    "rate_limit_enabled": True,
+    "llm_rpm": 10,
+    "llm_tpm": 1000000,
+    "rate_limit_max_wait": 10,
+    "rate_limit_reserve": 0.2,
+    "rate_limit_state_path": "data/gemini_rate_limit.json",
+    "rate_limit_sync_interval": 1.0,
+    "resilience_enabled": True,
+    "llm_deadline": 25,
+    "hedge_enabled": True,
+    "hedge_delay": 3.0,
+    "hedge_min_delay": 1.0,
+    "hedge_percentile": 95.0,
+    "hedge_min_samples": 20,
+    "breaker_failure_threshold": 5,
+    "breaker_reset_timeout": 30,
+    "degraded_max_points": 4,
+    "degraded_min_score": 0.2,
+    "degraded_retrieval_timeout": 2.0,
+    "fake_llm_latency": 0.8,
+    "fake_llm_tail_probability": 0.05,
+    "fake_llm_tail_latency": 8.0,
+    "fake_llm_failure_rate": 0.0,
+    "top_k": 6,
+    "adaptive_k_enabled": True,
+    "min_k": 1,
+    "score_threshold": 0.3,
+    "score_gap": 0.1,
+    "retrieval_backend": "pinecone",
+    "retrieval_mode": "vector",
+    "routing_enabled": True,
+    "routing_min_confidence": 0.6,
+    "hybrid_candidates": 20,
+    "rrf_k": 60,
+    "bm25_k1": 1.5,
+    "bm25_b": 0.75,
+    "faiss_index_dir": "data/faiss_index",
+    "source_dir": "data/source",
+    "chunk_size": 1000,
+    "chunk_overlap": 150,
+    "index_compression": "",
+    "index_rescore_factor": 4,
+    "ingest_dir": "data/ingest",
+    "ingest_workers": 0,
+    "ingest_batch_size": 256,
+    "ingest_upsert_batch_size": 100,
+    "bulk_embed_dir": "data/bulk_embed",
+    "bulk_shard_size": 2048,
+    "context_budget_enabled": True,
+    "context_max_tokens": 1500,
+    "context_dedupe_threshold": 0.95,
+    "context_chars_per_token": 4.0,
+    "semantic_cache_enabled": True,
+    "semantic_cache_threshold": 0.92,
+    "semantic_cache_max_entries": 2048,
+    "semantic_cache_ttl": 3600,
+    "semantic_cache_emergency_ttl": 300,
+    "playbooks_path": "data/playbooks.json",
+    "playbooks_require_review": True,
+    "coalesce_enabled": True,
+    "coalesce_timeout": 90,
+    "worker_threads": 8,
+    "emergency_enrichment_timeout": 8,
+    "retry_interval": 30,
+}
+
+def get_setting(name: str, default: Any = None) -> Any:
+    """
+    Get a setting from Streamlit secrets or environment variables.
+
+    Args:
+        name: Setting name as it appears in secrets.toml or the environment
+        default: Value returned when the setting is not defined anywhere
+
+    Returns:
+        Any: The configured value or the default
+    """
+    # Try getting from Streamlit secrets first. Imported here so CLIs,
+    # benchmarks and tests can load the configuration without the UI stack
+    try:
+        import streamlit as st
+        return st.secrets[name]
+    except Exception:
+        # Fall back to environment variable
+        return os.environ.get(name, default)
+
+def resolve_path(path: str) -> str:
+    """
+    Resolve a configured path against the repository root.
+
+    Args:
+        path: Absolute path, or a path relative to the repository root
+
+    Returns:
+        str: Absolute path (empty paths are returned unchanged)
+    """
+    if not path or os.path.isabs(path):
+        return path
+    return str(PROJECT_ROOT / path)
+
+def _coerce(value: Any, default: Any) -> Any:
+    """Cast a raw secret/environment value to the type of its default."""
+    if value is None or isinstance(value, type(default)):
+        return value
+    if isinstance(default, bool):
+        return str(value).strip().lower() in ("1", "true", "yes", "on")
+    try:
+        return type(default)(value)
+    except (TypeError, ValueError):
+        return default
+
+def load_rag_config() -> Dict[str, Any]:
+    """
+    Load the RAG engine configuration.
+
+    Returns:
+        Dict[str, Any]: API keys plus every key of ``DEFAULT_RAG_CONFIG``,
+        with relative ``*_dir`` and ``*_path`` settings resolved against
+        the repository root
+    """
+    config = {
+        "pinecone_api_key": get_setting("PINECONE_API_KEY"),
+        "google_api_key": get_setting("GOOGLE_API_KEY"),
+    }
+    for key, default in DEFAULT_RAG_CONFIG.items():
+        config[key] = _coerce(get_setting(f"RAG_{key.upper()}", default), default)
+        # Data paths do not depend on the directory the app is started from
+        if key.endswith(PATH_SUFFIXES):
+            config[key] = resolve_path(config[key])
+    return config
+
+def config_fingerprint(config: Dict[str, Any]) -> str:
+    """
+    Compute a stable fingerprint of a configuration.
+
+    The fingerprint is used to detect configuration changes for hot reloads
+    without keeping API keys around in plain text.
+
+    Args:
+        config: Configuration dictionary
+
+    Returns:
+        str: Short hex digest of the configuration
+    """
+    payload = json.dumps(config, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()[:16]
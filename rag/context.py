@@ -0,0 +1,140 @@
+"""
+Context budgeter: dedupe and trim retrieved chunks before the prompt.
+
+Sits between the retriever and the prompt. Near-duplicate chunks
+(overlapping splits, the same paragraph in two PDFs) are dropped by
+cosine similarity of their embeddings, the rest are ordered by retrieval
+score and packed into a token budget.
+"""
+import math
+import threading
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+def estimate_tokens(text: str, chars_per_token: float = 4.0) -> int:
+    """
+    Estimate the prompt tokens of a text without a tokenizer.
+
+    Args:
+        text: Text to measure
+        chars_per_token: Average characters per token
+
+    Returns:
+        int: Estimated token count
+    """
+    return math.ceil(len(text) / chars_per_token) if text else 0
+
+class ContextBudgeter:
+    """
+    Deduplicates retrieved chunks and packs them into a token budget.
+
+    Chunk embeddings are taken from ``metadata["embedding"]`` when the
+    retriever returned them; only chunks without one are embedded. The
+    pairwise similarities are one matrix product over the normalized
+    vectors.
+    """
+
+    def __init__(self, embeddings, max_tokens: int = 1500, dedupe_threshold: float = 0.95,
+                 chars_per_token: float = 4.0):
+        """
+        Initialize the budgeter.
+
+        Args:
+            embeddings: Embedding model for chunks that arrive without a vector
+            max_tokens: Token budget of the packed context
+            dedupe_threshold: Cosine similarity above which a chunk is a duplicate
+            chars_per_token: Average characters per token for estimates
+        """
+        self.embeddings = embeddings
+        self.max_tokens = max_tokens
+        self.dedupe_threshold = dedupe_threshold
+        self.chars_per_token = chars_per_token
+        self._lock = threading.Lock()
+        self._totals = {"requests": 0, "duplicates": 0, "tokens_in": 0, "tokens_out": 0}
+
+    def _vectors(self, docs: List[Document]) -> np.ndarray:
+        """Collect unit-length chunk vectors, embedding only missing ones."""
+        missing = [i for i, doc in enumerate(docs) if doc.metadata.get("embedding") is None]
+        computed = {}
+        if missing:
+            embedded = self.embeddings.embed_documents([docs[i].page_content for i in missing])
+            computed = dict(zip(missing, embedded))
+        vectors = np.vstack([
+            np.asarray(computed[i] if i in computed else doc.metadata["embedding"], dtype=np.float32)
+            for i, doc in enumerate(docs)
+        ])
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.clip(norms, 1e-12, None)
+
+    def assemble(self, docs: List[Document]) -> Tuple[List[Document], Dict[str, Any]]:
+        """
+        Select the chunks that go into the prompt.
+
+        Args:
+            docs: Retrieved chunks, optionally scored in ``metadata["score"]``
+
+        Returns:
+            Tuple[List[Document], Dict[str, Any]]: Packed chunks and a report
+            of chunk counts and estimated tokens before/after
+        """
+        tokens = [estimate_tokens(doc.page_content, self.chars_per_token) for doc in docs]
+        selected: List[Document] = []
+        duplicates = 0
+
+        if docs:
+            # Highest score first; unscored chunks keep their retrieval order
+            scores = np.array([doc.metadata.get("score", 0.0) for doc in docs], dtype=np.float32)
+            order = np.argsort(-scores, kind="stable")
+            vectors = self._vectors(docs) if len(docs) > 1 else None
+            similarities = vectors @ vectors.T if vectors is not None else None
+
+            kept: List[int] = []
+            used = 0
+            for i in order:
+                if kept and similarities[i, kept].max() >= self.dedupe_threshold:
+                    duplicates += 1
+                    continue
+                kept.append(int(i))
+                if used + tokens[i] <= self.max_tokens:
+                    selected.append(docs[i])
+                    used += tokens[i]
+                elif not selected:
+                    # Never send an empty context because one chunk is too long
+                    limit = int(self.max_tokens * self.chars_per_token)
+                    selected.append(Document(page_content=docs[i].page_content[:limit], metadata=docs[i].metadata, id=docs[i].id))
+                    used = self.max_tokens
+
+        tokens_in = sum(tokens)
+        tokens_out = sum(estimate_tokens(doc.page_content, self.chars_per_token) for doc in selected)
+        report = {
+            "chunks_in": len(docs),
+            "chunks_out": len(selected),
+            "duplicates": duplicates,
+            "tokens_in": tokens_in,
+            "tokens_out": tokens_out,
+            "tokens_saved": tokens_in - tokens_out,
+        }
+        with self._lock:
+            self._totals["requests"] += 1
+            self._totals["duplicates"] += duplicates
+            self._totals["tokens_in"] += tokens_in
+            self._totals["tokens_out"] += tokens_out
+        return selected, report
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Report totals since the budgeter was built.
+
+        Returns:
+            Dict[str, float]: Requests, duplicates dropped, tokens in/out/saved
+            and mean tokens saved per request
+        """
+        with self._lock:
+            totals = dict(self._totals)
+        saved = totals["tokens_in"] - totals["tokens_out"]
+        totals["tokens_saved"] = saved
+        totals["mean_tokens_saved"] = saved / totals["requests"] if totals["requests"] else 0.0
+        totals["max_tokens"] = self.max_tokens
+        return totals
@@ -0,0 +1,141 @@
+"""
+Degraded answers served when the LLM cannot be used in time.
+
+Instead of leaving the user waiting, the sentences of the retrieved chunks
+that best match the question are ranked with the embedding model and shown
+as a short bulleted answer, followed by the emergency contacts. No LLM or
+network call is involved.
+"""
+import re
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .emergency import EMERGENCY_CONTACTS
+
+DEGRADED_NOTES = {
+    "English": "⚠️ Our assistant is under heavy load, so here are the most relevant points from our disaster management documents:",
+    "Urdu": "⚠️ اس وقت نظام پر دباؤ زیادہ ہے، اس لیے ہماری آفات کے انتظام کی دستاویزات سے متعلقہ نکات یہ ہیں:",
+    "Sindhi": "⚠️ هن وقت سسٽم تي دٻاءُ وڌيڪ آهي، تنهن ڪري اسان جي آفتن جي انتظام جي دستاويزن مان لاڳاپيل نُڪتا هي آهن:",
+}
+
+NO_EXCERPTS_NOTES = {
+    "English": "⚠️ Our assistant is under heavy load. Please try again in a moment, or call the emergency numbers if you are in danger.",
+    "Urdu": "⚠️ اس وقت نظام پر دباؤ زیادہ ہے۔ براہ کرم تھوڑی دیر بعد دوبارہ کوشش کریں، یا خطرے کی صورت میں ایمرجنسی نمبروں پر کال کریں۔",
+    "Sindhi": "⚠️ هن وقت سسٽم تي دٻاءُ وڌيڪ آهي. مهرباني ڪري ٿوري دير کان پوءِ ٻيهر ڪوشش ڪريو، يا خطري جي صورت ۾ ايمرجنسي نمبرن تي ڪال ڪريو.",
+}
+
+CONTACT_LABELS = {
+    "English": ("Emergency Number", "Rescue Team", "Local Authorities"),
+    "Urdu": ("ایمرجنسی نمبر", "ریسکیو ٹیم", "مقامی حکام"),
+    "Sindhi": ("ايمرجنسي نمبر", "ريسڪيو ٽيم", "مقامي اختيارين"),
+}
+
+# Sentence ends in English, Urdu and Sindhi text (full stop "۔", "؟")
+_SENTENCE_END = re.compile(r"(?<=[.!?۔؟])\s+|\n+")
+
+def split_sentences(text: str, min_chars: int = 25, max_chars: int = 300) -> List[str]:
+    """
+    Split a chunk into sentences worth showing on their own.
+
+    Args:
+        text: Chunk text
+        min_chars: Shorter fragments (headings, page numbers) are dropped
+        max_chars: Longer sentences are cut at a word boundary
+
+    Returns:
+        List[str]: Whitespace-normalized sentences
+    """
+    sentences = []
+    for sentence in _SENTENCE_END.split(text):
+        sentence = " ".join(sentence.split()).lstrip("-•* ")
+        if len(sentence) < min_chars:
+            continue
+        if len(sentence) > max_chars:
+            sentence = sentence[:max_chars].rsplit(" ", 1)[0] + "…"
+        sentences.append(sentence)
+    return sentences
+
+def rank_sentences(query_vector: List[float], sentences: List[str], embeddings, max_points: int = 4,
+                   min_score: float = 0.2, redundancy: float = 0.85) -> List[str]:
+    """
+    Pick the sentences closest to the question, skipping near-repeats.
+
+    Args:
+        query_vector: Embedding of the question
+        sentences: Candidate sentences
+        embeddings: Embedding model used for the index
+        max_points: Maximum sentences returned
+        min_score: Minimum cosine similarity to the question
+        redundancy: Similarity above which a sentence repeats a chosen one
+
+    Returns:
+        List[str]: Chosen sentences, most relevant first
+    """
+    if not sentences:
+        return []
+    vectors = np.asarray(embeddings.embed_documents(sentences), dtype=np.float32)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    query = np.array(query_vector, dtype=np.float32)
+    query /= max(float(np.linalg.norm(query)), 1e-12)
+    scores = vectors @ query
+
+    chosen: List[int] = []
+    for i in np.argsort(-scores):
+        if scores[i] < min_score or len(chosen) == max_points:
+            break
+        if chosen and float(np.max(vectors[chosen] @ vectors[i])) > redundancy:
+            continue
+        chosen.append(int(i))
+    return [sentences[i] for i in chosen]
+
+def contacts_block(output_lang: str) -> str:
+    """Format the emergency contacts in the output language."""
+    contacts = EMERGENCY_CONTACTS.get(output_lang, EMERGENCY_CONTACTS["English"])
+    emergency, rescue, local = CONTACT_LABELS.get(output_lang, CONTACT_LABELS["English"])
+    return (
+        f"**{emergency}:** {contacts['emergency']}  \n"
+        f"**{rescue}:** {contacts['rescue_team']}  \n"
+        f"**{local}:** {contacts['local_authorities']}"
+    )
+
+def extractive_answer(docs: List[Document], output_lang: str, embeddings=None,
+                      query_vector: Optional[List[float]] = None, max_points: int = 4,
+                      min_score: float = 0.2, max_candidates: int = 48) -> str:
+    """
+    Build a degraded answer from the sentences of the retrieved chunks.
+
+    With an embedding model and the question's vector, sentences are ranked
+    by similarity to the question; otherwise the leading sentences of the
+    best chunks are used.
+
+    Args:
+        docs: Retrieved chunks, best first
+        output_lang: Output language selected by the user
+        embeddings: Embedding model used for the index (optional)
+        query_vector: Embedding of the question (optional)
+        max_points: Maximum bullet points
+        min_score: Minimum similarity of a sentence to the question
+        max_candidates: Maximum sentences embedded
+
+    Returns:
+        str: Localized note, bullet points and the emergency contacts
+    """
+    candidates: List[str] = []
+    for doc in docs:
+        candidates.extend(split_sentences(doc.page_content))
+    candidates = list(dict.fromkeys(candidates))[:max_candidates]
+
+    if embeddings is not None and query_vector is not None:
+        points = rank_sentences(query_vector, candidates, embeddings, max_points, min_score)
+    else:
+        points = candidates[:max_points]
+
+    if not points:
+        return f"{NO_EXCERPTS_NOTES.get(output_lang, NO_EXCERPTS_NOTES['English'])}\n\n{contacts_block(output_lang)}"
+
+    lines = [DEGRADED_NOTES.get(output_lang, DEGRADED_NOTES["English"]), ""]
+    lines.extend(f"- {point}" for point in points)
+    lines.extend(["", contacts_block(output_lang)])
+    return "\n".join(lines)
@@ -0,0 +1,143 @@
+"""
+Cross-session micro-batching embedding service.
+
+Concurrent Streamlit sessions each embed their own query. This service
+collects queries for a few milliseconds and encodes them as one batch on
+the CPU model, which is much cheaper than encoding them one at a time.
+"""
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Dict, List, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+from .metrics import LatencyTracker
+
+class BatchingEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that micro-batches queries across threads.
+
+    ``embed_query`` enqueues the text and waits on a future. A dispatcher
+    thread takes the first waiting query, keeps collecting for up to
+    ``max_wait_ms`` (or until ``max_batch_size`` queries are queued) and
+    encodes the whole batch with one ``embed_documents`` call.
+    """
+
+    def __init__(self, base: Embeddings, max_wait_ms: float = 5, max_batch_size: int = 32):
+        """
+        Start the dispatcher.
+
+        Args:
+            base: Embedding model to wrap
+            max_wait_ms: How long to wait for more queries after the first
+            max_batch_size: Maximum queries encoded together
+        """
+        self.base = base
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._queue: "queue.Queue[Tuple[str, Future, float]]" = queue.Queue()
+        self._closed = threading.Event()
+        self._lock = threading.Lock()
+        self._stopped = False
+        self.queue_delay = LatencyTracker()
+        self.batches = 0
+        self.queries = 0
+        self._thread = threading.Thread(target=self._dispatch, name="rag-embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def _collect(self) -> List[Tuple[str, Future, float]]:
+        """Wait for the first query, then gather a batch around it."""
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _serve(self, batch: List[Tuple[str, Future, float]]) -> None:
+        """Encode a batch and resolve its futures."""
+        # Identical texts in one batch are encoded once
+        texts = list(dict.fromkeys(text for text, _, _ in batch))
+        started = time.monotonic()
+        for _, _, enqueued in batch:
+            self.queue_delay.record(started - enqueued)
+        try:
+            vectors = dict(zip(texts, self.base.embed_documents(texts)))
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.queries += len(batch)
+        for text, future, _ in batch:
+            future.set_result(vectors[text])
+
+    def _dispatch(self) -> None:
+        """Encode queued queries in batches until closed."""
+        while True:
+            batch = self._collect()
+            if batch:
+                self._serve(batch)
+            elif self._closed.is_set():
+                break
+
+        # Queries enqueued while closing are served here; later ones are
+        # embedded directly by ``embed_query``
+        with self._lock:
+            self._stopped = True
+            leftovers = []
+            while True:
+                try:
+                    leftovers.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+        if leftovers:
+            self._serve(leftovers)
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query as part of the next batch (LangChain interface)."""
+        future: Future = Future()
+        # Under the lock, so a query is either queued before the dispatcher
+        # drains the queue on exit or sees it stopped
+        with self._lock:
+            queued = not self._stopped
+            if queued:
+                self._queue.put((text, future, time.monotonic()))
+        if not queued:
+            return self.base.embed_query(text)
+        return future.result()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents directly; they are already batched (LangChain interface)."""
+        return self.base.embed_documents(texts)
+
+    def close(self) -> None:
+        """Stop the dispatcher once the queued queries are served."""
+        self._closed.set()
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Report batching metrics.
+
+        Returns:
+            Dict[str, float]: Batches, queries, mean batch fill and queueing delay
+        """
+        mean_size = self.queries / self.batches if self.batches else 0.0
+        return {
+            "batches": self.batches,
+            "queries": self.queries,
+            "mean_batch_size": mean_size,
+            "mean_batch_fill": mean_size / self.max_batch_size,
+            "queue_delay": self.queue_delay.summary(),
+        }
@@ -0,0 +1,156 @@
+"""
+Embedding model construction and query-embedding cache.
+"""
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+def build_embeddings(config: Dict[str, Any]) -> Embeddings:
+    """
+    Build the CPU embedding model used for queries and documents.
+
+    ``embedding_backend`` selects the sentence-transformers model
+    ("huggingface") or its quantized ONNX export ("onnx"). Backends are
+    imported lazily so the ONNX path does not load torch.
+
+    Args:
+        config: Engine configuration
+
+    Returns:
+        Embeddings: Normalized sentence embeddings
+    """
+    if config.get("embedding_backend") == "onnx":
+        from .onnx_embeddings import OnnxEmbeddings
+        return OnnxEmbeddings(
+            config["onnx_model_dir"],
+            batch_size=config["embedding_batch_size"],
+            threads=config["onnx_threads"]
+        )
+
+    from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(
+        model_name=config["embedding_model"],
+        model_kwargs={'device': 'cpu'},
+        encode_kwargs={
+            'normalize_embeddings': True,
+            'batch_size': config["embedding_batch_size"]
+        }
+    )
+
+def normalize_query(text: str) -> str:
+    """
+    Normalize a query for embedding cache lookups.
+
+    all-MiniLM-L6-v2 uses an uncased tokenizer that ignores extra
+    whitespace, so case and spacing changes do not change the vector.
+
+    Args:
+        text: Raw query text
+
+    Returns:
+        str: Normalized cache key
+    """
+    return " ".join(unicodedata.normalize("NFKC", text).lower().split())
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that memoizes query vectors.
+
+    Vectors are kept as compact float32 arrays keyed by normalized text in
+    an LRU bounded by a byte budget. The engine shares one instance between
+    the vector store, the answer cache and every other component that needs
+    the query vector, so each query is embedded once per request. Document
+    embeddings are passed through uncached.
+    """
+
+    def __init__(self, base: Embeddings, max_bytes: int = 8 * 1024 * 1024):
+        """
+        Initialize the wrapper.
+
+        Args:
+            base: Embedding model to wrap
+            max_bytes: Memory budget for cached vectors and keys
+        """
+        self.base = base
+        self.max_bytes = max_bytes
+        self._vectors: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _entry_bytes(key: str, vector: np.ndarray) -> int:
+        """Approximate the memory used by a cache entry."""
+        return vector.nbytes + len(key.encode("utf-8"))
+
+    def embed_query_array(self, text: str) -> np.ndarray:
+        """
+        Embed a query, reusing the cached vector when available.
+
+        Args:
+            text: Query text
+
+        Returns:
+            np.ndarray: Read-only float32 query vector
+        """
+        key = normalize_query(text)
+        with self._lock:
+            vector = self._vectors.get(key)
+            if vector is not None:
+                self._vectors.move_to_end(key)
+                self.hits += 1
+                return vector
+            self.misses += 1
+
+        vector = np.asarray(self.base.embed_query(key), dtype=np.float32)
+        vector.setflags(write=False)
+
+        with self._lock:
+            if key not in self._vectors:
+                self._vectors[key] = vector
+                self._bytes += self._entry_bytes(key, vector)
+                while self._bytes > self.max_bytes and self._vectors:
+                    old_key, old_vector = self._vectors.popitem(last=False)
+                    self._bytes -= self._entry_bytes(old_key, old_vector)
+        return vector
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query (LangChain interface)."""
+        return self.embed_query_array(text).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents without caching (LangChain interface)."""
+        return self.base.embed_documents(texts)
+
+    def close(self) -> None:
+        """Release the wrapped model's background resources, if any."""
+        if hasattr(self.base, "close"):
+            self.base.close()
+
+    def clear(self) -> None:
+        """Drop every cached vector."""
+        with self._lock:
+            self._vectors.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Report cache counters.
+
+        Returns:
+            Dict[str, float]: Entries, bytes, hits, misses and hit rate
+        """
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._vectors),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,193 @@
+"""
+Emergency detection and emergency type classification.
+
+Every phrase list below (English, Urdu, Sindhi and Roman Urdu) is compiled
+once, at import time, into a single Aho-Corasick automaton
+(``EMERGENCY_MATCHER``). ``match_emergency`` scans a message once and
+returns the matched phrases, whether they signal an emergency, and the
+inferred emergency type.
+"""
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from .phrase_matcher import PhraseMatcher
+
+# Emergency contact information shown with emergency and degraded answers
+EMERGENCY_CONTACTS = {
+    "English": {
+        "rescue_team": "1736 or +92 335 5557362",
+        "emergency": "15 or 1122",
+        "local_authorities": "+92 335 5557362"
+    },
+    "Urdu": {
+        "rescue_team": "1736 یا +92 335 5557362",
+        "emergency": "15 یا 1122",
+        "local_authorities": "+92 335 5557362"
+    },
+    "Sindhi": {
+        "rescue_team": "1736 يا +92 335 5557362",
+        "emergency": "15 يا 1122",
+        "local_authorities": "+92 335 5557362"
+    }
+}
+
+# Emergency types known to the app (keys of EMERGENCY_AUTHORITIES)
+EMERGENCY_TYPES = ("Flood", "Earthquake", "Fire", "Medical", "General")
+
+# Phrases that mark a message as an emergency, per language
+EMERGENCY_PHRASES: Dict[str, List[str]] = {
+    "English": [
+        "help", "help me", "need help", "i need help", "emergency", "danger", "urgent", "sos", "save",
+        "critical", "life threatening", "dying", "trapped", "stuck", "stranded", "in trouble", "evacuate",
+        "rescue", "accident", "police", "ambulance", "medical emergency", "injured", "hurt", "bleeding",
+        "fire", "flood now", "earthquake", "drowning", "collapsed", "explosion",
+    ],
+    "Roman Urdu": [
+        "madad", "madad karo", "mujhe madad chahiye", "bachao", "khatra", "khatre mein",
+        "phans gaye", "phansa hua", "phansi hui", "jaldi aao", "marr raha", "ambulance bulao",
+    ],
+    "Urdu": [
+        "مدد", "مدد کریں", "مجھے مدد چاہیے", "بچاؤ", "بچائیں", "ایمرجنسی", "ہنگامی", "خطرہ", "خطرے میں",
+        "پھنس گئے", "پھنسے ہوئے", "فوری مدد", "حادثہ", "ریسکیو",
+    ],
+    "Sindhi": [
+        "مدد", "مدد ڪريو", "مونکي مدد گهرجي", "بچايو", "ايمرجنسي", "هنگامي", "خطرو", "خطري ۾",
+        "ڦاسي پيا", "ڦاٿل", "فوري مدد", "حادثو", "ريسڪيو",
+    ],
+}
+
+# Terms that identify a disaster type, in English, Urdu, Sindhi and Roman
+# Urdu. Used for messages (emergency type), document chunks (shard tags)
+# and retrieval routing. Broader than the emergency phrases: documents
+# describe preparedness and recovery, not only the emergency itself.
+DISASTER_TYPE_TERMS: Dict[str, List[str]] = {
+    "Flood": [
+        "flood", "floods", "flooding", "flooded", "flash flood", "monsoon", "heavy rain", "rainfall",
+        "embankment", "inundation", "inundated", "drowning", "drowned", "rising water", "water rising",
+        "water level", "sailab", "selab", "سیلاب", "طغیانی", "ٻوڏ", "سيلاب",
+    ],
+    "Earthquake": [
+        "earthquake", "earthquakes", "quake", "tremor", "tremors", "aftershock", "aftershocks", "seismic",
+        "collapsed", "collapse", "rubble", "zalzala", "zalzalay", "bhonchal", "زلزلہ", "زلزلے", "ملبہ",
+        "زلزلو", "ڀونچال",
+    ],
+    "Fire": [
+        "fire", "fires", "wildfire", "smoke", "burning", "blaze", "flames", "flame", "explosion", "blast",
+        "extinguisher", "extinguish", "aag", "aag lagi", "آگ", "دھواں", "باهه", "دونهون",
+    ],
+    "Medical": [
+        "medical", "injured", "injury", "injuries", "hurt", "bleeding", "wound", "wounded", "fracture",
+        "first aid", "ambulance", "cpr", "unconscious", "heart attack", "snake bite", "zakhmi", "behosh",
+        "زخمی", "بے ہوش", "ایمبولینس", "زخمي", "بيهوش",
+    ],
+}
+
+# Words that make a report ("there is a ...", "I am in ...") an emergency
+EMERGENCY_CONTEXT_TERMS = ["trouble", "disaster", "مصیبت", "آفت", "مصيبت"]
+
+def _compile_matcher() -> PhraseMatcher:
+    """Merge every phrase list into one automaton, one entry per phrase."""
+    tags: Dict[str, set] = {}
+    for phrases in EMERGENCY_PHRASES.values():
+        for phrase in phrases:
+            tags.setdefault(phrase, set()).add("emergency")
+    for disaster_type, terms in DISASTER_TYPE_TERMS.items():
+        for term in terms:
+            tags.setdefault(term, set()).add(disaster_type)
+    for term in EMERGENCY_CONTEXT_TERMS:
+        tags.setdefault(term, set()).add("context")
+    return PhraseMatcher((phrase, frozenset(phrase_tags)) for phrase, phrase_tags in tags.items())
+
+EMERGENCY_MATCHER = _compile_matcher()
+
+class EmergencyMatch:
+    """
+    Result of scanning one message with ``EMERGENCY_MATCHER``.
+
+    Attributes:
+        phrases: Matched phrases, in order of appearance, without repeats
+        is_emergency: Whether an emergency phrase matched
+        emergency_type: Most frequent disaster type ("General" if none)
+        confidence: Share of the disaster type matches that agree with
+            ``emergency_type`` (0 when none matched)
+        has_context: Whether a disaster type or context term matched
+    """
+
+    def __init__(self, text: str):
+        """
+        Scan a message.
+
+        Args:
+            text: User's message or document chunk
+        """
+        phrases: Dict[str, None] = {}
+        types: Counter = Counter()
+        self.is_emergency = False
+        context = False
+        for phrase, tags in EMERGENCY_MATCHER.find(text):
+            phrases[phrase] = None
+            self.is_emergency = self.is_emergency or "emergency" in tags
+            context = context or "context" in tags
+            types.update(tag for tag in tags if tag in DISASTER_TYPE_TERMS)
+        self.phrases: List[str] = list(phrases)
+        self.has_context = context or bool(types)
+
+        # Ties go to the type listed first (Flood, Earthquake, Fire, Medical)
+        total = sum(types.values())
+        self.emergency_type = "General"
+        self.confidence = 0.0
+        if total:
+            self.emergency_type = max(DISASTER_TYPE_TERMS, key=lambda disaster_type: types[disaster_type])
+            self.confidence = types[self.emergency_type] / total
+
+def match_emergency(text: str) -> EmergencyMatch:
+    """
+    Scan a message for emergency phrases and disaster types in one pass.
+
+    Args:
+        text: User's message
+
+    Returns:
+        EmergencyMatch: Matched phrases, emergency flag and emergency type
+    """
+    return EmergencyMatch(text)
+
+def classify_emergency_type(query: str) -> str:
+    """
+    Guess the emergency type of a message from its keywords.
+
+    Args:
+        query: User's message
+
+    Returns:
+        str: One of ``EMERGENCY_TYPES`` ("General" when nothing specific matches)
+    """
+    return match_emergency(query).emergency_type
+
+def classify_disaster_type(text: str) -> Tuple[str, float]:
+    """
+    Score a text against the disaster types by term counts.
+
+    Args:
+        text: Document chunk or user query
+
+    Returns:
+        Tuple[str, float]: Best type ("General" when no term matches) and
+        its share of all matched terms (0 to 1) as the confidence
+    """
+    match = match_emergency(text)
+    return match.emergency_type, match.confidence
+
+def tag_disaster_type(text: str, min_confidence: float = 0.6) -> str:
+    """
+    Tag a document chunk with its disaster type for sharded retrieval.
+
+    Args:
+        text: Chunk text
+        min_confidence: Share of matched terms the best type needs
+
+    Returns:
+        str: One of ``EMERGENCY_TYPES``; mixed or unrelated chunks are "General"
+    """
+    disaster_type, confidence = classify_disaster_type(text)
+    return disaster_type if confidence >= min_confidence else "General"
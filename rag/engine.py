@@ -0,0 +1,911 @@
+"""
+Process-wide RAG engine.
+
+The engine owns every expensive RAG component (embedding model, Pinecone
+or local FAISS vector store, Gemini LLM and per-language QA chains). It is
+built once per server process and shared by all Streamlit sessions and
+reruns.
+"""
+import os
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+import google.generativeai as genai
+from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_pinecone import PineconeVectorStore
+
+from .admission import AdmissionController, AdmissionRejected
+from .config import load_rag_config, config_fingerprint
+from .chains import ChainRegistry
+from .context import ContextBudgeter
+from .pipeline import STAGES
+from .embeddings import CachedEmbeddings, build_embeddings, normalize_query
+from .degraded import extractive_answer
+from .embedding_service import BatchingEmbeddings
+from .emergency import EMERGENCY_TYPES, classify_disaster_type
+from .local_index import load_lexical_index, load_shards, load_snapshot, load_vectors
+from .metrics import LatencyTracker
+from .playbooks import PlaybookStore
+from .rate_limit import RateLimited, TokenBucketLimiter
+from .resilience import CircuitBreaker, LLMUnavailable, ResilientLLM, build_fake_llm
+from .retrievers import (FaissSearch, HybridRetriever, LexicalRetriever, PineconeSearch, ShardRouter, VectorRetriever,
+                         pinecone_shards)
+from .singleflight import SingleFlight
+from .streaming import AsyncStream
+from .semantic_cache import SemanticCache
+
+logger = logging.getLogger(__name__)
+
+# Engine lifecycle states
+STATE_INITIALIZING = "initializing"
+STATE_READY = "ready"
+STATE_DEGRADED = "degraded"
+STATE_FAILED = "failed"
+
+class RAGEngine:
+    """
+    Shared RAG engine with explicit health and readiness state.
+
+    Components are built off to the side and swapped in atomically, so a
+    hot reload never leaves readers with a half-built engine. If a reload
+    fails the previous components keep serving and the engine reports a
+    degraded state.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        """
+        Initialize the engine without building any component.
+
+        Args:
+            config: Engine configuration (see ``load_rag_config``)
+        """
+        self.config = config
+        self.fingerprint = config_fingerprint(config)
+        self.state = STATE_INITIALIZING
+        self.last_error: Optional[str] = None
+        self.built_at: Optional[float] = None
+        self.build_seconds: Optional[float] = None
+        self.reload_count = 0
+        self._last_attempt = 0.0
+        self._failed_fingerprint: Optional[str] = None
+        self._components: Dict[str, Any] = {}
+        self._reload_lock = threading.Lock()
+        self.ttft = LatencyTracker()
+        # Identical in-flight questions share one generation
+        self.flights = SingleFlight()
+        # RPM/TPM budget for Gemini, shared with other processes through a
+        # state file; kept across reloads so a rebuild cannot reset it
+        self.rate_limiter = TokenBucketLimiter(config["llm_rpm"], config["llm_tpm"])
+        # Opens after consecutive LLM failures; kept across reloads
+        self.breaker = CircuitBreaker()
+        # Bounded, prioritized queue in front of Gemini
+        self.admission = AdmissionController()
+        self._configure_limits(config)
+        # Pipeline stage hooks survive hot reloads
+        self.hooks = {stage: [] for stage in STAGES}
+        self._playbooks = PlaybookStore()
+        self._playbooks_mtime: Optional[float] = None
+        # Worker threads shared by background work for the engine's lifetime
+        self.executor = ThreadPoolExecutor(
+            max_workers=config["worker_threads"],
+            thread_name_prefix="rag-worker"
+        )
+        # Single event loop for async request orchestration; its blocking
+        # calls (asyncio.to_thread) run on the worker threads above
+        self.loop = asyncio.new_event_loop()
+        self.loop.set_default_executor(self.executor)
+        threading.Thread(target=self.loop.run_forever, name="rag-event-loop", daemon=True).start()
+
+    # ------------------------------------------------------------------
+    # Component access
+    # ------------------------------------------------------------------
+    @property
+    def llm(self):
+        """The shared Gemini chat model."""
+        return self._components.get("llm")
+
+    @property
+    def embeddings(self) -> CachedEmbeddings:
+        """The shared query/document embedding model."""
+        return self._components.get("embeddings")
+
+    @property
+    def vectorstore(self):
+        """The shared vector store."""
+        return self._components.get("vectorstore")
+
+    @property
+    def lexical_index(self):
+        """The shared BM25 index (hybrid and lexical modes only)."""
+        return self._components.get("lexical_index")
+
+    @property
+    def router(self) -> Optional[ShardRouter]:
+        """The shared disaster type router (None when disabled or without shards)."""
+        return self._components.get("router")
+
+    @property
+    def budgeter(self) -> Optional[ContextBudgeter]:
+        """The shared context budgeter (None when disabled)."""
+        return self._components.get("budgeter")
+
+    @property
+    def chains(self) -> ChainRegistry:
+        """The shared per-language QA pipeline registry."""
+        return self._components.get("chains")
+
+    @property
+    def answer_cache(self) -> Optional[SemanticCache]:
+        """The shared semantic answer cache (None when disabled)."""
+        return self._components.get("answer_cache")
+
+    @property
+    def playbooks(self) -> PlaybookStore:
+        """
+        The offline emergency playbooks.
+
+        The artifact is reloaded whenever its file changes on disk, so a
+        refreshed build is picked up without rebuilding the engine.
+        """
+        path = self.config["playbooks_path"]
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            mtime = None
+        if mtime != self._playbooks_mtime:
+            try:
+                self._playbooks = PlaybookStore.load(path, self.config["playbooks_require_review"])
+            except (OSError, ValueError) as e:
+                # Keep serving the previous playbooks
+                self.last_error = f"Error loading playbooks: {str(e)}"
+            self._playbooks_mtime = mtime
+        return self._playbooks
+
+    def add_hook(self, stage: str, hook) -> None:
+        """
+        Register a hook on a QA pipeline stage.
+
+        Args:
+            stage: One of ``retrieve``, ``context``, ``prompt`` or ``answer``
+            hook: Callable receiving the stage output
+        """
+        if stage not in self.hooks:
+            raise ValueError(f"Unknown pipeline stage: {stage}")
+        self.hooks[stage].append(hook)
+
+    def get_chain(self, output_lang: str):
+        """
+        Get the compiled QA pipeline for an output language.
+
+        Args:
+            output_lang: Output language selected by the user
+
+        Returns:
+            QAPipeline: Language-specific QA pipeline
+        """
+        return self.chains.get(output_lang)
+
+    # ------------------------------------------------------------------
+    # Answering
+    # ------------------------------------------------------------------
+    def _cached_answer(self, query: str, output_lang: str, response_type: str):
+        """
+        Look up a query in the semantic answer cache.
+
+        Returns:
+            Tuple: (cached answer or None, query vector or None)
+        """
+        cache = self.answer_cache
+        if cache is None:
+            return None, None
+        vector = self.embeddings.embed_query_array(query)
+        return cache.lookup(vector, output_lang, response_type), vector
+
+    def _store_answer(self, vector, output_lang: str, answer: str, response_type: str) -> None:
+        """Store a generated answer in the semantic answer cache."""
+        if self.answer_cache is not None and vector is not None:
+            self.answer_cache.store(vector, output_lang, answer, response_type)
+
+    def answer(self, query: str, output_lang: str, response_type: str = "information",
+               user_id: Optional[str] = None) -> str:
+        """
+        Answer a domain-specific query through the QA pipeline.
+
+        Near-identical questions asked before in the same language are
+        served from the semantic answer cache, and identical questions in
+        flight share one generation. Runs on the engine's event loop.
+
+        Args:
+            query: User's question
+            output_lang: Output language selected by the user
+            response_type: Response type from ``get_response_type``
+            user_id: User asking, for fair scheduling
+
+        Returns:
+            str: Generated (or cached) answer
+        """
+        return self.submit(self.aanswer(query, output_lang, response_type, user_id)).result()
+
+    def answer_batch(self, queries: List[str], output_lang: str, response_type: str = "information",
+                     user_id: Optional[str] = None) -> List[str]:
+        """
+        Answer several queries concurrently on the engine's event loop.
+
+        Each query goes through ``aanswer``, so it gets the same answer
+        cache, coalescing, admission, rate limiting, breaker and degraded
+        fallback as a single question.
+
+        Args:
+            queries: User questions
+            output_lang: Output language of every answer
+            response_type: Response type of every query
+            user_id: User asking, for fair scheduling
+
+        Returns:
+            List[str]: Answers in the order of ``queries``
+        """
+        async def answer_all() -> List[str]:
+            return list(await asyncio.gather(
+                *(self.aanswer(query, output_lang, response_type, user_id) for query in queries)
+            ))
+        return self.submit(answer_all()).result()
+
+    async def aanswer(self, query: str, output_lang: str, response_type: str = "information",
+                      user_id: Optional[str] = None) -> str:
+        """
+        Answer a domain-specific query asynchronously.
+
+        Args:
+            query: User's question
+            output_lang: Output language selected by the user
+            response_type: Response type from ``get_response_type``
+            user_id: User asking, for fair scheduling
+
+        Returns:
+            str: Generated (or cached) answer
+        """
+        cached, vector = await asyncio.to_thread(self._cached_answer, query, output_lang, response_type)
+        if cached is not None:
+            return cached
+        return "".join([part async for part in self._generate(query, output_lang, response_type, vector, user_id)])
+
+    def _degraded(self, query: str, output_lang: str, docs: List[Any], vector) -> str:
+        """Rank the retrieved sentences against the query (blocking, CPU)."""
+        try:
+            if vector is None:
+                vector = self.embeddings.embed_query(query)
+            return extractive_answer(
+                docs,
+                output_lang,
+                embeddings=self.embeddings,
+                query_vector=vector,
+                max_points=self.config["degraded_max_points"],
+                min_score=self.config["degraded_min_score"]
+            )
+        except Exception:
+            logger.exception("Sentence ranking failed; using leading sentences")
+            return extractive_answer(docs, output_lang, max_points=self.config["degraded_max_points"])
+
+    async def _adegraded(self, query: str, output_lang: str, vector=None,
+                         docs: Optional[List[Any]] = None) -> str:
+        """
+        Build an extractive answer from the retrieved chunks without the LLM.
+
+        ``docs`` are the chunks the failed generation already retrieved.
+        Without them (open breaker, rejected admission) the query is
+        retrieved once, for at most ``degraded_retrieval_timeout`` seconds.
+        """
+        if docs is None:
+            try:
+                docs = await asyncio.wait_for(self.chains.retriever.ainvoke(query),
+                                              timeout=self.config["degraded_retrieval_timeout"])
+            except Exception:
+                logger.warning("Retrieval for the degraded answer failed", exc_info=True)
+                docs = []
+        return await asyncio.to_thread(self._degraded, query, output_lang, docs, vector)
+
+    async def _agenerate(self, query: str, output_lang: str, response_type: str, vector,
+                         user_id: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Stream a fresh answer from the pipeline and cache it.
+
+        Waits for an admission slot first. An extractive degraded (uncached)
+        answer is yielded instead when the circuit breaker is open, no slot
+        is granted in time, or the LLM fails (rate limit, deadline, breaker
+        or an API error) before any text was produced.
+        """
+        if self.config["resilience_enabled"] and self.breaker.is_open():
+            yield await self._adegraded(query, output_lang, vector)
+            return
+        try:
+            await self.admission.acquire(response_type, user_id)
+        except AdmissionRejected:
+            yield await self._adegraded(query, output_lang, vector)
+            return
+
+        try:
+            parts = []
+            # Filled with the retrieved chunks, reused by a degraded answer
+            retrieved: Dict[str, Any] = {}
+            try:
+                async for chunk in self.get_chain(output_lang).astream(query, retrieved=retrieved):
+                    parts.append(chunk)
+                    yield chunk
+            except (RateLimited, LLMUnavailable):
+                if parts:
+                    raise
+                yield await self._adegraded(query, output_lang, vector, retrieved.get("docs"))
+                return
+            except Exception:
+                if parts:
+                    raise
+                logger.warning("Generation failed; serving a degraded answer", exc_info=True)
+                yield await self._adegraded(query, output_lang, vector, retrieved.get("docs"))
+                return
+            self._store_answer(vector, output_lang, "".join(parts), response_type)
+        finally:
+            self.admission.release()
+
+    def _generate(self, query: str, output_lang: str, response_type: str, vector,
+                  user_id: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Stream a generated answer, coalescing identical in-flight requests.
+
+        The key is (normalized query, output language, response type); the
+        request that starts a generation is the one that gets scheduled.
+        """
+        if not self.config["coalesce_enabled"]:
+            return self._agenerate(query, output_lang, response_type, vector, user_id)
+        key = (normalize_query(query), ChainRegistry.normalize_language(output_lang), response_type)
+        return self.flights.stream(
+            key,
+            lambda: self._agenerate(query, output_lang, response_type, vector, user_id),
+            timeout=self.config["coalesce_timeout"]
+        )
+
+    def stream_answer(self, query: str, output_lang: str, response_type: str = "information",
+                      user_id: Optional[str] = None) -> Iterator[str]:
+        """
+        Stream the answer to a domain-specific query token by token.
+
+        Blocking wrapper around ``astream_answer``, which runs on the
+        engine's event loop.
+
+        Args:
+            query: User's question
+            output_lang: Output language selected by the user
+            response_type: Response type from ``get_response_type``
+            user_id: User asking, for fair scheduling
+
+        Yields:
+            str: Answer text fragments
+        """
+        yield from AsyncStream(self.loop, lambda: self.astream_answer(query, output_lang, response_type, user_id))
+
+    def start_stream(self, query: str, output_lang: str, response_type: str = "information",
+                     first_token_timeout: Optional[float] = None,
+                     user_id: Optional[str] = None) -> AsyncStream:
+        """
+        Start streaming an answer on the engine's event loop.
+
+        Retrieval begins immediately, so the caller can render instant
+        content or persist messages while the answer is being prepared.
+
+        Args:
+            query: User's question
+            output_lang: Output language selected by the user
+            response_type: Response type from ``get_response_type``
+            first_token_timeout: Seconds allowed before the first token
+            user_id: User asking, for fair scheduling
+
+        Returns:
+            AsyncStream: Iterator over the answer tokens
+        """
+        return AsyncStream(
+            self.loop,
+            lambda: self.astream_answer(query, output_lang, response_type, user_id),
+            first_token_timeout=first_token_timeout
+        )
+
+    async def astream_answer(self, query: str, output_lang: str, response_type: str = "information",
+                             user_id: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Stream the answer to a domain-specific query asynchronously.
+
+        Gemini tokens are yielded as they arrive and time-to-first-token
+        is recorded in ``self.ttft``. Cached answers are yielded in one
+        piece; identical questions in flight share one generation. The
+        cache lookup (which may embed the query on CPU) runs in a worker
+        thread.
+
+        Args:
+            query: User's question
+            output_lang: Output language selected by the user
+            response_type: Response type from ``get_response_type``
+            user_id: User asking, for fair scheduling
+
+        Yields:
+            str: Answer text fragments
+        """
+        started = time.perf_counter()
+        cached, vector = await asyncio.to_thread(self._cached_answer, query, output_lang, response_type)
+        if cached is not None:
+            self.ttft.record(time.perf_counter() - started)
+            yield cached
+            return
+
+        first = True
+        async for chunk in self._generate(query, output_lang, response_type, vector, user_id):
+            if first:
+                self.ttft.record(time.perf_counter() - started)
+                first = False
+            yield chunk
+
+    def submit(self, coro) -> Future:
+        """
+        Run a coroutine on the engine's event loop.
+
+        Args:
+            coro: Coroutine to schedule
+
+        Returns:
+            Future: Thread-safe future of the coroutine result
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    async def _persist(self, persist: Callable[[], Any], after: Optional[Future]) -> Any:
+        """Run a blocking persistence call once ``after`` has finished."""
+        if after is not None:
+            await asyncio.gather(asyncio.wrap_future(after), return_exceptions=True)
+        return await asyncio.to_thread(persist)
+
+    def persist_in_background(self, persist: Callable[[], Any], after: Optional[Future] = None) -> Future:
+        """
+        Persist a chat message off the request's critical path.
+
+        Args:
+            persist: Blocking call that writes the message (must not use
+                Streamlit session state)
+            after: Future that must finish first, to keep messages in order
+
+        Returns:
+            Future: Completes when the message is written
+        """
+        return self.submit(self._persist(persist, after))
+
+    def start_turn(self, query: str, output_lang: str, response_type: str = "information",
+                   persist_user: Optional[Callable[[], Any]] = None,
+                   first_token_timeout: Optional[float] = None,
+                   user_id: Optional[str] = None) -> AsyncStream:
+        """
+        Start one chat turn on the engine's event loop.
+
+        Writing the user message overlaps retrieval and generation, so the
+        turn takes roughly retrieval plus generation time. The returned
+        stream's ``persisted`` future completes once the user message is
+        written; chain the assistant message on it with
+        ``persist_in_background(..., after=stream.persisted)``.
+
+        Args:
+            query: User's question
+            output_lang: Output language selected by the user
+            response_type: Response type from ``get_response_type``
+            persist_user: Blocking call that writes the user message
+            first_token_timeout: Seconds allowed before the first token
+            user_id: User asking, for fair scheduling
+
+        Returns:
+            AsyncStream: Iterator over the answer tokens
+        """
+        persisted = self.persist_in_background(persist_user) if persist_user else None
+        stream = AsyncStream(
+            self.loop,
+            lambda: self.astream_answer(query, output_lang, response_type, user_id),
+            first_token_timeout=first_token_timeout
+        )
+        stream.persisted = persisted
+        return stream
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+    def _build(self, config: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Build every engine component for a configuration.
+
+        Args:
+            config: Engine configuration
+
+        Returns:
+            Dict[str, Any]: Freshly built components
+        """
+        backend = config["retrieval_backend"]
+        mode = config["retrieval_mode"]
+        if backend not in ("pinecone", "faiss"):
+            raise ValueError(f"Unknown retrieval backend: {backend}")
+        if mode not in ("vector", "hybrid", "lexical"):
+            raise ValueError(f"Unknown retrieval mode: {mode}")
+        if config["llm_backend"] not in ("gemini", "fake"):
+            raise ValueError(f"Unknown LLM backend: {config['llm_backend']}")
+        if config["llm_backend"] == "gemini" and not config.get("google_api_key"):
+            raise ValueError("Please set up API keys in Streamlit Cloud secrets")
+        if backend == "pinecone" and mode != "lexical" and not config.get("pinecone_api_key"):
+            raise ValueError("Please set up API keys in Streamlit Cloud secrets")
+
+        if config["llm_backend"] == "gemini":
+            genai.configure(api_key=config["google_api_key"])
+
+        # Initialize embeddings; query vectors are memoized and shared by
+        # the vector store, the answer cache and any other consumer
+        base_embeddings = build_embeddings(config)
+        if config["embedding_service_enabled"]:
+            # Cache misses from concurrent sessions are encoded together
+            base_embeddings = BatchingEmbeddings(
+                base_embeddings,
+                max_wait_ms=config["embedding_service_max_wait_ms"],
+                max_batch_size=config["embedding_service_max_batch"]
+            )
+        embeddings = CachedEmbeddings(
+            base_embeddings,
+            max_bytes=config["query_embedding_cache_bytes"]
+        )
+
+        # BM25 index over the snapshot chunks for hybrid and lexical modes
+        lexical_index = None
+        if mode != "vector":
+            lexical_index = load_lexical_index(
+                config["faiss_index_dir"],
+                k1=config["bm25_k1"],
+                b=config["bm25_b"]
+            )
+
+        # Initialize vector store (lexical mode retrieves without one).
+        # Searches return stored chunk vectors for the context budgeter.
+        vectorstore = None
+        search = None
+        shards = {}
+        if mode != "lexical" and backend == "faiss":
+            # Local memory-mapped snapshot, no network round trip
+            vectorstore = load_snapshot(
+                config["faiss_index_dir"],
+                embeddings,
+                documents=lexical_index.documents if lexical_index else None
+            )
+            # A compressed index only shortlists candidates; they are
+            # rescored against the full-width vectors so the score
+            # thresholds below still compare cosine similarities
+            full_vectors = load_vectors(config["faiss_index_dir"])
+            rescore = config["index_rescore_factor"]
+            search = FaissSearch(vectorstore, vectors=full_vectors, rescore=rescore)
+            if config["routing_enabled"]:
+                shards = {
+                    disaster_type: FaissSearch(vectorstore, index=index, positions=positions,
+                                               vectors=full_vectors, rescore=rescore)
+                    for disaster_type, (index, positions) in load_shards(config["faiss_index_dir"]).items()
+                }
+        elif mode != "lexical":
+            from pinecone import Pinecone
+            pc = Pinecone(api_key=config["pinecone_api_key"])
+            index = pc.Index(config["index_name"])
+            vectorstore = PineconeVectorStore(
+                index=index,
+                embedding=embeddings,
+                text_key="text"
+            )
+            search = PineconeSearch(index, text_key="text")
+            if config["routing_enabled"]:
+                # Chunks are tagged with their disaster type at ingestion;
+                # only types with tagged vectors get a shard
+                shards = pinecone_shards(index, [t for t in EMERGENCY_TYPES if t != "General"], text_key="text")
+
+        # Confidently classified queries search only their disaster type
+        router = None
+        if shards:
+            router = ShardRouter(
+                search,
+                shards,
+                classify_disaster_type,
+                min_confidence=config["routing_min_confidence"],
+                min_score=config["score_threshold"]
+            )
+
+        # Create Gemini LLM (or the latency-injecting fake for load tests)
+        if config["llm_backend"] == "fake":
+            llm = build_fake_llm(config)
+        else:
+            # Under ResilientLLM only its hedges retry: client retries would
+            # run inside the deadline without being charged to the rate limit
+            retries, timeout = config["llm_max_retries"], config["llm_timeout"]
+            if config["resilience_enabled"]:
+                retries, timeout = 0, min(timeout, config["llm_deadline"])
+            llm = ChatGoogleGenerativeAI(
+                model=config["llm_model"],
+                temperature=config["llm_temperature"],
+                google_api_key=config["google_api_key"],
+                max_retries=retries,
+                timeout=timeout,
+                max_output_tokens=config["llm_max_output_tokens"]
+            )
+        if config["resilience_enabled"]:
+            # Deadline, hedged attempts and circuit breaker around the model
+            llm = ResilientLLM(
+                llm,
+                self.breaker,
+                deadline=config["llm_deadline"],
+                hedge=config["hedge_enabled"],
+                hedge_delay=config["hedge_delay"],
+                hedge_min_delay=config["hedge_min_delay"],
+                hedge_percentile=config["hedge_percentile"],
+                hedge_min_samples=config["hedge_min_samples"],
+                limiter=self.rate_limiter if config["rate_limit_enabled"] else None
+            )
+
+        # Adaptive k: RAG_TOP_K becomes the maximum and the similarity
+        # scores decide how many chunks a query actually gets
+        adaptive = {}
+        if config["adaptive_k_enabled"]:
+            adaptive = {
+                "min_k": config["min_k"],
+                "score_threshold": config["score_threshold"],
+                "score_gap": config["score_gap"],
+            }
+
+        if mode == "lexical":
+            retriever = LexicalRetriever(index=lexical_index, k=config["top_k"])
+        elif mode == "hybrid":
+            # Vector and BM25 rankings fused with reciprocal rank fusion
+            retriever = HybridRetriever(
+                vector_retriever=VectorRetriever(
+                    search=search,
+                    router=router,
+                    embeddings=embeddings,
+                    k=config["hybrid_candidates"],
+                    score_threshold=adaptive.get("score_threshold")
+                ),
+                index=lexical_index,
+                k=config["top_k"],
+                candidates=config["hybrid_candidates"],
+                rrf_k=config["rrf_k"]
+            )
+        else:
+            retriever = VectorRetriever(search=search, router=router, embeddings=embeddings, k=config["top_k"],
+                                        **adaptive)
+
+        # Near-duplicate chunks are dropped and the rest packed into a token budget
+        budgeter = None
+        if config["context_budget_enabled"]:
+            budgeter = ContextBudgeter(
+                embeddings,
+                max_tokens=config["context_max_tokens"],
+                dedupe_threshold=config["context_dedupe_threshold"],
+                chars_per_token=config["context_chars_per_token"]
+            )
+
+        # QA pipelines are compiled lazily per output language
+        chains = ChainRegistry(
+            llm=llm,
+            retriever=retriever,
+            hooks=self.hooks,
+            budgeter=budgeter,
+            limiter=self.rate_limiter if config["rate_limit_enabled"] else None
+        )
+
+        # Semantic answer cache keyed by query embedding and language
+        answer_cache = None
+        if config["semantic_cache_enabled"]:
+            answer_cache = SemanticCache(
+                dimension=len(embeddings.embed_query("flood")),
+                threshold=config["semantic_cache_threshold"],
+                max_entries=config["semantic_cache_max_entries"],
+                ttl=config["semantic_cache_ttl"],
+                type_ttls={"emergency": config["semantic_cache_emergency_ttl"]}
+            )
+
+        return {
+            "embeddings": embeddings,
+            "answer_cache": answer_cache,
+            "vectorstore": vectorstore,
+            "lexical_index": lexical_index,
+            "router": router,
+            "budgeter": budgeter,
+            "llm": llm,
+            "chains": chains,
+        }
+
+    @staticmethod
+    def _close(components: Dict[str, Any]) -> None:
+        """Release background resources of replaced components."""
+        embeddings = components.get("embeddings")
+        if embeddings is not None:
+            embeddings.close()
+
+    def _configure_limits(self, config: Dict[str, Any]) -> None:
+        """Apply the admission, rate-limit and circuit-breaker settings of a configuration."""
+        self.breaker.configure(
+            failure_threshold=config["breaker_failure_threshold"],
+            reset_timeout=config["breaker_reset_timeout"]
+        )
+        self.rate_limiter.configure(
+            rpm=config["llm_rpm"],
+            tpm=config["llm_tpm"],
+            state_path=config["rate_limit_state_path"] or None,
+            max_wait=config["rate_limit_max_wait"],
+            sync_interval=config["rate_limit_sync_interval"]
+        )
+        # Low budget defers non-emergency work instead of queuing it at Gemini
+        self.admission.configure(
+            max_concurrency=config["llm_max_concurrency"],
+            max_queue=config["llm_max_queue"],
+            queue_timeouts={"emergency": config["emergency_queue_timeout"]},
+            default_timeout=config["llm_queue_timeout"],
+            budget=self.rate_limiter.fraction if config["rate_limit_enabled"] else None,
+            reserve=config["rate_limit_reserve"]
+        )
+
+    def _is_stale(self, config: Dict[str, Any]) -> bool:
+        """Check whether the engine should be rebuilt for a configuration."""
+        fingerprint = config_fingerprint(config)
+        if fingerprint == self.fingerprint and self.state != STATE_FAILED:
+            return False
+        if self.state == STATE_FAILED or fingerprint == self._failed_fingerprint:
+            # Back off before retrying a build that already failed
+            return time.time() - self._last_attempt >= config["retry_interval"]
+        return True
+
+    def reload(self, config: Optional[Dict[str, Any]] = None, force: bool = True) -> bool:
+        """
+        Build (or rebuild) the engine components and swap them in.
+
+        Only one build runs at a time; concurrent callers wait for it and
+        then observe its outcome.
+
+        Args:
+            config: New configuration (keeps the current one if None)
+            force: Rebuild even if the configuration did not change
+
+        Returns:
+            bool: True if the engine is serving after the call
+        """
+        with self._reload_lock:
+            config = config or self.config
+            if not force and not self._is_stale(config):
+                return self.is_ready()
+
+            self._last_attempt = time.time()
+            started = time.perf_counter()
+            try:
+                components = self._build(config)
+            except Exception as e:
+                self.last_error = str(e)
+                self._failed_fingerprint = config_fingerprint(config)
+                # Keep serving the previous components if there are any
+                self.state = STATE_DEGRADED if self._components else STATE_FAILED
+                return bool(self._components)
+
+            previous, self._components = self._components, components
+            self._close(previous)
+            self.config = config
+            self._configure_limits(config)
+            self.fingerprint = config_fingerprint(config)
+            self._failed_fingerprint = None
+            self.build_seconds = time.perf_counter() - started
+            self.built_at = time.time()
+            self.last_error = None
+            self.state = STATE_READY
+            self.reload_count += 1
+            return True
+
+    def ensure_current(self, config: Dict[str, Any]) -> None:
+        """
+        Hot-reload the engine if its configuration changed.
+
+        While components are already serving, the rebuild runs in a
+        background thread and readers keep using the old components until
+        the swap. A failed engine is retried at most once per
+        ``retry_interval`` seconds.
+
+        Args:
+            config: The latest configuration
+        """
+        if not self._is_stale(config):
+            return
+        if not self._components:
+            self.reload(config, force=False)
+        elif not self._reload_lock.locked():
+            threading.Thread(
+                target=self.reload,
+                args=(config, False),
+                name="rag-engine-reload",
+                daemon=True
+            ).start()
+
+    def is_ready(self) -> bool:
+        """Check whether the engine can serve queries."""
+        return self.state in (STATE_READY, STATE_DEGRADED)
+
+    def health(self) -> Dict[str, Any]:
+        """
+        Report the engine health.
+
+        Returns:
+            Dict[str, Any]: State, readiness and build information
+        """
+        return {
+            "state": self.state,
+            "ready": self.is_ready(),
+            "fingerprint": self.fingerprint,
+            "built_at": self.built_at,
+            "build_seconds": self.build_seconds,
+            "reload_count": self.reload_count,
+            "reloading": self._reload_lock.locked(),
+            "last_error": self.last_error,
+            "retrieval_backend": self.config.get("retrieval_backend"),
+            "retrieval_mode": self.config.get("retrieval_mode"),
+            "index_name": self.config.get("index_name"),
+            "embedding_backend": self.config.get("embedding_backend"),
+            "llm_backend": self.config.get("llm_backend"),
+            "llm_model": self.config.get("llm_model"),
+            "compiled_languages": self.chains.compiled_languages() if self.chains else [],
+            "query_embeddings": self.embeddings.stats() if self.embeddings else None,
+            "embedding_service": self.embeddings.base.stats()
+            if self.embeddings and isinstance(self.embeddings.base, BatchingEmbeddings) else None,
+            "answer_cache": self.answer_cache.stats() if self.answer_cache else None,
+            "routing": self.router.stats() if self.router else None,
+            "context_budget": self.budgeter.stats() if self.budgeter else None,
+            "time_to_first_token": self.ttft.summary(),
+            "coalescing": self.flights.stats(),
+            "admission": self.admission.stats(),
+            "rate_limit": self.rate_limiter.stats() if self.config.get("rate_limit_enabled") else None,
+            "resilience": self.llm.stats() if isinstance(self.llm, ResilientLLM) else None,
+            "playbooks": {"version": self._playbooks.version, "servable": len(self._playbooks)},
+        }
+
+_engine: Optional[RAGEngine] = None
+_engine_lock = threading.Lock()
+
+def get_engine(config: Optional[Dict[str, Any]] = None) -> RAGEngine:
+    """
+    Get the process-wide RAG engine, building it on first use.
+
+    Subsequent calls return the same engine and hot-reload it when the
+    configuration changed since it was built.
+
+    Args:
+        config: Configuration to use (loaded from secrets if None)
+
+    Returns:
+        RAGEngine: The shared engine
+    """
+    global _engine
+    config = config or load_rag_config()
+
+    with _engine_lock:
+        if _engine is None:
+            engine = RAGEngine(config)
+            engine.reload(config)
+            _engine = engine
+            return _engine
+
+    _engine.ensure_current(config)
+    return _engine
+
+def reload_engine(config: Optional[Dict[str, Any]] = None) -> bool:
+    """
+    Force a hot reload of the process-wide engine.
+
+    Args:
+        config: Configuration to use (loaded from secrets if None)
+
+    Returns:
+        bool: True if the engine is serving after the reload
+    """
+    config = config or load_rag_config()
+    with _engine_lock:
+        engine = _engine
+    if engine is None:
+        return get_engine(config).is_ready()
+    return engine.reload(config)
@@ -0,0 +1,298 @@
+"""
+Compressed FAISS indexes: reduced dimensions and product quantization.
+
+Memory and scan time of the local index grow with the embedding width
+(384 floats for MiniLM). ``RAG_INDEX_COMPRESSION`` selects a compressed
+layout for the snapshot, written as comma-separated stages:
+
+- ``pcaN``: project onto the N principal directions of the corpus
+- ``truncateN``: keep the first N dimensions (Matryoshka-trained models)
+- ``pqM`` or ``pqMxB``: product quantization with M codes of B bits
+  (default 8) per vector
+
+e.g. ``pca128``, ``pq48`` or ``pca128,pq16``. An empty value (or
+``flat``) keeps full float32 vectors.
+
+The projection is fitted when the snapshot is written and stored inside
+``index.faiss`` as a FAISS pre-transform, so queries are projected the
+same way as the chunks. Compressed scores are only approximate (a
+re-normalized projection inflates them, quantization shrinks them), so a
+compressed snapshot also keeps the full-width vectors on disk and
+``FaissSearch`` rescores its best candidates against them: the score
+thresholds still compare cosine similarities.
+
+Compare settings on the current corpus with::
+
+    python -m rag.index_compression benchmark --specs flat pca128 pca128,pq16
+"""
+import re
+import sys
+import json
+import time
+import argparse
+from typing import Any, Dict, Iterable, List, Optional
+
+import faiss
+import numpy as np
+
+# Rows used to fit the projection and train the quantizer
+TRAIN_SAMPLE = 65536
+ADD_BLOCK = 8192
+
+_STAGE = re.compile(r"^(pca|truncate)(\d+)$|^pq(\d+)(?:x(\d+))?$")
+
+def parse_spec(spec: str) -> Dict[str, Any]:
+    """
+    Parse a compression spec.
+
+    Args:
+        spec: e.g. ``"pca128,pq16"`` (empty or ``"flat"`` for none)
+
+    Returns:
+        Dict[str, Any]: ``projection`` (None, "pca" or "truncate"),
+        ``dimension``, ``pq_m`` and ``pq_bits`` (``pq_m`` 0 = no PQ)
+
+    Raises:
+        ValueError: If the spec is malformed
+    """
+    parsed = {"projection": None, "dimension": None, "pq_m": 0, "pq_bits": 8}
+    for stage in filter(None, (part.strip().lower() for part in (spec or "").split(","))):
+        if stage == "flat":
+            continue
+        match = _STAGE.match(stage)
+        if not match:
+            raise ValueError(f"Unknown index compression stage '{stage}'")
+        if match.group(1):
+            if parsed["projection"] or parsed["pq_m"]:
+                raise ValueError(f"'{stage}' must be the first stage of '{spec}'")
+            parsed["projection"], parsed["dimension"] = match.group(1), int(match.group(2))
+        else:
+            if parsed["pq_m"]:
+                raise ValueError(f"Only one pq stage is allowed in '{spec}'")
+            parsed["pq_m"] = int(match.group(3))
+            parsed["pq_bits"] = int(match.group(4) or 8)
+    return parsed
+
+def _sample(vectors: np.ndarray, size: int, seed: int = 0) -> np.ndarray:
+    """Random rows of ``vectors`` (all of them if there are fewer)."""
+    if len(vectors) <= size:
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+    rows = np.sort(np.random.default_rng(seed).choice(len(vectors), size, replace=False))
+    return np.ascontiguousarray(vectors[rows], dtype=np.float32)
+
+def fit_projection(vectors: np.ndarray, method: str, dimension: int) -> np.ndarray:
+    """
+    Fit an orthonormal projection matrix.
+
+    ``pca`` keeps the directions that carry most of the vectors' energy.
+    The corpus mean is not subtracted: inner products between projected
+    vectors then approximate the original ones, which is what the
+    inner-product index ranks by.
+
+    Args:
+        vectors: Chunk vectors, one per row (may be memory-mapped)
+        method: "pca" or "truncate"
+        dimension: Output dimension
+
+    Returns:
+        np.ndarray: ``(dimension, input dimension)`` float32 matrix with
+        orthonormal rows
+    """
+    width = vectors.shape[1]
+    if not 0 < dimension < width:
+        raise ValueError(f"Projection dimension must be between 1 and {width - 1}, got {dimension}")
+    if method == "truncate":
+        return np.eye(dimension, width, dtype=np.float32)
+
+    moments = np.zeros((width, width), dtype=np.float64)
+    for start in range(0, len(vectors), ADD_BLOCK):
+        block = np.asarray(vectors[start:start + ADD_BLOCK], dtype=np.float64)
+        moments += block.T @ block
+    eigenvalues, eigenvectors = np.linalg.eigh(moments)
+    order = np.argsort(eigenvalues)[::-1][:dimension]
+    return np.ascontiguousarray(eigenvectors[:, order].T, dtype=np.float32)
+
+def build_index(vectors: np.ndarray, spec: str = ""):
+    """
+    Build an inner-product FAISS index over normalized vectors.
+
+    Args:
+        vectors: Normalized float32 vectors, one per row (may be memory-mapped)
+        spec: Compression spec (see ``parse_spec``)
+
+    Returns:
+        faiss.Index: Index searched with full-width query vectors
+
+    Raises:
+        ValueError: If the spec does not fit the vectors
+    """
+    options = parse_spec(spec)
+    width = vectors.shape[1]
+    dimension = options["dimension"] or width
+
+    if options["pq_m"]:
+        m, bits = options["pq_m"], options["pq_bits"]
+        if dimension % m:
+            raise ValueError(f"pq{m} needs a dimension divisible by {m}, got {dimension}")
+        if len(vectors) < 2 ** bits:
+            raise ValueError(f"pq{m}x{bits} needs at least {2 ** bits} chunks to train, got {len(vectors)}")
+        index = faiss.IndexPQ(dimension, m, bits, faiss.METRIC_INNER_PRODUCT)
+    else:
+        index = faiss.IndexFlatIP(dimension)
+
+    if options["projection"]:
+        matrix = fit_projection(vectors, options["projection"], dimension)
+        projection = faiss.LinearTransform(width, dimension, False)
+        faiss.copy_array_to_vector(matrix.ravel(), projection.A)
+        projection.is_trained = True
+        projection.set_is_orthonormal()
+        # Chain: project, then re-normalize so scores stay in the cosine
+        # range (they still differ from the full-width cosines)
+        index = faiss.IndexPreTransform(faiss.NormalizationTransform(dimension, 2.0), index)
+        index.prepend_transform(projection)
+
+    if not index.is_trained:
+        index.train(_sample(vectors, TRAIN_SAMPLE))
+    for start in range(0, len(vectors), ADD_BLOCK):
+        index.add(np.ascontiguousarray(vectors[start:start + ADD_BLOCK], dtype=np.float32))
+    return index
+
+def is_compressed(spec: str) -> bool:
+    """Whether a spec changes the index scores (anything but flat)."""
+    options = parse_spec(spec)
+    return bool(options["projection"] or options["pq_m"])
+
+def index_bytes(index) -> int:
+    """Serialized size of an index."""
+    return int(faiss.serialize_index(index).size)
+
+# ----------------------------------------------------------------------
+# Benchmark
+# ----------------------------------------------------------------------
+def _exact_neighbours(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """Exact top-k positions by inner product."""
+    index = faiss.IndexFlatIP(vectors.shape[1])
+    for start in range(0, len(vectors), ADD_BLOCK):
+        index.add(np.ascontiguousarray(vectors[start:start + ADD_BLOCK], dtype=np.float32))
+    return index.search(queries, k)[1]
+
+def benchmark(vectors: np.ndarray, queries: np.ndarray, specs: Iterable[str], k: int = 6,
+              exclude: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+    """
+    Compare compression specs by recall@k, latency and memory.
+
+    Args:
+        vectors: Full-width chunk vectors
+        queries: Full-width query vectors
+        specs: Compression specs to compare
+        k: Neighbours per query (``RAG_TOP_K``)
+        exclude: Per-query position to ignore (the query's own chunk
+            when queries are sampled from the corpus), or None
+
+    Returns:
+        List[Dict[str, Any]]: One row per spec: build seconds, index MB,
+        bytes per vector, median and p95 single-query latency in ms, and
+        recall@k against exact full-width search
+    """
+    extra = 1 if exclude is not None else 0
+
+    def top(positions: np.ndarray) -> List[set]:
+        rows = []
+        for i, row in enumerate(positions):
+            kept = [int(p) for p in row if p >= 0 and (exclude is None or p != exclude[i])]
+            rows.append(set(kept[:k]))
+        return rows
+
+    truth = top(_exact_neighbours(vectors, queries, k + extra))
+    results = []
+    for spec in specs:
+        started = time.perf_counter()
+        index = build_index(vectors, spec)
+        build_seconds = time.perf_counter() - started
+
+        latencies = []
+        found = []
+        for query in queries:
+            started = time.perf_counter()
+            found.append(index.search(query[None, :], k + extra)[1][0])
+            latencies.append((time.perf_counter() - started) * 1000)
+        recall = np.mean([len(hit & want) / max(len(want), 1) for hit, want in zip(top(found), truth)])
+
+        size = index_bytes(index)
+        results.append({
+            "spec": spec or "flat",
+            "build_s": round(build_seconds, 2),
+            "index_mb": round(size / 2 ** 20, 2),
+            "bytes_per_vector": round(size / len(vectors), 1),
+            "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+            f"recall@{k}": round(float(recall), 4),
+        })
+    return results
+
+def _corpus_vectors(config: Dict[str, Any], index_dir: str) -> np.ndarray:
+    """Full-width vectors of the snapshot chunks, re-embedded if compressed."""
+    from .embeddings import build_embeddings
+    from .local_index import INDEX_FILE, read_docstore, verify_snapshot
+
+    manifest = verify_snapshot(index_dir, check_checksums=False)
+    if not manifest.get("compression"):
+        index = faiss.read_index(f"{index_dir}/{INDEX_FILE}")
+        return index.reconstruct_n(0, index.ntotal)
+
+    print("Snapshot is compressed; re-embedding its chunks for the benchmark")
+    texts = [doc.page_content for doc in read_docstore(index_dir)]
+    return np.asarray(build_embeddings(config).embed_documents(texts), dtype=np.float32)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point for benchmarking compression settings."""
+    from .config import load_rag_config
+    from .embeddings import build_embeddings
+    from .local_index import SnapshotError
+
+    config = load_rag_config()
+    parser = argparse.ArgumentParser(description="Benchmark compressed FAISS index settings")
+    parser.add_argument("command", choices=["benchmark"])
+    parser.add_argument("--index-dir", default=config["faiss_index_dir"])
+    parser.add_argument("--specs", nargs="+", default=["flat", "pca256", "pca128", "pca64", "pq48", "pca128,pq16"])
+    parser.add_argument("--queries", help="Text file with one question per line (default: sampled chunks)")
+    parser.add_argument("--num-queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=config["top_k"])
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args(argv)
+
+    try:
+        vectors = _corpus_vectors(config, args.index_dir)
+    except SnapshotError as e:
+        print(f"Snapshot error: {e}", file=sys.stderr)
+        return 1
+
+    exclude = None
+    if args.queries:
+        with open(args.queries, encoding="utf-8") as f:
+            questions = [line.strip() for line in f if line.strip()]
+        queries = np.asarray(build_embeddings(config).embed_documents(questions), dtype=np.float32)
+    else:
+        # Chunks as queries, each ignoring itself
+        rng = np.random.default_rng(0)
+        exclude = rng.choice(len(vectors), min(args.num_queries, len(vectors)), replace=False)
+        queries = np.ascontiguousarray(vectors[exclude], dtype=np.float32)
+
+    try:
+        results = benchmark(vectors, queries, args.specs, k=args.k, exclude=exclude)
+    except ValueError as e:
+        print(f"Benchmark error: {e}", file=sys.stderr)
+        return 1
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+    print(f"{len(vectors)} chunks, {vectors.shape[1]} dimensions, {len(queries)} queries")
+    columns = list(results[0])
+    print(" | ".join(columns))
+    for result in results:
+        print(" | ".join(str(result[c]) for c in columns))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
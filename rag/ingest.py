@@ -0,0 +1,673 @@
+"""
+Streaming, incremental ingestion of the source corpus into the index.
+
+Source documents flow through a chain of generators, so memory stays
+flat however large the corpus is:
+
+1. ``iter_source_documents`` yields one PDF page (or text file) at a time.
+2. ``iter_chunks`` splits each page, tags every chunk with its disaster
+   type and gives it a content address: a hash of its source, page, tag
+   and text.
+3. A ledger (SQLite, one per target) remembers the chunks already in the
+   target, so unchanged chunks are skipped and only new or changed ones
+   are embedded.
+4. ``EmbeddingPool`` embeds large batches in a pool of worker processes,
+   each loading the model once.
+5. A sink upserts the vectors in bulk batches. When the whole corpus has
+   been streamed, chunks that were not seen again are tombstoned
+   (deleted from the target and the ledger).
+
+Targets:
+
+- ``pinecone``: the ``RAG_INDEX_NAME`` index, upserted and deleted in place.
+- ``faiss``: the local FAISS/BM25 snapshot in ``RAG_FAISS_INDEX_DIR``.
+  Vectors are kept in the ledger and the snapshot is rewritten from it
+  (through a memory-mapped array) when anything changed.
+
+Usage:
+    python -m rag.ingest run --target faiss
+    python -m rag.ingest run --target pinecone --reset-index   # first run on a legacy index
+    python -m rag.ingest status --target pinecone
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from .embeddings import build_embeddings
+from .emergency import tag_disaster_type
+from .local_index import iter_source_documents, verify_snapshot, write_snapshot, SnapshotError
+
+# Ids per ``IN (...)`` clause of a ledger query
+MAX_SQL_PARAMS = 900
+
+class IngestError(Exception):
+    """Raised when an ingestion run cannot proceed safely."""
+
+def chunk_id(source: str, page: Any, text: str, disaster_type: str = "General") -> str:
+    """
+    Content address of a chunk.
+
+    Args:
+        source: Source file, relative to the source directory
+        page: Page number (None for text files)
+        text: Chunk text
+        disaster_type: Routing tag of the chunk
+
+    Returns:
+        str: 32 hex characters; any change to the inputs changes the id, so
+        a re-tagged chunk is written again under its new tag
+    """
+    return hashlib.sha256(f"{source}\0{page}\0{disaster_type}\0{text}".encode("utf-8")).hexdigest()[:32]
+
+def iter_chunks(pages: Iterable[Document], chunk_size: int, chunk_overlap: int) -> Iterator[Document]:
+    """
+    Split source pages into chunks, one page at a time.
+
+    Args:
+        pages: Source documents (one per page)
+        chunk_size: Maximum chunk length in characters
+        chunk_overlap: Overlap between consecutive chunks in characters
+
+    Yields:
+        Document: Chunks tagged with ``metadata["disaster_type"]``, with
+        ``Document.id`` set to their content address
+    """
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    for page in pages:
+        for chunk in splitter.split_documents([page]):
+            chunk.metadata["disaster_type"] = tag_disaster_type(chunk.page_content)
+            chunk.id = chunk_id(chunk.metadata.get("source", ""), chunk.metadata.get("page"), chunk.page_content,
+                                chunk.metadata["disaster_type"])
+            yield chunk
+
+def batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Group an iterable into lists of ``size`` items."""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+# ----------------------------------------------------------------------
+# Embedding workers
+# ----------------------------------------------------------------------
+_worker_embeddings = None
+
+def init_worker(config: Dict[str, Any]) -> None:
+    """Load the embedding model once per worker process, single-threaded."""
+    global _worker_embeddings
+    # One process per core; keep each one from spawning its own thread pool
+    os.environ["OMP_NUM_THREADS"] = "1"
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    try:
+        import torch
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+    _worker_embeddings = build_embeddings(dict(config, onnx_threads=1))
+
+def embed_in_worker(texts: List[str]) -> np.ndarray:
+    """Embed a batch of texts with the model loaded by ``init_worker``."""
+    return np.asarray(_worker_embeddings.embed_documents(texts), dtype=np.float32)
+
+def default_workers() -> int:
+    """Worker processes for the host: one per core."""
+    return os.cpu_count() or 1
+
+class EmbeddingPool:
+    """
+    Embeds batches of texts in worker processes, in order.
+
+    At most ``max_pending`` batches are in flight, so a fast producer never
+    piles up texts or vectors in memory. With one worker the model runs in
+    the calling process instead.
+    """
+
+    def __init__(self, config: Dict[str, Any], workers: int = 0, max_pending: Optional[int] = None):
+        """
+        Initialize the pool (processes start on ``__enter__``).
+
+        Args:
+            config: Engine configuration selecting the embedding model
+            workers: Worker processes (0 = one per core)
+            max_pending: Batches in flight (defaults to twice the workers)
+        """
+        self.config = config
+        self.workers = workers or default_workers()
+        self.max_pending = max_pending or 2 * self.workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._local = None
+
+    def __enter__(self) -> "EmbeddingPool":
+        if self.workers == 1:
+            self._local = build_embeddings(self.config)
+        else:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                # spawn: torch and tokenizers threads do not survive fork
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_worker,
+                initargs=(self.config,)
+            )
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def map(self, batches: Iterable[Tuple[Any, List[str]]]) -> Iterator[Tuple[Any, np.ndarray]]:
+        """
+        Embed batches, keeping each batch's tag with its vectors.
+
+        Args:
+            batches: (tag, texts) pairs
+
+        Yields:
+            Tuple[Any, np.ndarray]: (tag, float32 vectors) in input order
+        """
+        if self._local is not None:
+            for tag, texts in batches:
+                yield tag, np.asarray(self._local.embed_documents(texts), dtype=np.float32)
+            return
+
+        pending: Deque[Tuple[Any, Any]] = deque()
+        for tag, texts in batches:
+            pending.append((tag, self._executor.submit(embed_in_worker, texts)))
+            if len(pending) >= self.max_pending:
+                tag, future = pending.popleft()
+                yield tag, future.result()
+        while pending:
+            tag, future = pending.popleft()
+            yield tag, future.result()
+
+# ----------------------------------------------------------------------
+# Ledger
+# ----------------------------------------------------------------------
+class IngestLedger:
+    """
+    SQLite record of the chunks ingested into one target.
+
+    Each chunk row holds the run that last saw it; rows not seen by a
+    completed run are the tombstones of that run. For the FAISS target the
+    rows also hold the chunk text, metadata and vector.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open (or create) a ledger.
+
+        Args:
+            path: SQLite file
+        """
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                id TEXT PRIMARY KEY,
+                run INTEGER NOT NULL,
+                text TEXT,
+                metadata TEXT,
+                vector BLOB
+            );
+            CREATE INDEX IF NOT EXISTS chunks_run ON chunks (run);
+            CREATE TABLE IF NOT EXISTS runs (
+                run INTEGER PRIMARY KEY AUTOINCREMENT,
+                started_at REAL NOT NULL,
+                finished_at REAL,
+                stats TEXT
+            );
+        """)
+        self.db.commit()
+
+    def close(self) -> None:
+        """Close the database."""
+        self.db.close()
+
+    def begin_run(self) -> int:
+        """Start a run and return its number."""
+        cursor = self.db.execute("INSERT INTO runs (started_at) VALUES (?)", (time.time(),))
+        self.db.commit()
+        return cursor.lastrowid
+
+    def finish_run(self, run: int, stats: Dict[str, Any]) -> None:
+        """Record the outcome of a completed run."""
+        self.db.execute("UPDATE runs SET finished_at = ?, stats = ? WHERE run = ?",
+                        (time.time(), json.dumps(stats), run))
+        self.db.commit()
+
+    def last_runs(self, limit: int = 5) -> List[Dict[str, Any]]:
+        """Most recent runs, newest first."""
+        rows = self.db.execute(
+            "SELECT run, started_at, finished_at, stats FROM runs ORDER BY run DESC LIMIT ?", (limit,)
+        ).fetchall()
+        return [
+            {"run": run, "started_at": started, "finished_at": finished, "stats": json.loads(stats) if stats else None}
+            for run, started, finished, stats in rows
+        ]
+
+    def count(self) -> int:
+        """Number of chunks in the target."""
+        return self.db.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def fingerprint(self) -> str:
+        """
+        Hash the chunk ids, which change with any chunk's source, page or text.
+
+        Returns:
+            str: Hex digest of the ledger contents
+        """
+        digest = hashlib.sha256()
+        cursor = self.db.execute("SELECT id FROM chunks ORDER BY id")
+        while True:
+            rows = cursor.fetchmany(4096)
+            if not rows:
+                return digest.hexdigest()
+            digest.update("\n".join(row[0] for row in rows).encode("utf-8") + b"\n")
+
+    def completed_runs(self) -> int:
+        """Number of runs that finished."""
+        return self.db.execute("SELECT COUNT(*) FROM runs WHERE finished_at IS NOT NULL").fetchone()[0]
+
+    def reset(self) -> None:
+        """Forget every chunk, after the target itself was emptied."""
+        self.db.execute("DELETE FROM chunks")
+        self.db.commit()
+
+    def mark_seen(self, ids: Sequence[str], run: int) -> Set[str]:
+        """
+        Mark known chunks as seen by a run.
+
+        Args:
+            ids: Chunk ids of a batch
+            run: Current run
+
+        Returns:
+            Set[str]: The ids already in the target
+        """
+        known = set()
+        # Older SQLite builds allow at most 999 parameters per statement
+        for start in range(0, len(ids), MAX_SQL_PARAMS):
+            part = ids[start:start + MAX_SQL_PARAMS]
+            placeholders = ",".join("?" * len(part))
+            self.db.execute(f"UPDATE chunks SET run = ? WHERE id IN ({placeholders})", (run, *part))
+            known.update(row[0] for row in self.db.execute(f"SELECT id FROM chunks WHERE id IN ({placeholders})", part))
+        self.db.commit()
+        return known
+
+    def add(self, chunks: Sequence[Document], run: int, vectors: Optional[np.ndarray] = None) -> None:
+        """
+        Record chunks written to the target.
+
+        Args:
+            chunks: Chunks upserted
+            run: Current run
+            vectors: Their vectors, stored for targets rebuilt from the ledger
+        """
+        if vectors is None:
+            rows = [(chunk.id, run, None, None, None) for chunk in chunks]
+        else:
+            rows = [
+                (chunk.id, run, chunk.page_content, json.dumps(chunk.metadata, ensure_ascii=False),
+                 np.ascontiguousarray(vector, dtype=np.float32).tobytes())
+                for chunk, vector in zip(chunks, vectors)
+            ]
+        self.db.executemany("INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?, ?)", rows)
+        self.db.commit()
+
+    def stale(self, run: int, batch_size: int) -> Iterator[List[str]]:
+        """
+        Yield batches of chunks not seen by a run.
+
+        Each batch must be passed to ``forget`` before the next is read.
+        """
+        while True:
+            ids = [row[0] for row in self.db.execute(
+                "SELECT id FROM chunks WHERE run < ? LIMIT ?", (run, batch_size)
+            )]
+            if not ids:
+                return
+            yield ids
+
+    def forget(self, ids: Sequence[str]) -> None:
+        """Drop tombstoned chunks."""
+        self.db.executemany("DELETE FROM chunks WHERE id = ?", [(chunk,) for chunk in ids])
+        self.db.commit()
+
+    def iter_stored(self, block: int = 1024) -> Iterator[Tuple[Document, np.ndarray]]:
+        """Stream the stored chunks and vectors in a stable order."""
+        cursor = self.db.execute("SELECT id, text, metadata, vector FROM chunks ORDER BY id")
+        while True:
+            rows = cursor.fetchmany(block)
+            if not rows:
+                return
+            for chunk, text, metadata, vector in rows:
+                yield (Document(page_content=text, metadata=json.loads(metadata), id=chunk),
+                       np.frombuffer(vector, dtype=np.float32))
+
+class _StoredChunks:
+    """Re-iterable view of the ledger's chunks for ``write_snapshot``."""
+
+    def __init__(self, ledger: IngestLedger):
+        self.ledger = ledger
+
+    def __len__(self) -> int:
+        return self.ledger.count()
+
+    def __iter__(self) -> Iterator[Document]:
+        return (chunk for chunk, _ in self.ledger.iter_stored())
+
+# ----------------------------------------------------------------------
+# Sinks
+# ----------------------------------------------------------------------
+def _pinecone_metadata(chunk: Document, text_key: str) -> Dict[str, Any]:
+    """Chunk metadata restricted to the value types Pinecone accepts."""
+    metadata = {
+        key: value for key, value in chunk.metadata.items()
+        if isinstance(value, (str, int, float, bool))
+    }
+    metadata[text_key] = chunk.page_content
+    return metadata
+
+class PineconeSink:
+    """Upserts and deletes chunks in a Pinecone index in bulk batches."""
+
+    stores_vectors = False
+
+    def __init__(self, index, text_key: str = "text", batch_size: int = 100):
+        """
+        Initialize the sink.
+
+        Args:
+            index: Pinecone index handle
+            text_key: Metadata key holding the chunk text (as read by the engine)
+            batch_size: Vectors per upsert or ids per delete request
+        """
+        self.index = index
+        self.text_key = text_key
+        self.batch_size = batch_size
+
+    def upsert(self, chunks: Sequence[Document], vectors: np.ndarray) -> None:
+        """Write chunks and their vectors."""
+        for start in range(0, len(chunks), self.batch_size):
+            self.index.upsert(vectors=[
+                (chunk.id, vector.tolist(), _pinecone_metadata(chunk, self.text_key))
+                for chunk, vector in zip(chunks[start:start + self.batch_size],
+                                         vectors[start:start + self.batch_size])
+            ])
+
+    def delete(self, ids: Sequence[str]) -> None:
+        """Tombstone removed chunks."""
+        for start in range(0, len(ids), self.batch_size):
+            self.index.delete(ids=list(ids[start:start + self.batch_size]))
+
+    def finish(self, ledger: IngestLedger, changed: bool) -> None:
+        """Nothing to do: Pinecone applies writes in place."""
+
+    def count(self) -> int:
+        """Vectors currently in the index."""
+        return self.index.describe_index_stats().total_vector_count
+
+    def reset(self) -> None:
+        """Delete every vector in the index."""
+        self.index.delete(delete_all=True)
+
+class FaissSink:
+    """
+    Keeps chunks in the ledger and rewrites the local snapshot from it.
+
+    The FAISS index and the BM25 arrays are rebuilt in one pass at
+    the end of a run; vectors are staged in a memory-mapped file rather
+    than in RAM.
+    """
+
+    stores_vectors = True
+
+    def __init__(self, index_dir: str, info: Dict[str, Any], compression: str = ""):
+        """
+        Initialize the sink.
+
+        Args:
+            index_dir: Snapshot directory
+            info: Build information stored in the snapshot manifest
+            compression: Index compression spec (see ``index_compression``)
+        """
+        self.index_dir = index_dir
+        self.info = info
+        self.compression = compression
+
+    def upsert(self, chunks: Sequence[Document], vectors: np.ndarray) -> None:
+        """Nothing to do: the ledger stores the chunks."""
+
+    def delete(self, ids: Sequence[str]) -> None:
+        """Nothing to do: the ledger drops the chunks."""
+
+    def count(self) -> int:
+        """Nothing outside the ledger: the snapshot is rewritten from it."""
+        return 0
+
+    def reset(self) -> None:
+        """Nothing to do: the snapshot is rewritten from the (reset) ledger."""
+
+    def finish(self, ledger: IngestLedger, changed: bool) -> None:
+        """
+        Rewrite the snapshot unless it was written from the current ledger.
+
+        The manifest records the ledger fingerprint, so a snapshot rebuilt
+        by ``local_index sync`` (which bypasses the ledger) is replaced on
+        the next run even when nothing in the source changed.
+        """
+        fingerprint = ledger.fingerprint()
+        if not changed:
+            try:
+                manifest = verify_snapshot(self.index_dir, check_checksums=False)
+                if manifest.get("compression", "") == self.compression and \
+                        manifest.get("ledger_fingerprint") == fingerprint:
+                    return
+            except SnapshotError:
+                pass
+        count = ledger.count()
+        if not count:
+            raise IngestError("The ledger has no chunks to write a snapshot from")
+
+        staging = Path(ledger.path).with_suffix(".vectors.npy")
+        vectors = None
+        try:
+            for i, (_, vector) in enumerate(ledger.iter_stored()):
+                if vectors is None:
+                    vectors = np.lib.format.open_memmap(
+                        staging, mode="w+", dtype=np.float32, shape=(count, len(vector))
+                    )
+                vectors[i] = vector
+            vectors.flush()
+            write_snapshot(self.index_dir, vectors, _StoredChunks(ledger),
+                           dict(self.info, ledger_fingerprint=fingerprint), self.compression)
+        finally:
+            del vectors
+            staging.unlink(missing_ok=True)
+
+# ----------------------------------------------------------------------
+# Pipeline
+# ----------------------------------------------------------------------
+def prepare_target(sink, ledger: IngestLedger, reset: bool = False) -> None:
+    """
+    Make sure the ledger accounts for everything in the target.
+
+    Until a run has completed, the ledger cannot tell which vectors in the
+    target are its own: an index built by other means (such as the legacy
+    ``pdfinfo`` build) would keep its vectors next to the new ones, under
+    different ids. Such a target is only written after ``reset`` empties it.
+
+    Args:
+        sink: ``PineconeSink`` or ``FaissSink``
+        ledger: Ledger of the target
+        reset: Delete everything in the target and the ledger first
+
+    Raises:
+        IngestError: If the target holds vectors the ledger does not know
+    """
+    if reset:
+        sink.reset()
+        ledger.reset()
+        return
+    if ledger.completed_runs():
+        return
+    count = sink.count()
+    if count > ledger.count():
+        raise IngestError(
+            f"The target holds {count} vectors but the ledger knows {ledger.count()}; they were not "
+            "written by an ingestion run and would be duplicated. Pass --reset-index to empty the "
+            "target and re-ingest it"
+        )
+
+def ingest(pages: Iterable[Document], sink, ledger: IngestLedger, pool: EmbeddingPool,
+           chunk_size: int = 1000, chunk_overlap: int = 150, batch_size: int = 256,
+           delete: bool = True, reset: bool = False) -> Dict[str, Any]:
+    """
+    Stream pages into a target, embedding only new or changed chunks.
+
+    Args:
+        pages: Source pages (e.g. ``iter_source_documents``)
+        sink: ``PineconeSink`` or ``FaissSink``
+        ledger: Ledger of the target
+        pool: Started ``EmbeddingPool``
+        chunk_size: Maximum chunk length in characters
+        chunk_overlap: Overlap between consecutive chunks in characters
+        batch_size: Chunks per embedding batch
+        delete: Tombstone chunks that are no longer in the source
+        reset: Empty the target and the ledger first (see ``prepare_target``)
+
+    Returns:
+        Dict[str, Any]: Chunk counts (seen, unchanged, embedded, deleted),
+        seconds and embedded chunks per second
+
+    Raises:
+        IngestError: If the source yields no chunks (nothing is deleted), or
+            the target holds vectors the ledger does not know
+    """
+    started = time.perf_counter()
+    prepare_target(sink, ledger, reset)
+    run = ledger.begin_run()
+    stats = {"run": run, "chunks": 0, "unchanged": 0, "embedded": 0, "deleted": 0}
+
+    def changed_batches() -> Iterator[Tuple[List[Document], List[str]]]:
+        for batch in batched(iter_chunks(pages, chunk_size, chunk_overlap), batch_size):
+            # Repeated chunks (same page and text) are one chunk
+            batch = list({chunk.id: chunk for chunk in batch}.values())
+            stats["chunks"] += len(batch)
+            known = ledger.mark_seen([chunk.id for chunk in batch], run)
+            stats["unchanged"] += len(known)
+            fresh = [chunk for chunk in batch if chunk.id not in known]
+            if fresh:
+                yield fresh, [chunk.page_content for chunk in fresh]
+
+    for chunks, vectors in pool.map(changed_batches()):
+        sink.upsert(chunks, vectors)
+        # Recorded only once written, so an interrupted run redoes the batch
+        ledger.add(chunks, run, vectors if sink.stores_vectors else None)
+        stats["embedded"] += len(chunks)
+
+    if not stats["chunks"]:
+        raise IngestError("The source produced no chunks; refusing to tombstone the whole index")
+
+    if delete:
+        for ids in ledger.stale(run, batch_size):
+            sink.delete(ids)
+            ledger.forget(ids)
+            stats["deleted"] += len(ids)
+
+    sink.finish(ledger, changed=bool(stats["embedded"] or stats["deleted"]))
+    stats["seconds"] = round(time.perf_counter() - started, 2)
+    stats["chunks_per_second"] = round(stats["embedded"] / stats["seconds"], 1) if stats["seconds"] else 0.0
+    ledger.finish_run(run, stats)
+    return stats
+
+def ledger_path(config: Dict[str, Any], target: str) -> str:
+    """Ledger file of a target."""
+    name = config["index_name"] if target == "pinecone" else Path(config["faiss_index_dir"]).name
+    return str(Path(config["ingest_dir"]) / f"{target}-{name}.sqlite")
+
+def build_sink(config: Dict[str, Any], target: str):
+    """Build the sink of a target from the configuration."""
+    if target == "pinecone":
+        from pinecone import Pinecone
+        if not config.get("pinecone_api_key"):
+            raise IngestError("PINECONE_API_KEY is not set")
+        index = Pinecone(api_key=config["pinecone_api_key"]).Index(config["index_name"])
+        return PineconeSink(index, text_key="text", batch_size=config["ingest_upsert_batch_size"])
+    return FaissSink(config["faiss_index_dir"], {
+        "source_dir": str(config["source_dir"]),
+        "chunk_size": config["chunk_size"],
+        "chunk_overlap": config["chunk_overlap"],
+        "ingest": True,
+    }, compression=config["index_compression"])
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point."""
+    from .config import load_rag_config
+
+    config = load_rag_config()
+    parser = argparse.ArgumentParser(prog="python -m rag.ingest", description=__doc__.split("\n\n")[0])
+    parser.add_argument("command", choices=["run", "status"])
+    parser.add_argument("--target", choices=["pinecone", "faiss"], default=config["retrieval_backend"])
+    parser.add_argument("--source-dir", default=config["source_dir"])
+    parser.add_argument("--workers", type=int, default=config["ingest_workers"],
+                        help="Embedding processes (0 = one per core)")
+    parser.add_argument("--batch-size", type=int, default=config["ingest_batch_size"],
+                        help="Chunks per embedding batch")
+    parser.add_argument("--no-delete", action="store_true", help="Keep chunks that left the source")
+    parser.add_argument("--reset-index", action="store_true",
+                        help="Delete everything in the target first (needed once for an index built by other means)")
+    args = parser.parse_args(argv)
+
+    ledger = IngestLedger(ledger_path(config, args.target))
+    try:
+        if args.command == "status":
+            print(f"{args.target}: {ledger.count()} chunks ({ledger.path})")
+            for run in ledger.last_runs():
+                state = "completed" if run["finished_at"] else "incomplete"
+                print(f"  run {run['run']} {state}: {json.dumps(run['stats']) if run['stats'] else ''}")
+            return 0
+
+        sink = build_sink(config, args.target)
+        with EmbeddingPool(config, workers=args.workers) as pool:
+            stats = ingest(
+                iter_source_documents(args.source_dir),
+                sink,
+                ledger,
+                pool,
+                chunk_size=config["chunk_size"],
+                chunk_overlap=config["chunk_overlap"],
+                batch_size=args.batch_size,
+                delete=not args.no_delete,
+                reset=args.reset_index
+            )
+    except (IngestError, SnapshotError) as e:
+        print(f"Ingestion error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        ledger.close()
+
+    print(f"Ingested into {args.target}: {stats['chunks']} chunks, {stats['unchanged']} unchanged, "
+          f"{stats['embedded']} embedded, {stats['deleted']} deleted in {stats['seconds']}s "
+          f"({stats['chunks_per_second']} chunks/s)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+"""
+BM25 inverted index over the snapshot chunks.
+
+Dense vectors handle paraphrases well but miss short keyword queries
+("flood now", "trapped") and Roman-Urdu spellings. This index scores the
+same chunk texts with BM25 and is stored next to the FAISS snapshot as
+flat numpy arrays, which are memory-mapped at load time:
+
+- ``bm25_offsets.npy``: start of each term's postings (int64, terms + 1)
+- ``bm25_postings.npy``: chunk positions, grouped by term (int32)
+- ``bm25_tf.npy``: term frequency of each posting (float32)
+- ``bm25_doc_len.npy``: token count of each chunk (float32)
+- ``bm25_vocab.json``: term -> term id
+
+Terms are the ``phrase_matcher`` tokens, indexed exactly as written. A
+Latin word with repeated letters is also indexed under its collapsed
+form, which a query word missing from the vocabulary falls back to, so
+Roman-Urdu spellings such as "sailaab" and "sailab" find each other
+while "need" and "flood" still match exactly.
+"""
+import json
+import tempfile
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .phrase_matcher import collapse_repeats, tokenize
+
+OFFSETS_FILE = "bm25_offsets.npy"
+POSTINGS_FILE = "bm25_postings.npy"
+TF_FILE = "bm25_tf.npy"
+DOC_LEN_FILE = "bm25_doc_len.npy"
+VOCAB_FILE = "bm25_vocab.json"
+LEXICAL_FILES = (OFFSETS_FILE, POSTINGS_FILE, TF_FILE, DOC_LEN_FILE, VOCAB_FILE)
+
+def index_terms(text: str) -> Tuple[Counter, int]:
+    """
+    Count the BM25 terms of a chunk.
+
+    Args:
+        text: Chunk text
+
+    Returns:
+        Tuple[Counter, int]: Term frequencies (exact tokens plus the
+        collapsed fallback terms) and the chunk length in tokens
+    """
+    tokens = tokenize(text)
+    counts = Counter(tokens)
+    for token in tokens:
+        collapsed = collapse_repeats(token)
+        if collapsed != token:
+            counts[collapsed] += 1
+    return counts, len(tokens)
+
+# Postings held in memory before a block is spilled to disk
+SPILL_POSTINGS = 4_000_000
+
+def _spill(directory: Path, postings: Dict[str, List[Tuple[int, int]]]) -> Tuple[List[str], Path]:
+    """Write a block of postings, sorted by term, and return its terms and file."""
+    terms = sorted(postings)
+    lengths = np.array([len(postings[term]) for term in terms], dtype=np.int64)
+    pairs = np.array([pair for term in terms for pair in postings[term]], dtype=np.int64).reshape(-1, 2)
+    path = directory / f"block-{len(list(directory.iterdir())):05d}.npz"
+    np.savez(path, lengths=lengths, docs=pairs[:, 0].astype(np.int32), tfs=pairs[:, 1].astype(np.float32))
+    return terms, path
+
+def write_lexical_index(directory: str, texts: Iterable[str], spill_postings: int = SPILL_POSTINGS) -> Dict[str, Any]:
+    """
+    Build the BM25 arrays for a list of chunk texts.
+
+    Postings are collected in blocks of at most ``spill_postings`` entries;
+    each full block is spilled to a temporary file, and the blocks are
+    merged into memory-mapped output arrays at the end. Only the
+    vocabulary and the chunk lengths grow with the corpus.
+
+    Args:
+        directory: Snapshot directory to write into
+        texts: Chunk texts in snapshot order
+        spill_postings: Postings held in memory before a block is spilled
+
+    Returns:
+        Dict[str, Any]: Index statistics for the snapshot manifest
+    """
+    root = Path(directory)
+    doc_len = []
+    with tempfile.TemporaryDirectory(dir=root) as spill_dir:
+        blocks = []
+        postings, pending = defaultdict(list), 0
+        for position, text in enumerate(texts):
+            counts, length = index_terms(text)
+            doc_len.append(length)
+            for term, count in counts.items():
+                postings[term].append((position, count))
+            pending += len(counts)
+            if pending >= spill_postings:
+                blocks.append(_spill(Path(spill_dir), postings))
+                postings, pending = defaultdict(list), 0
+        if postings or not blocks:
+            blocks.append(_spill(Path(spill_dir), postings))
+
+        terms = sorted(set().union(*(block_terms for block_terms, _ in blocks)))
+        vocab = {term: i for i, term in enumerate(terms)}
+        df = np.zeros(len(terms), dtype=np.int64)
+        for block_terms, path in blocks:
+            with np.load(path) as block:
+                np.add.at(df, [vocab[term] for term in block_terms], block["lengths"])
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(df)
+
+        total = int(offsets[-1])
+        doc_ids = np.lib.format.open_memmap(root / POSTINGS_FILE, mode="w+", dtype=np.int32, shape=(total,))
+        tfs = np.lib.format.open_memmap(root / TF_FILE, mode="w+", dtype=np.float32, shape=(total,))
+        # Blocks hold ascending chunk positions, so appending them in order
+        # keeps every term's postings sorted
+        written = offsets[:-1].copy()
+        for block_terms, path in blocks:
+            with np.load(path) as block:
+                ids = np.array([vocab[term] for term in block_terms], dtype=np.int64)
+                lengths = block["lengths"]
+                starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+                target = np.repeat(written[ids] - starts, lengths) + np.arange(int(lengths.sum()))
+                doc_ids[target] = block["docs"]
+                tfs[target] = block["tfs"]
+                written[ids] += lengths
+        doc_ids.flush()
+        tfs.flush()
+        del doc_ids, tfs
+
+    np.save(root / OFFSETS_FILE, offsets)
+    np.save(root / DOC_LEN_FILE, np.array(doc_len, dtype=np.float32))
+    with open(root / VOCAB_FILE, "w", encoding="utf-8") as f:
+        json.dump(vocab, f, ensure_ascii=False)
+
+    return {"bm25": {"terms": len(terms), "postings": total}}
+
+class LexicalIndex:
+    """
+    Memory-mapped BM25 index over the snapshot chunks.
+
+    Postings stay on disk and are paged in by the OS; only the
+    vocabulary, the per-term IDF and the per-chunk length norms live on
+    the heap. A search only touches the postings of the query terms.
+    """
+
+    def __init__(self, directory: str, documents: List[Document], k1: float = 1.5, b: float = 0.75):
+        """
+        Open the index.
+
+        Args:
+            directory: Snapshot directory holding the BM25 files
+            documents: Snapshot chunks, in snapshot order
+            k1: BM25 term frequency saturation
+            b: BM25 length normalization
+        """
+        root = Path(directory)
+        self.offsets = np.load(root / OFFSETS_FILE, mmap_mode="r")
+        self.postings = np.load(root / POSTINGS_FILE, mmap_mode="r")
+        self.tfs = np.load(root / TF_FILE, mmap_mode="r")
+        self.doc_len = np.load(root / DOC_LEN_FILE, mmap_mode="r")
+        with open(root / VOCAB_FILE, encoding="utf-8") as f:
+            self.vocab: Dict[str, int] = json.load(f)
+
+        if len(self.doc_len) != len(documents):
+            raise ValueError(f"BM25 index covers {len(self.doc_len)} chunks, docstore has {len(documents)}")
+
+        self.documents = documents
+        self.k1 = k1
+        self.b = b
+        count = len(documents)
+        self.avg_doc_len = float(self.doc_len.mean()) if count else 0.0
+        df = np.diff(self.offsets).astype(np.float32)
+        self.idf = np.log1p((count - df + 0.5) / (df + 0.5))
+        self.length_norm = k1 * (1 - b + b * np.asarray(self.doc_len) / max(self.avg_doc_len, 1e-9))
+
+    def __len__(self) -> int:
+        """Get the number of indexed chunks."""
+        return len(self.documents)
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """
+        Score chunks against a query.
+
+        Args:
+            query: Query text
+            k: Maximum number of results
+
+        Returns:
+            List[Tuple[int, float]]: Chunk positions and BM25 scores, best first
+        """
+        term_ids = Counter()
+        for token in tokenize(query):
+            if token not in self.vocab:
+                token = collapse_repeats(token)
+            if token in self.vocab:
+                term_ids[self.vocab[token]] += 1
+        if not term_ids:
+            return []
+
+        scores = np.zeros(len(self.documents), dtype=np.float32)
+        for term_id, query_tf in term_ids.items():
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            docs = self.postings[start:end]
+            tf = self.tfs[start:end]
+            # Postings of one term never repeat a chunk, so += is safe
+            scores[docs] += query_tf * self.idf[term_id] * tf * (self.k1 + 1) / (tf + self.length_norm[docs])
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        ranked = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(int(i), float(scores[i])) for i in ranked]
+
+    def get_documents(self, query: str, k: int) -> List[Document]:
+        """
+        Retrieve the best matching chunks.
+
+        Args:
+            query: Query text
+            k: Maximum number of chunks
+
+        Returns:
+            List[Document]: Matching chunks, best first
+        """
+        return [self.documents[i] for i, _ in self.search(query, k)]
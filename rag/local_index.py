@@ -0,0 +1,460 @@
+"""
+Local FAISS snapshot of the document corpus.
+
+The snapshot mirrors the Pinecone index on disk so retrieval can run
+in-process, without a network round trip. A snapshot directory holds:
+
+- ``index.faiss``: inner-product FAISS index over normalized embeddings,
+  optionally projected and quantized (see ``index_compression``)
+- ``docstore.jsonl``: chunk text and metadata, one line per vector
+- ``shard-<type>.faiss`` and ``shard-<type>.npy``: per disaster type, an
+  index over the chunks tagged with that type and their snapshot positions
+- ``vectors.npy``: full-width embeddings, written only with index
+  compression, for rescoring the compressed search results
+- ``bm25_*``: BM25 inverted index over the same chunks (see ``lexical_index``)
+- ``manifest.json``: build information and SHA-256 checksums
+
+Rebuild and check a snapshot with::
+
+    python -m rag.local_index sync
+    python -m rag.local_index verify
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.document_loaders import PyPDFLoader, TextLoader
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from .emergency import EMERGENCY_TYPES, tag_disaster_type
+from .index_compression import ADD_BLOCK, build_index, is_compressed
+from .lexical_index import LEXICAL_FILES, LexicalIndex, write_lexical_index
+
+SNAPSHOT_VERSION = 1
+INDEX_FILE = "index.faiss"
+DOCSTORE_FILE = "docstore.jsonl"
+MANIFEST_FILE = "manifest.json"
+VECTORS_FILE = "vectors.npy"
+
+class SnapshotError(Exception):
+    """Raised when a snapshot is missing or fails its integrity check."""
+
+def _sha256(path: Path) -> str:
+    """Compute the SHA-256 checksum of a file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+# Source file types read by ``iter_source_documents``
+SOURCE_SUFFIXES = (".pdf", ".txt", ".md")
+
+def source_files(source_dir: str) -> List[Path]:
+    """Source documents of the corpus, in a stable order."""
+    return [path for path in sorted(Path(source_dir).rglob("*"))
+            if path.suffix.lower() in SOURCE_SUFFIXES and path.is_file()]
+
+def source_fingerprint(source_dir: str) -> str:
+    """
+    Fingerprint the source files by path, size and modification time.
+
+    Args:
+        source_dir: Directory containing PDF and text files
+
+    Returns:
+        str: Hex digest that changes when a file is added, removed or edited
+    """
+    digest = hashlib.sha256()
+    for path in source_files(source_dir):
+        stat = path.stat()
+        digest.update(f"{path.relative_to(source_dir)}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+def iter_source_documents(source_dir: str) -> Iterator[Document]:
+    """
+    Load the source documents of the corpus.
+
+    Args:
+        source_dir: Directory containing PDF and text files
+
+    Yields:
+        Document: One document per PDF page or text file
+    """
+    for path in source_files(source_dir):
+        if path.suffix.lower() == ".pdf":
+            loader = PyPDFLoader(str(path))
+        else:
+            loader = TextLoader(str(path), encoding="utf-8")
+        for doc in loader.lazy_load():
+            doc.metadata["source"] = str(path.relative_to(source_dir))
+            yield doc
+
+def split_documents(documents: Iterator[Document], chunk_size: int, chunk_overlap: int) -> List[Document]:
+    """
+    Split documents into retrieval chunks.
+
+    Args:
+        documents: Source documents
+        chunk_size: Maximum chunk length in characters
+        chunk_overlap: Overlap between consecutive chunks in characters
+
+    Returns:
+        List[Document]: Chunks ready to embed, tagged with ``metadata["disaster_type"]``
+    """
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    chunks = splitter.split_documents(list(documents))
+    for chunk in chunks:
+        chunk.metadata["disaster_type"] = tag_disaster_type(chunk.page_content)
+    return chunks
+
+def shard_files(disaster_type: str) -> Tuple[str, str]:
+    """Index and positions file names of a disaster type shard."""
+    name = disaster_type.lower()
+    return f"shard-{name}.faiss", f"shard-{name}.npy"
+
+def _write_shards(tmp_dir: Path, vectors: np.ndarray, types: List[str], compression: str) -> Dict[str, int]:
+    """
+    Write one index per disaster type over the chunks tagged with it.
+
+    "General" chunks only live in the main index. Shards too small for the
+    compression setting (product quantization needs training data) are
+    written uncompressed.
+
+    Returns:
+        Dict[str, int]: Chunks per shard
+    """
+    tagged = np.asarray(types)
+    shards = {}
+    for disaster_type in EMERGENCY_TYPES:
+        positions = np.flatnonzero(tagged == disaster_type).astype(np.int64)
+        if disaster_type == "General" or not len(positions):
+            continue
+        members = np.asarray(vectors[positions], dtype=np.float32)
+        try:
+            index = build_index(members, compression)
+        except ValueError:
+            index = build_index(members)
+        index_file, positions_file = shard_files(disaster_type)
+        faiss.write_index(index, str(tmp_dir / index_file))
+        np.save(tmp_dir / positions_file, positions)
+        shards[disaster_type] = len(positions)
+    return shards
+
+def write_snapshot(index_dir: str, vectors: np.ndarray, chunks: List[Document], info: Dict[str, Any],
+                   compression: str = "") -> Dict[str, Any]:
+    """
+    Write a snapshot atomically.
+
+    The snapshot is written to a temporary directory that replaces
+    ``index_dir`` only once every file is complete.
+
+    Args:
+        index_dir: Target snapshot directory
+        vectors: Normalized float32 embeddings, one row per chunk
+        chunks: Chunks matching the rows of ``vectors``
+        info: Extra build information stored in the manifest
+        compression: Index compression spec (see ``index_compression``)
+
+    Returns:
+        Dict[str, Any]: The written manifest
+    """
+    if len(vectors) != len(chunks):
+        raise SnapshotError(f"{len(vectors)} vectors for {len(chunks)} chunks")
+
+    target = Path(index_dir)
+    tmp_dir = target.with_name(target.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    try:
+        index = build_index(vectors, compression)
+    except ValueError as e:
+        raise SnapshotError(f"Cannot apply index compression '{compression}': {e}") from e
+    faiss.write_index(index, str(tmp_dir / INDEX_FILE))
+
+    types = []
+    with open(tmp_dir / DOCSTORE_FILE, "w", encoding="utf-8") as f:
+        for i, chunk in enumerate(chunks):
+            record = {"id": str(i), "text": chunk.page_content, "metadata": chunk.metadata}
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            types.append(chunk.metadata.get("disaster_type", "General"))
+    shards = _write_shards(tmp_dir, vectors, types, compression)
+    shard_names = tuple(name for disaster_type in shards for name in shard_files(disaster_type))
+    if is_compressed(compression):
+        # Compressed scores are approximate; searches rescore against these
+        full = np.lib.format.open_memmap(tmp_dir / VECTORS_FILE, mode="w+", dtype=np.float32, shape=vectors.shape)
+        for start in range(0, len(vectors), ADD_BLOCK):
+            full[start:start + ADD_BLOCK] = vectors[start:start + ADD_BLOCK]
+        full.flush()
+        del full
+        vector_names = (VECTORS_FILE,)
+    else:
+        vector_names = ()
+
+    lexical_info = write_lexical_index(str(tmp_dir), (chunk.page_content for chunk in chunks))
+
+    manifest = {
+        "version": SNAPSHOT_VERSION,
+        "created_at": time.time(),
+        "count": int(index.ntotal),
+        "dimension": int(index.d),
+        "compression": compression,
+        "shards": shards,
+        "files": {
+            name: _sha256(tmp_dir / name)
+            for name in (INDEX_FILE, DOCSTORE_FILE) + LEXICAL_FILES + shard_names + vector_names
+        },
+    }
+    manifest.update(lexical_info)
+    manifest.update(info)
+    with open(tmp_dir / MANIFEST_FILE, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    # Swap the new snapshot in place
+    old_dir = target.with_name(target.name + ".old")
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if target.exists():
+        os.replace(target, old_dir)
+    os.replace(tmp_dir, target)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return manifest
+
+def build_snapshot(source_dir: str, index_dir: str, embeddings, chunk_size: int = 1000, chunk_overlap: int = 150,
+                   compression: str = "") -> Dict[str, Any]:
+    """
+    Rebuild the snapshot from the source documents.
+
+    Args:
+        source_dir: Directory containing the source documents
+        index_dir: Target snapshot directory
+        embeddings: Embedding model (must produce normalized vectors)
+        chunk_size: Maximum chunk length in characters
+        chunk_overlap: Overlap between consecutive chunks in characters
+        compression: Index compression spec (see ``index_compression``)
+
+    Returns:
+        Dict[str, Any]: The written manifest
+    """
+    chunks = split_documents(iter_source_documents(source_dir), chunk_size, chunk_overlap)
+    if not chunks:
+        raise SnapshotError(f"No documents found in {source_dir}")
+
+    vectors = np.asarray(
+        embeddings.embed_documents([chunk.page_content for chunk in chunks]),
+        dtype=np.float32
+    )
+    return write_snapshot(index_dir, vectors, chunks, {
+        "source_dir": str(source_dir),
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+    }, compression)
+
+def verify_snapshot(index_dir: str, check_checksums: bool = True) -> Dict[str, Any]:
+    """
+    Check the integrity of a snapshot.
+
+    Args:
+        index_dir: Snapshot directory
+        check_checksums: Also compare file checksums with the manifest
+
+    Returns:
+        Dict[str, Any]: The snapshot manifest
+
+    Raises:
+        SnapshotError: If the snapshot is missing, corrupt or inconsistent
+    """
+    root = Path(index_dir)
+    manifest_path = root / MANIFEST_FILE
+    if not manifest_path.exists():
+        raise SnapshotError(f"No snapshot manifest in {index_dir}")
+
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    if manifest.get("version") != SNAPSHOT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot version {manifest.get('version')}")
+
+    for name, checksum in manifest["files"].items():
+        path = root / name
+        if not path.exists():
+            raise SnapshotError(f"Missing snapshot file {name}")
+        if check_checksums and _sha256(path) != checksum:
+            raise SnapshotError(f"Checksum mismatch for {name}")
+
+    with open(root / DOCSTORE_FILE, encoding="utf-8") as f:
+        doc_count = sum(1 for _ in f)
+    if doc_count != manifest["count"]:
+        raise SnapshotError(f"Docstore has {doc_count} chunks, manifest expects {manifest['count']}")
+
+    return manifest
+
+def _read_index(path: str):
+    """Read a FAISS index memory-mapped, falling back to a regular read."""
+    try:
+        return faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError:
+        # Older FAISS builds cannot memory-map flat indexes
+        return faiss.read_index(path)
+
+def read_docstore(index_dir: str) -> List[Document]:
+    """
+    Read the snapshot chunks.
+
+    Args:
+        index_dir: Snapshot directory
+
+    Returns:
+        List[Document]: Chunks in snapshot order, with ``Document.id`` set
+    """
+    documents = []
+    with open(Path(index_dir) / DOCSTORE_FILE, encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            documents.append(Document(page_content=record["text"], metadata=record["metadata"], id=record["id"]))
+    return documents
+
+def load_snapshot(index_dir: str, embeddings, documents: List[Document] = None) -> FAISS:
+    """
+    Load a snapshot as a LangChain vector store.
+
+    Args:
+        index_dir: Snapshot directory
+        embeddings: Embedding model used for queries
+        documents: Chunks already read with ``read_docstore`` (read if None)
+
+    Returns:
+        FAISS: Vector store backed by the memory-mapped index
+    """
+    manifest = verify_snapshot(index_dir, check_checksums=False)
+    root = Path(index_dir)
+    index = _read_index(str(root / INDEX_FILE))
+    if index.ntotal != manifest["count"] or index.d != manifest["dimension"]:
+        raise SnapshotError("FAISS index does not match the snapshot manifest")
+
+    if documents is None:
+        documents = read_docstore(index_dir)
+
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=InMemoryDocstore({doc.id: doc for doc in documents}),
+        index_to_docstore_id={position: doc.id for position, doc in enumerate(documents)},
+        distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT,
+    )
+
+def load_shards(index_dir: str) -> Dict[str, Tuple[Any, np.ndarray]]:
+    """
+    Load the disaster type shards of a snapshot.
+
+    Args:
+        index_dir: Snapshot directory
+
+    Returns:
+        Dict[str, Tuple[Any, np.ndarray]]: Per type, the shard's FAISS
+        index and the snapshot position of each of its rows (empty for
+        snapshots written without shards)
+    """
+    manifest = verify_snapshot(index_dir, check_checksums=False)
+    root = Path(index_dir)
+    shards = {}
+    for disaster_type, count in manifest.get("shards", {}).items():
+        index_file, positions_file = shard_files(disaster_type)
+        index = _read_index(str(root / index_file))
+        positions = np.load(root / positions_file, mmap_mode="r")
+        if index.ntotal != count or len(positions) != count:
+            raise SnapshotError(f"{disaster_type} shard does not match the snapshot manifest")
+        shards[disaster_type] = (index, positions)
+    return shards
+
+def load_vectors(index_dir: str) -> Optional[np.ndarray]:
+    """
+    Memory-map the full-width embeddings of a compressed snapshot.
+
+    Args:
+        index_dir: Snapshot directory
+
+    Returns:
+        Optional[np.ndarray]: One row per chunk, or None for an
+        uncompressed snapshot (its index holds the exact vectors)
+    """
+    manifest = verify_snapshot(index_dir, check_checksums=False)
+    if VECTORS_FILE not in manifest["files"]:
+        return None
+    vectors = np.load(Path(index_dir) / VECTORS_FILE, mmap_mode="r")
+    if vectors.shape != (manifest["count"], manifest["dimension"]):
+        raise SnapshotError("Full-width vectors do not match the snapshot manifest")
+    return vectors
+
+def load_lexical_index(index_dir: str, documents: List[Document] = None, k1: float = 1.5, b: float = 0.75) -> LexicalIndex:
+    """
+    Load the BM25 index of a snapshot.
+
+    Args:
+        index_dir: Snapshot directory
+        documents: Chunks already read with ``read_docstore`` (read if None)
+        k1: BM25 term frequency saturation
+        b: BM25 length normalization
+
+    Returns:
+        LexicalIndex: Memory-mapped BM25 index
+
+    Raises:
+        SnapshotError: If the snapshot has no BM25 index
+    """
+    manifest = verify_snapshot(index_dir, check_checksums=False)
+    if not set(LEXICAL_FILES) <= set(manifest["files"]):
+        raise SnapshotError(f"Snapshot in {index_dir} has no BM25 index; run 'python -m rag.local_index sync'")
+    if documents is None:
+        documents = read_docstore(index_dir)
+    return LexicalIndex(index_dir, documents, k1=k1, b=b)
+
+def main(argv: List[str] = None) -> int:
+    """Command line entry point for syncing and verifying the snapshot."""
+    from .config import load_rag_config
+    from .embeddings import build_embeddings
+
+    config = load_rag_config()
+    parser = argparse.ArgumentParser(description="Manage the local FAISS snapshot")
+    parser.add_argument("command", choices=["sync", "verify"])
+    parser.add_argument("--source-dir", default=config["source_dir"])
+    parser.add_argument("--index-dir", default=config["faiss_index_dir"])
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "sync":
+            started = time.perf_counter()
+            build_snapshot(
+                args.source_dir,
+                args.index_dir,
+                build_embeddings(config),
+                chunk_size=config["chunk_size"],
+                chunk_overlap=config["chunk_overlap"],
+                compression=config["index_compression"],
+            )
+            print(f"Snapshot written to {args.index_dir} in {time.perf_counter() - started:.1f}s")
+        manifest = verify_snapshot(args.index_dir)
+    except SnapshotError as e:
+        print(f"Snapshot error: {e}", file=sys.stderr)
+        return 1
+
+    print(f"Snapshot OK: {manifest['count']} chunks, {manifest['dimension']} dimensions "
+          f"({manifest.get('compression') or 'flat'}), {manifest.get('bm25', {}).get('terms', 0)} BM25 terms")
+    for disaster_type, count in manifest.get("shards", {}).items():
+        print(f"  {disaster_type} shard: {count} chunks")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
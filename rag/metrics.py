@@ -0,0 +1,64 @@
+"""
+Lightweight in-process latency metrics.
+"""
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+class LatencyTracker:
+    """
+    Sliding window of latency samples with percentile summaries.
+
+    Only the most recent ``window`` samples are kept, so memory is bounded
+    and the percentiles follow current load.
+    """
+
+    def __init__(self, window: int = 500):
+        """
+        Initialize an empty tracker.
+
+        Args:
+            window: Number of recent samples to keep
+        """
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.last: Optional[float] = None
+
+    def record(self, seconds: float) -> None:
+        """Record one latency sample in seconds."""
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+            self.last = seconds
+
+    def percentile(self, p: float) -> Optional[float]:
+        """
+        Get a percentile of the recent samples.
+
+        Args:
+            p: Percentile between 0 and 100
+
+        Returns:
+            Optional[float]: The percentile in seconds, or None without samples
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(round(p / 100 * (len(samples) - 1))))
+        return samples[index]
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        """
+        Summarize the recent samples.
+
+        Returns:
+            Dict[str, Optional[float]]: Count, last, p50 and p95 in seconds
+        """
+        return {
+            "count": self.count,
+            "last": self.last,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+        }
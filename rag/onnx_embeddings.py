@@ -0,0 +1,313 @@
+"""
+Quantized ONNX CPU backend for the all-MiniLM-L6-v2 embedder.
+
+Runs an exported, int8-quantized MiniLM through onnxruntime with a
+``tokenizers`` fast tokenizer, so serving queries does not need torch,
+transformers or sentence-transformers. Vectors are mean-pooled and
+L2-normalized exactly like the sentence-transformers model, so they stay
+comparable with the embeddings already stored in Pinecone.
+
+Tolerance: every check sentence must reach a cosine similarity of at
+least ``ONNX_MIN_COSINE`` (0.99) with the HuggingFace vector. Dynamic int8
+quantization of MiniLM typically lands around 0.995.
+
+Export (needs torch and transformers once), check and benchmark with::
+
+    python -m rag.onnx_embeddings export
+    python -m rag.onnx_embeddings check
+    python -m rag.onnx_embeddings benchmark
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+ONNX_MODEL_FILE = "model.int8.onnx"
+ONNX_MANIFEST_FILE = "manifest.json"
+ONNX_MIN_COSINE = 0.99
+MAX_SEQUENCE_LENGTH = 256
+
+# Sentences used by the check and benchmark commands
+CHECK_SENTENCES = [
+    "What should I do during a flood?",
+    "flood now",
+    "trapped",
+    "How do I prepare an emergency kit for an earthquake?",
+    "Where is the nearest relief camp after the cyclone?",
+    "My neighbour is bleeding and the ambulance is late",
+    "sailab aa gaya hai madad chahiye",
+    "سیلاب میں کیا کرنا چاہیے؟",
+    "ٻوڏ ۾ ڇا ڪجي؟",
+    "How should fire evacuation drills be organized in schools?",
+]
+
+def hub_model_id(model_name: str) -> str:
+    """Expand a sentence-transformers short name to a Hugging Face Hub id."""
+    return model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Sentence embeddings computed by a quantized ONNX MiniLM on CPU.
+    """
+
+    def __init__(self, model_dir: str, batch_size: int = 32, threads: int = 0):
+        """
+        Load the model and tokenizer.
+
+        Args:
+            model_dir: Directory written by ``export_onnx_model``
+            batch_size: Texts encoded per inference call
+            threads: onnxruntime intra-op threads (0 lets it decide)
+        """
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_path = Path(model_dir) / ONNX_MODEL_FILE
+        if not model_path.exists():
+            raise FileNotFoundError(
+                f"ONNX model not found at {model_path}. "
+                "Run 'python -m rag.onnx_embeddings export' first."
+            )
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(str(model_path), options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(str(Path(model_dir) / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQUENCE_LENGTH)
+        self.tokenizer.enable_padding()
+        self.batch_size = batch_size
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """Encode a batch of texts to normalized float32 vectors."""
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+        token_embeddings = self.session.run(None, feeds)[0]
+
+        # Mean pooling over real tokens, then L2 normalization
+        mask = attention_mask[..., None].astype(np.float32)
+        summed = (token_embeddings * mask).sum(axis=1)
+        vectors = summed / np.clip(mask.sum(axis=1), 1e-9, None)
+        vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        return vectors.astype(np.float32)
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed texts as one float32 matrix.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            np.ndarray: One normalized row per text
+        """
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.vstack([
+            self._encode(texts[i:i + self.batch_size])
+            for i in range(0, len(texts), self.batch_size)
+        ])
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents (LangChain interface)."""
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query (LangChain interface)."""
+        return self._encode([text])[0].tolist()
+
+def export_onnx_model(model_name: str, model_dir: str) -> Dict[str, Any]:
+    """
+    Export MiniLM to ONNX and quantize its weights to int8.
+
+    Needs torch, transformers and onnxruntime; serving only needs the
+    latter.
+
+    Args:
+        model_name: sentence-transformers model name
+        model_dir: Output directory
+
+    Returns:
+        Dict[str, Any]: The written manifest
+    """
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModel, AutoTokenizer
+
+    out = Path(model_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    model_id = hub_model_id(model_name)
+    tokenizer = AutoTokenizer.from_pretrained(model_id)
+    model = AutoModel.from_pretrained(model_id)
+    model.eval()
+
+    names = ["input_ids", "attention_mask", "token_type_ids"]
+    dummy = tokenizer(["flood warning"], return_tensors="pt")
+    fp32_path = out / "model.fp32.onnx"
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(dummy[name] for name in names),
+            str(fp32_path),
+            input_names=names,
+            output_names=["last_hidden_state"],
+            dynamic_axes={name: {0: "batch", 1: "sequence"} for name in names + ["last_hidden_state"]},
+            opset_version=14,
+        )
+    quantize_dynamic(str(fp32_path), str(out / ONNX_MODEL_FILE), weight_type=QuantType.QInt8)
+    fp32_path.unlink()
+    tokenizer.save_pretrained(str(out))
+
+    manifest = {
+        "model": model_id,
+        "quantization": "dynamic-int8",
+        "max_sequence_length": MAX_SEQUENCE_LENGTH,
+        "exported_at": time.time(),
+    }
+    with open(out / ONNX_MANIFEST_FILE, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def check_onnx_model(config: Dict[str, Any], sentences: List[str] = CHECK_SENTENCES) -> float:
+    """
+    Compare ONNX vectors with the HuggingFace vectors.
+
+    Args:
+        config: Engine configuration
+        sentences: Sentences to compare
+
+    Returns:
+        float: Lowest cosine similarity over the sentences
+    """
+    from .embeddings import build_embeddings
+
+    reference = np.asarray(
+        build_embeddings(dict(config, embedding_backend="huggingface")).embed_documents(sentences),
+        dtype=np.float32
+    )
+    candidate = OnnxEmbeddings(config["onnx_model_dir"]).embed_array(sentences)
+    return float((reference * candidate).sum(axis=1).min())
+
+def _benchmark_worker(config: Dict[str, Any], repeats: int) -> Dict[str, Any]:
+    """
+    Measure one backend in the current (fresh) process.
+
+    The configuration comes from the parent process, so the worker never
+    imports streamlit and its RSS growth is the embedder's alone.
+    """
+    # POSIX only; imported here so the module still loads on Windows
+    import resource
+
+    from .embeddings import build_embeddings
+
+    backend = config["embedding_backend"]
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    started = time.perf_counter()
+    embeddings = build_embeddings(config)
+    embeddings.embed_query("warm up")
+    load_seconds = time.perf_counter() - started
+
+    latencies = []
+    for i in range(repeats):
+        text = CHECK_SENTENCES[i % len(CHECK_SENTENCES)]
+        started = time.perf_counter()
+        embeddings.embed_query(text)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+
+    started = time.perf_counter()
+    embeddings.embed_documents(CHECK_SENTENCES * 10)
+    batch_seconds = time.perf_counter() - started
+
+    return {
+        "backend": backend,
+        "load_seconds": round(load_seconds, 3),
+        "query_p50_ms": round(1000 * latencies[len(latencies) // 2], 2),
+        "query_p95_ms": round(1000 * latencies[int(0.95 * (len(latencies) - 1))], 2),
+        "batch_texts_per_second": round(10 * len(CHECK_SENTENCES) / batch_seconds, 1),
+        # Memory added by loading and running the embedder (ru_maxrss is
+        # reported in KiB on Linux); the peak includes the interpreter
+        "rss_growth_mb": round((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024, 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+def benchmark(config: Dict[str, Any], repeats: int = 200) -> List[Dict[str, Any]]:
+    """
+    Benchmark both backends, each in its own process so RSS is comparable.
+
+    Args:
+        config: Engine configuration (embedding settings and ONNX model dir)
+        repeats: Number of single-query encodings per backend
+
+    Returns:
+        List[Dict[str, Any]]: One result per backend
+    """
+    from .config import PROJECT_ROOT
+
+    # Only the embedding settings are handed over, never API keys
+    settings = {key: value for key, value in config.items() if not key.endswith("_api_key")}
+    results = []
+    for backend in ("huggingface", "onnx"):
+        output = subprocess.run(
+            [sys.executable, "-m", "rag.onnx_embeddings", "_bench", "--repeats", str(repeats)],
+            input=json.dumps(dict(settings, embedding_backend=backend)),
+            check=True, capture_output=True, text=True, env=dict(os.environ), cwd=PROJECT_ROOT
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return results
+
+def main(argv: List[str] = None) -> int:
+    """Command line entry point for exporting, checking and benchmarking."""
+    from .config import load_rag_config
+
+    parser = argparse.ArgumentParser(description="Manage the quantized ONNX embedder")
+    parser.add_argument("command", choices=["export", "check", "benchmark", "_bench"])
+    parser.add_argument("--model-dir", help="Exported model directory (default: RAG_ONNX_MODEL_DIR)")
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    if args.command == "_bench":
+        # Benchmark worker: the configuration arrives on stdin
+        print(json.dumps(_benchmark_worker(json.load(sys.stdin), args.repeats)))
+        return 0
+
+    config = load_rag_config()
+    if args.model_dir:
+        config["onnx_model_dir"] = args.model_dir
+    args.model_dir = config["onnx_model_dir"]
+
+    if args.command == "export":
+        export_onnx_model(config["embedding_model"], args.model_dir)
+        print(f"Exported int8 model to {args.model_dir}")
+        args.command = "check"
+
+    if args.command == "check":
+        min_cosine = check_onnx_model(config)
+        status = "OK" if min_cosine >= ONNX_MIN_COSINE else "FAILED"
+        print(f"{status}: lowest cosine vs HuggingFace = {min_cosine:.4f} (tolerance {ONNX_MIN_COSINE})")
+        return 0 if status == "OK" else 1
+
+    results = benchmark(config, args.repeats)
+    columns = list(results[0])
+    print(" | ".join(columns))
+    for result in results:
+        print(" | ".join(str(result[c]) for c in columns))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
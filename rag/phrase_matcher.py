@@ -0,0 +1,129 @@
+"""
+Aho-Corasick matching of many phrases in one pass over a message.
+
+Phrases and messages are split into normalized tokens (``tokenize``),
+and the automaton runs over tokens rather than characters. Phrases
+therefore only match whole words ("help" does not match "helpful"),
+multi-word phrases match across any spacing or punctuation, and
+Urdu/Sindhi diacritics do not matter.
+
+Tokens are compared exactly first, so "ned help" does not match a
+"need help" phrase and "god" does not match "good". Only a message word
+that is not in any phrase is retried with its repeated Latin letters collapsed, which
+lets Roman-Urdu spellings such as "bachaooo" or "sailaab" match "bachao"
+and "sailab".
+"""
+import re
+import unicodedata
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+_TOKEN_RE = re.compile(r"\w+")
+_REPEATED_RE = re.compile(r"(.)\1+")
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into matcher tokens.
+
+    Text is NFKC-normalized and lower-cased, and combining marks (accents,
+    Urdu and Sindhi diacritics) are dropped. Letters are kept as written.
+
+    Args:
+        text: Raw text
+
+    Returns:
+        List[str]: Tokens in order of appearance
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = "".join(c for c in unicodedata.normalize("NFD", text) if not unicodedata.combining(c))
+    return _TOKEN_RE.findall(text)
+
+def collapse_repeats(token: str) -> str:
+    """Collapse repeated letters of a Latin word ("sailaab" -> "sailab")."""
+    if token.isascii() and token.isalpha():
+        return _REPEATED_RE.sub(r"\1", token)
+    return token
+
+class PhraseMatcher:
+    """
+    Token-level Aho-Corasick automaton over a fixed phrase set.
+    """
+
+    def __init__(self, phrases: Iterable[Tuple[str, Any]], tokenizer: Callable[[str], List[str]] = tokenize):
+        """
+        Compile the automaton.
+
+        Args:
+            phrases: ``(phrase, payload)`` pairs; the payload is returned
+                with every match of the phrase
+            tokenizer: Splits phrases and messages into tokens
+        """
+        self.tokenizer = tokenizer
+        self.phrases: List[Tuple[str, Any]] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Phrase ids ending at each state, including those reached by failure links
+        self._out: List[List[int]] = [[]]
+        # Every token used by a phrase
+        self._vocabulary = set()
+
+        for phrase, payload in phrases:
+            tokens = self.tokenizer(phrase)
+            if not tokens:
+                continue
+            state = 0
+            self._vocabulary.update(tokens)
+            for token in tokens:
+                if token not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                    self._goto[state][token] = len(self._goto) - 1
+                state = self._goto[state][token]
+            self._out[state].append(len(self.phrases))
+            self.phrases.append((phrase, payload))
+
+        # Breadth-first: a state's failure link is the longest proper
+        # suffix of its token path that is also a path from the root
+        # (the root itself for the first tokens of the phrases)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, child in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and token not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(token, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+                queue.append(child)
+
+    def __len__(self) -> int:
+        """Number of phrases in the automaton."""
+        return len(self.phrases)
+
+    def _symbol(self, token: str) -> str:
+        """A message token, or its collapsed form if only that is a phrase token."""
+        if token in self._vocabulary:
+            return token
+        collapsed = collapse_repeats(token)
+        return collapsed if collapsed in self._vocabulary else token
+
+    def find(self, text: str) -> List[Tuple[str, Any]]:
+        """
+        Find every phrase occurrence in a text.
+
+        Args:
+            text: Message to scan
+
+        Returns:
+            List[Tuple[str, Any]]: ``(phrase, payload)`` per occurrence, in
+            order of where the occurrence ends
+        """
+        matches = []
+        state = 0
+        for token in map(self._symbol, self.tokenizer(text)):
+            while state and token not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(token, 0)
+            matches.extend(self.phrases[i] for i in self._out[state])
+        return matches
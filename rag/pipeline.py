@@ -0,0 +1,218 @@
+"""
+Composable QA pipeline: retriever -> context budget -> prompt -> rate limit -> LLM -> parser.
+
+Replaces the legacy ``RetrievalQA`` chain with a LangChain runnable that
+supports ``invoke``, ``batch``, ``stream`` and ``ainvoke``, with hooks
+observing each stage.
+"""
+import logging
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+from langchain_core.documents import Document
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import Runnable, RunnableConfig, RunnableLambda, RunnableParallel, RunnablePassthrough
+
+from .context import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Pipeline stages that accept hooks
+STAGES = ("retrieve", "context", "prompt", "answer")
+
+# Context sent when no chunk is relevant, so the prompt's general safety
+# guidance applies instead of answering from unrelated text
+NO_CONTEXT = "No relevant documents were found."
+
+def format_docs(docs: List[Document]) -> str:
+    """Join retrieved chunks the way the "stuff" chain did."""
+    if not docs:
+        return NO_CONTEXT
+    return "\n\n".join(doc.page_content for doc in docs)
+
+class QAPipeline:
+    """
+    Retrieval QA pipeline built as a LangChain runnable.
+
+    Hooks are callables receiving the output of a stage: the retrieved
+    documents (``retrieve``), the context budget report (``context``),
+    the formatted prompt (``prompt``) and the final answer text
+    (``answer``). Hook errors are logged and never break an answer.
+
+    With a rate limiter, each LLM call first takes one request and the
+    prompt's estimated tokens; the answer's tokens are charged afterwards.
+    """
+
+    def __init__(self, retriever: Runnable, prompt: PromptTemplate, llm: Runnable,
+                 hooks: Optional[Dict[str, List[Callable[[Any], None]]]] = None,
+                 budgeter=None, limiter=None):
+        """
+        Compose the pipeline.
+
+        Args:
+            retriever: Document retriever
+            prompt: QA prompt with ``context`` and ``question`` variables
+            llm: Chat model
+            hooks: Hook lists keyed by stage name (shared, may grow later)
+            budgeter: ``ContextBudgeter`` applied to the retrieved chunks (optional)
+            limiter: ``TokenBucketLimiter`` gating the LLM calls (optional)
+        """
+        self.retriever = retriever
+        self.prompt = prompt
+        self.llm = llm
+        self.budgeter = budgeter
+        self.limiter = limiter
+        self.hooks = hooks if hooks is not None else {stage: [] for stage in STAGES}
+        self.runnable = (
+            RunnableParallel(
+                context=retriever
+                | self._tap("retrieve")
+                | RunnableLambda(self._remember)
+                | RunnableLambda(self._budget)
+                | RunnableLambda(format_docs),
+                question=RunnablePassthrough(),
+            )
+            | prompt
+            | self._tap("prompt")
+            | RunnableLambda(self._gate, afunc=self._agate)
+            | llm
+            | StrOutputParser()
+        )
+
+    def _fire(self, stage: str, value: Any) -> None:
+        """Call every hook registered for a stage."""
+        for hook in self.hooks.get(stage, []):
+            try:
+                hook(value)
+            except Exception:
+                logger.exception("QA pipeline hook failed at stage %s", stage)
+
+    @staticmethod
+    def _remember(docs: List[Document], config: RunnableConfig) -> List[Document]:
+        """Record the retrieved documents in the caller's dict, if it passed one."""
+        record = config.get("configurable", {}).get("retrieved")
+        if record is not None:
+            record["docs"] = docs
+        return docs
+
+    def _budget(self, docs: List[Document]) -> List[Document]:
+        """Dedupe and trim the retrieved chunks to the context budget."""
+        if self.budgeter is None:
+            return docs
+        docs, report = self.budgeter.assemble(docs)
+        logger.debug("Context budget: %s", report)
+        self._fire("context", report)
+        return docs
+
+    def _tokens(self, text: str) -> int:
+        """Estimate tokens with the budgeter's ratio when there is one."""
+        if self.budgeter is not None:
+            return estimate_tokens(text, self.budgeter.chars_per_token)
+        return estimate_tokens(text)
+
+    def _gate(self, prompt_value: Any) -> Any:
+        """Wait for rate-limit budget before the LLM call."""
+        if self.limiter is not None:
+            self.limiter.acquire_blocking(self._tokens(prompt_value.to_string()))
+        return prompt_value
+
+    async def _agate(self, prompt_value: Any) -> Any:
+        """Wait for rate-limit budget before the LLM call without blocking the loop."""
+        if self.limiter is not None:
+            await self.limiter.acquire(self._tokens(prompt_value.to_string()))
+        return prompt_value
+
+    def _finish(self, answer: str) -> None:
+        """Charge the answer's tokens and fire the answer hooks."""
+        if self.limiter is not None:
+            self.limiter.charge(self._tokens(answer))
+        self._fire("answer", answer)
+
+    def _tap(self, stage: str) -> Runnable:
+        """Build a pass-through runnable that fires the hooks of a stage."""
+        def tap(value):
+            self._fire(stage, value)
+            return value
+        return RunnableLambda(tap)
+
+    def invoke(self, question: str) -> str:
+        """
+        Answer one question synchronously.
+
+        Args:
+            question: User's question
+
+        Returns:
+            str: Generated answer
+        """
+        answer = self.runnable.invoke(question)
+        self._finish(answer)
+        return answer
+
+    def batch(self, questions: List[str], max_concurrency: Optional[int] = None) -> List[str]:
+        """
+        Answer several questions concurrently.
+
+        Args:
+            questions: User questions
+            max_concurrency: Maximum questions in flight
+
+        Returns:
+            List[str]: Answers in the order of ``questions``
+        """
+        answers = self.runnable.batch(questions, config={"max_concurrency": max_concurrency})
+        for answer in answers:
+            self._finish(answer)
+        return answers
+
+    def stream(self, question: str) -> Iterator[str]:
+        """
+        Stream the answer to a question.
+
+        Args:
+            question: User's question
+
+        Yields:
+            str: Answer text fragments as the LLM produces them
+        """
+        parts = []
+        for chunk in self.runnable.stream(question):
+            if chunk:
+                parts.append(chunk)
+                yield chunk
+        self._finish("".join(parts))
+
+    async def ainvoke(self, question: str) -> str:
+        """
+        Answer one question asynchronously.
+
+        Args:
+            question: User's question
+
+        Returns:
+            str: Generated answer
+        """
+        answer = await self.runnable.ainvoke(question)
+        self._finish(answer)
+        return answer
+
+    async def astream(self, question: str, retrieved: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """
+        Stream the answer to a question asynchronously.
+
+        Args:
+            question: User's question
+            retrieved: Dict that receives the retrieved documents under
+                ``"docs"`` (before the context budget), so a caller whose
+                generation fails can still use them
+
+        Yields:
+            str: Answer text fragments as the LLM produces them
+        """
+        config = {"configurable": {"retrieved": retrieved}} if retrieved is not None else None
+        parts = []
+        async for chunk in self.runnable.astream(question, config=config):
+            if chunk:
+                parts.append(chunk)
+                yield chunk
+        self._finish("".join(parts))
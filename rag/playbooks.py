@@ -0,0 +1,205 @@
+"""
+Offline emergency playbooks.
+
+A playbook is a vetted answer for one (emergency type, output language)
+pair. All playbooks are stored in one versioned JSON artifact and loaded
+into memory, so a classified emergency is answered with a dictionary lookup
+and no network access.
+
+Generate, review and approve the playbooks with::
+
+    python -m rag.playbooks build
+    python -m rag.playbooks show Flood Urdu
+    python -m rag.playbooks approve Flood Urdu
+    python -m rag.playbooks approve --all
+
+Building needs Gemini and the vector store; serving does not.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .emergency import EMERGENCY_TYPES
+from .prompts import SUPPORTED_LANGUAGES
+
+PLAYBOOK_SCHEMA = 1
+
+# Canonical question answered for each emergency type
+PLAYBOOK_QUESTIONS = {
+    "Flood": "I am caught in a flood right now. What should I do immediately to stay safe?",
+    "Earthquake": "An earthquake is happening right now. What should I do immediately to stay safe?",
+    "Fire": "There is a fire near me right now. What should I do immediately to stay safe?",
+    "Medical": "Someone is injured and needs medical help right now. What should I do immediately?",
+    "General": "I am in an emergency right now. What should I do immediately to stay safe?",
+}
+
+class PlaybookStore:
+    """
+    In-memory view of the playbook artifact.
+
+    Lookups are O(1) on ``(emergency_type, output_lang)``. Unless
+    ``require_review`` is False, only playbooks approved by a reviewer are
+    served.
+    """
+
+    def __init__(self, artifact: Optional[Dict[str, Any]] = None, require_review: bool = True):
+        """
+        Initialize the store.
+
+        Args:
+            artifact: Parsed playbook artifact (empty store if None)
+            require_review: Only serve approved playbooks
+        """
+        self.artifact = artifact or {"schema": PLAYBOOK_SCHEMA, "version": 0, "playbooks": {}}
+        self.require_review = require_review
+        self._index: Dict[Tuple[str, str], str] = {}
+        for emergency_type, languages in self.artifact["playbooks"].items():
+            for output_lang, entry in languages.items():
+                if entry.get("reviewed") or not require_review:
+                    self._index[(emergency_type, output_lang)] = entry["text"]
+
+    @classmethod
+    def load(cls, path: str, require_review: bool = True) -> "PlaybookStore":
+        """
+        Load the artifact from disk.
+
+        Args:
+            path: Artifact path
+            require_review: Only serve approved playbooks
+
+        Returns:
+            PlaybookStore: The loaded store (empty if the file does not exist)
+        """
+        if not os.path.exists(path):
+            return cls(require_review=require_review)
+        with open(path, encoding="utf-8") as f:
+            artifact = json.load(f)
+        if artifact.get("schema") != PLAYBOOK_SCHEMA:
+            raise ValueError(f"Unsupported playbook schema {artifact.get('schema')}")
+        return cls(artifact, require_review=require_review)
+
+    def save(self, path: str) -> None:
+        """Write the artifact atomically."""
+        target = Path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = target.with_name(target.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.artifact, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, target)
+
+    @property
+    def version(self) -> int:
+        """Artifact version, incremented by every build."""
+        return self.artifact["version"]
+
+    def get(self, emergency_type: str, output_lang: str) -> Optional[str]:
+        """
+        Look up a playbook.
+
+        Args:
+            emergency_type: One of ``EMERGENCY_TYPES``
+            output_lang: Output language
+
+        Returns:
+            Optional[str]: Playbook text, or None if no servable playbook exists
+        """
+        return self._index.get((emergency_type, output_lang))
+
+    def __len__(self) -> int:
+        """Number of servable playbooks."""
+        return len(self._index)
+
+def build_playbooks(engine, previous: Optional[PlaybookStore] = None,
+                    pairs: Optional[List[Tuple[str, str]]] = None) -> PlaybookStore:
+    """
+    Generate playbooks with the RAG chains.
+
+    Regenerated playbooks start unreviewed; playbooks outside ``pairs``
+    are carried over from the previous artifact unchanged.
+
+    Args:
+        engine: Ready RAG engine
+        previous: Previous artifact to carry over and version from
+        pairs: (emergency type, language) pairs to build (all if None)
+
+    Returns:
+        PlaybookStore: Store holding the new artifact
+    """
+    previous = previous or PlaybookStore()
+    playbooks = json.loads(json.dumps(previous.artifact["playbooks"]))
+    pairs = pairs or [(t, lang) for t in EMERGENCY_TYPES for lang in SUPPORTED_LANGUAGES]
+
+    for emergency_type, output_lang in pairs:
+        question = PLAYBOOK_QUESTIONS[emergency_type]
+        text = engine.get_chain(output_lang).invoke(question)
+        playbooks.setdefault(emergency_type, {})[output_lang] = {
+            "question": question,
+            "text": text,
+            "reviewed": False,
+            "generated_at": time.time(),
+        }
+
+    artifact = {
+        "schema": PLAYBOOK_SCHEMA,
+        "version": previous.version + 1,
+        "generated_at": time.time(),
+        "llm_model": engine.config["llm_model"],
+        "index_name": engine.config["index_name"],
+        "playbooks": playbooks,
+    }
+    return PlaybookStore(artifact, require_review=previous.require_review)
+
+def main(argv: List[str] = None) -> int:
+    """Command line entry point for building and reviewing playbooks."""
+    from .config import load_rag_config
+
+    config = load_rag_config()
+    parser = argparse.ArgumentParser(description="Manage the offline emergency playbooks")
+    parser.add_argument("command", choices=["build", "show", "approve"])
+    parser.add_argument("emergency_type", nargs="?", choices=EMERGENCY_TYPES)
+    parser.add_argument("language", nargs="?", choices=SUPPORTED_LANGUAGES)
+    parser.add_argument("--all", action="store_true", help="Approve every playbook")
+    parser.add_argument("--path", default=config["playbooks_path"])
+    args = parser.parse_args(argv)
+
+    store = PlaybookStore.load(args.path, require_review=False)
+    selected = [
+        (t, lang)
+        for t in EMERGENCY_TYPES if args.emergency_type in (None, t)
+        for lang in SUPPORTED_LANGUAGES if args.language in (None, lang)
+    ]
+
+    if args.command == "build":
+        from .engine import get_engine
+        engine = get_engine(config)
+        if not engine.is_ready():
+            print(f"RAG engine not ready: {engine.last_error}", file=sys.stderr)
+            return 1
+        store = build_playbooks(engine, store, selected)
+        store.save(args.path)
+        print(f"Built {len(selected)} playbooks, artifact version {store.version} (unreviewed)")
+    elif args.command == "show":
+        for emergency_type, output_lang in selected:
+            entry = store.artifact["playbooks"].get(emergency_type, {}).get(output_lang)
+            if entry:
+                status = "reviewed" if entry["reviewed"] else "UNREVIEWED"
+                print(f"=== {emergency_type} / {output_lang} ({status}) ===\n{entry['text']}\n")
+    else:
+        if not args.all and args.emergency_type is None:
+            parser.error("approve needs an emergency type (and language) or --all")
+        approved = 0
+        for emergency_type, output_lang in selected:
+            entry = store.artifact["playbooks"].get(emergency_type, {}).get(output_lang)
+            if entry:
+                entry["reviewed"] = True
+                approved += 1
+        store.save(args.path)
+        print(f"Approved {approved} playbooks")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
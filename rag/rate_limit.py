@@ -0,0 +1,308 @@
+"""
+Token-bucket rate limiting for Gemini calls.
+
+Two buckets, requests per minute (RPM) and estimated tokens per minute
+(TPM), refill continuously. A call takes one request and its estimated
+prompt tokens before it is sent; the answer's tokens are charged when it
+completes, which may leave the token bucket in debt and delay later calls.
+
+Within a process the buckets are shared by every session. With a state
+file they are also shared by every process on the machine (several
+Streamlit workers, the playbook builder). Decisions are always made on
+the in-process buckets, so no call waits on disk I/O or on another
+process's lock. A background thread reconciles them with the file every
+``sync_interval`` seconds under an exclusive ``flock``: it writes the
+budget this process used since the last sync and reads back the shared
+levels. On platforms without ``fcntl`` the limiter falls back to
+per-process buckets.
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from typing import Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from .admission import AdmissionRejected
+
+logger = logging.getLogger(__name__)
+
+class RateLimited(AdmissionRejected):
+    """Raised when a call cannot get rate-limit budget in time."""
+
+    def __init__(self, wait: float):
+        super().__init__("rate_limit")
+        self.wait = wait
+
+class TokenBucketLimiter:
+    """
+    RPM and TPM token buckets, optionally shared through a state file.
+    """
+
+    def __init__(self, rpm: float, tpm: float, state_path: Optional[str] = None, max_wait: float = 10,
+                 sync_interval: float = 1.0):
+        """
+        Initialize full buckets (or join the shared ones).
+
+        Args:
+            rpm: Requests per minute (also the request burst size)
+            tpm: Tokens per minute (also the token burst size)
+            state_path: File shared with other processes (None keeps the
+                buckets in this process only)
+            max_wait: Default seconds a call waits for budget
+            sync_interval: Seconds between reconciliations with the file
+        """
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._sync_thread: Optional[threading.Thread] = None
+        self._state = {"requests": float(rpm), "tokens": float(tpm), "updated": time.time()}
+        # Budget used in this process since the last sync
+        self._used = {"requests": 0.0, "tokens": 0.0}
+        self.granted = 0
+        self.waited = 0
+        self.limited = 0
+        self.sync_failures = 0
+        self.configure(rpm, tpm, state_path, max_wait, sync_interval)
+
+    def configure(self, rpm: float, tpm: float, state_path: Optional[str] = None, max_wait: float = 10,
+                  sync_interval: float = 1.0) -> None:
+        """
+        Update the limits, e.g. after a configuration reload.
+
+        Bucket levels are kept (and capped by the new limits on the next
+        refill).
+
+        Args:
+            rpm: Requests per minute
+            tpm: Tokens per minute
+            state_path: File shared with other processes (None keeps the
+                buckets in this process only)
+            max_wait: Default seconds a call waits for budget
+            sync_interval: Seconds between reconciliations with the file
+        """
+        with self._lock:
+            self.rpm = float(rpm)
+            self.tpm = float(tpm)
+            self.max_wait = max_wait
+            self.sync_interval = sync_interval
+            self.state_path = state_path if fcntl is not None else None
+            if self.state_path:
+                os.makedirs(os.path.dirname(os.path.abspath(self.state_path)), exist_ok=True)
+            if self.state_path and self._sync_thread is None:
+                self._sync_thread = threading.Thread(target=self._sync_loop, name="rate-limit-sync", daemon=True)
+                self._sync_thread.start()
+
+    def _refill(self, state: Dict[str, float], now: float) -> Dict[str, float]:
+        """Add the budget earned since the last update."""
+        elapsed = max(0.0, now - state["updated"])
+        return {
+            "requests": min(self.rpm, state["requests"] + elapsed * self.rpm / 60),
+            "tokens": min(self.tpm, state["tokens"] + elapsed * self.tpm / 60),
+            "updated": now,
+        }
+
+    def _update(self, change) -> float:
+        """
+        Apply ``change`` to the refilled in-process buckets atomically.
+
+        ``change`` receives the current levels and returns the new levels
+        (or None to leave them) plus a result passed back to the caller.
+        Never touches the state file.
+        """
+        with self._lock:
+            current = self._refill(self._state, time.time())
+            before = dict(current)
+            state, result = change(current)
+            if state is not None:
+                self._used["requests"] += before["requests"] - state["requests"]
+                self._used["tokens"] += before["tokens"] - state["tokens"]
+                self._state = state
+            else:
+                self._state = before
+            return result
+
+    def sync(self) -> None:
+        """
+        Reconcile the in-process buckets with the shared state file.
+
+        The budget used here since the last sync is deducted from the
+        shared levels, which then replace the local ones (minus anything
+        used while the file was locked). Blocking; runs on the sync thread.
+        """
+        if not self.state_path:
+            return
+        with self._sync_lock:
+            with self._lock:
+                used, self._used = self._used, {"requests": 0.0, "tokens": 0.0}
+                # Levels before that usage, for a missing or corrupt file
+                local = dict(self._state, requests=self._state["requests"] + used["requests"],
+                             tokens=self._state["tokens"] + used["tokens"])
+            try:
+                fd = os.open(self.state_path, os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                    raw = os.read(fd, 4096)
+                    try:
+                        stored = json.loads(raw) if raw else local
+                    except ValueError:
+                        stored = local
+                    shared = self._refill(stored, time.time())
+                    shared["requests"] -= used["requests"]
+                    shared["tokens"] -= used["tokens"]
+                    payload = json.dumps(shared).encode("utf-8")
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    os.ftruncate(fd, 0)
+                    os.write(fd, payload)
+                finally:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                    os.close(fd)
+            except OSError:
+                self.sync_failures += 1
+                logger.warning("Could not sync rate-limit state with %s", self.state_path, exc_info=True)
+                with self._lock:
+                    # Report the usage again on the next sync
+                    self._used["requests"] += used["requests"]
+                    self._used["tokens"] += used["tokens"]
+                return
+            with self._lock:
+                shared["requests"] -= self._used["requests"]
+                shared["tokens"] -= self._used["tokens"]
+                self._state = shared
+
+    def _sync_loop(self) -> None:
+        """Reconcile with the state file for the life of the process."""
+        while True:
+            time.sleep(self.sync_interval)
+            self.sync()
+
+    def try_acquire(self, tokens: float) -> float:
+        """
+        Take one request and ``tokens`` tokens if both are available.
+
+        Args:
+            tokens: Estimated prompt tokens of the call
+
+        Returns:
+            float: 0 if acquired, otherwise seconds until it could be
+        """
+        tokens = min(tokens, self.tpm)
+
+        def change(state):
+            missing_requests = 1 - state["requests"]
+            missing_tokens = tokens - state["tokens"]
+            if missing_requests <= 0 and missing_tokens <= 0:
+                state["requests"] -= 1
+                state["tokens"] -= tokens
+                return state, 0.0
+            wait = max(missing_requests * 60 / self.rpm, missing_tokens * 60 / self.tpm)
+            return None, max(wait, 0.001)
+
+        return self._update(change)
+
+    def charge(self, tokens: float) -> None:
+        """
+        Charge tokens used after the fact (e.g. the generated answer).
+
+        Args:
+            tokens: Estimated tokens to deduct
+        """
+        def change(state):
+            state["tokens"] -= tokens
+            return state, None
+
+        if tokens > 0:
+            self._update(change)
+
+    def acquire_blocking(self, tokens: float, max_wait: Optional[float] = None) -> None:
+        """
+        Wait (blocking) for budget.
+
+        Args:
+            tokens: Estimated prompt tokens of the call
+            max_wait: Maximum seconds to wait (defaults to ``self.max_wait``)
+
+        Raises:
+            RateLimited: If the budget is not available within ``max_wait``
+        """
+        deadline = time.monotonic() + (self.max_wait if max_wait is None else max_wait)
+        waited = False
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0:
+                self.granted += 1
+                self.waited += waited
+                return
+            if time.monotonic() + wait > deadline:
+                self.limited += 1
+                raise RateLimited(wait)
+            waited = True
+            time.sleep(wait)
+
+    async def acquire(self, tokens: float, max_wait: Optional[float] = None) -> None:
+        """
+        Wait (asynchronously) for budget.
+
+        Args:
+            tokens: Estimated prompt tokens of the call
+            max_wait: Maximum seconds to wait (defaults to ``self.max_wait``)
+
+        Raises:
+            RateLimited: If the budget is not available within ``max_wait``
+        """
+        deadline = time.monotonic() + (self.max_wait if max_wait is None else max_wait)
+        waited = False
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0:
+                self.granted += 1
+                self.waited += waited
+                return
+            if time.monotonic() + wait > deadline:
+                self.limited += 1
+                raise RateLimited(wait)
+            waited = True
+            await asyncio.sleep(wait)
+
+    def fraction(self) -> float:
+        """Remaining budget as a fraction of the tighter bucket (0 to 1)."""
+        return self.remaining()["fraction"]
+
+    def remaining(self) -> Dict[str, float]:
+        """
+        Report the budget available right now.
+
+        Returns:
+            Dict[str, float]: Requests and tokens left, and the smaller of
+            the two as a fraction of its bucket (``fraction``)
+        """
+        state = self._update(lambda state: (None, state))
+        return {
+            "requests": round(state["requests"], 2),
+            "tokens": round(state["tokens"]),
+            "fraction": max(0.0, min(state["requests"] / self.rpm, state["tokens"] / self.tpm)),
+        }
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Report limiter counters and the remaining budget.
+
+        Returns:
+            Dict[str, float]: Limits, remaining budget, granted calls, calls
+            that had to wait, calls rejected and failed file syncs
+        """
+        return {
+            "rpm": self.rpm,
+            "tpm": self.tpm,
+            "shared": bool(self.state_path),
+            "remaining": self.remaining(),
+            "granted": self.granted,
+            "waited": self.waited,
+            "limited": self.limited,
+            "sync_failures": self.sync_failures,
+        }
@@ -0,0 +1,622 @@
+"""
+Resilience wrapper around the chat model.
+
+``ResilientLLM`` sits where the chat model sits in the QA pipeline and
+adds three protections:
+
+- **Deadline:** a call that has produced nothing after ``deadline``
+  seconds raises ``DeadlineExceeded``. For streams this bounds the wait
+  for the first chunk; once text is flowing it runs to completion.
+- **Hedging:** if the first attempt is still silent after the recent p95
+  first-chunk latency, a second identical attempt is started and
+  whichever answers first wins; the other is cancelled.
+- **Circuit breaker:** after ``failure_threshold`` consecutive failures
+  the breaker opens and calls fail fast with ``CircuitOpen`` until
+  ``reset_timeout`` passes; then one probe call is let through
+  (half-open) and its outcome closes or re-opens the breaker.
+
+``FakeLLM`` is a local stand-in for Gemini with injected latency, tail
+latency and failures, for exercising all of the above without a network.
+
+Usage:
+    python -m rag.resilience simulate --calls 200 --tail-probability 0.1
+"""
+import sys
+import time
+import random
+import asyncio
+import argparse
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from .context import estimate_tokens
+from .metrics import LatencyTracker
+
+class LLMUnavailable(Exception):
+    """Raised when the LLM cannot answer in time."""
+
+class CircuitOpen(LLMUnavailable):
+    """Raised without calling the LLM while the circuit breaker is open."""
+
+    def __init__(self):
+        super().__init__("LLM circuit breaker is open")
+
+class DeadlineExceeded(LLMUnavailable):
+    """Raised when an LLM call produces nothing before its deadline."""
+
+    def __init__(self, deadline: float):
+        super().__init__(f"LLM produced no output within {deadline:g}s")
+        self.deadline = deadline
+
+# Circuit breaker states
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker with a single half-open probe.
+
+    Thread-safe: it is shared by the event loop and synchronous callers.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        """
+        Initialize a closed breaker.
+
+        Args:
+            failure_threshold: Consecutive failures that open the breaker
+            reset_timeout: Seconds the breaker stays open before a probe
+        """
+        self._lock = threading.Lock()
+        self.configure(failure_threshold, reset_timeout)
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.opens = 0
+        self._probing = False
+
+    def configure(self, failure_threshold: int, reset_timeout: float) -> None:
+        """
+        Update the thresholds, e.g. after a configuration reload.
+
+        Args:
+            failure_threshold: Consecutive failures that open the breaker
+            reset_timeout: Seconds the breaker stays open before a probe
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+    def _cooling(self) -> bool:
+        """Check whether an open breaker is still within its reset timeout."""
+        return time.monotonic() - self.opened_at < self.reset_timeout
+
+    def is_open(self) -> bool:
+        """Check whether a call would be refused right now (without claiming a probe)."""
+        with self._lock:
+            if self.state == OPEN:
+                return self._cooling()
+            return self.state == HALF_OPEN and self._probing
+
+    def allow(self) -> bool:
+        """
+        Ask to make a call.
+
+        Returns:
+            bool: True if the call may go ahead (possibly as the probe)
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if self._cooling():
+                    return False
+                self.state = HALF_OPEN
+                self._probing = False
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        """Close the breaker after a successful call."""
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        """Count a failed call, opening the breaker at the threshold or after a failed probe."""
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.opens += 1
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def abandon(self) -> None:
+        """Forget a call that was cancelled before it succeeded or failed."""
+        with self._lock:
+            self._probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report the breaker state.
+
+        Returns:
+            Dict[str, Any]: State, consecutive failures and times opened
+        """
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "opens": self.opens,
+        }
+
+def _prompt_text(value: Any) -> str:
+    """Text of an LLM input (prompt value, string or messages)."""
+    if hasattr(value, "to_string"):
+        return value.to_string()
+    return str(value)
+
+async def _first_item(iterator: AsyncIterator) -> Tuple[bool, Any]:
+    """Await the first item of an iterator as (has_item, item)."""
+    try:
+        return True, await iterator.__anext__()
+    except StopAsyncIteration:
+        return False, None
+
+async def _discard(task: asyncio.Future, iterator: AsyncIterator) -> None:
+    """Cancel a losing attempt and close its stream."""
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    aclose = getattr(iterator, "aclose", None)
+    if aclose is not None:
+        try:
+            await aclose()
+        except Exception:
+            pass
+
+class ResilientLLM(Runnable):
+    """
+    Chat model wrapper with a deadline, hedged attempts and a circuit breaker.
+    """
+
+    def __init__(self, llm: Runnable, breaker: CircuitBreaker, deadline: float = 25,
+                 hedge: bool = True, hedge_delay: float = 3.0, hedge_min_delay: float = 1.0,
+                 hedge_percentile: float = 95, hedge_min_samples: int = 20, limiter=None):
+        """
+        Wrap a chat model.
+
+        Args:
+            llm: Chat model (or ``FakeLLM``)
+            breaker: Circuit breaker shared by every wrapper of this model
+            deadline: Seconds an attempt may stay silent
+            hedge: Start a second attempt when the first is slow
+            hedge_delay: Hedge delay until enough latency samples exist
+            hedge_min_delay: Lower bound of the hedge delay
+            hedge_percentile: First-chunk latency percentile used as the delay
+            hedge_min_samples: Samples needed before the percentile is used
+            limiter: ``TokenBucketLimiter``; hedges are only sent when it has
+                budget to spare right away (optional)
+        """
+        self.llm = llm
+        self.breaker = breaker
+        self.deadline = deadline
+        self.hedge = hedge
+        self.hedge_default_delay = hedge_delay
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.limiter = limiter
+        # First-output latency of winning attempts
+        self.latency = LatencyTracker()
+        self._counts = {"calls": 0, "hedges": 0, "hedge_wins": 0, "deadline_exceeded": 0,
+                        "failures": 0, "short_circuited": 0}
+        self._counts_lock = threading.Lock()
+
+    def _count(self, name: str) -> None:
+        """Increment a counter."""
+        with self._counts_lock:
+            self._counts[name] += 1
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait for the first attempt before hedging."""
+        delay = self.hedge_default_delay
+        if self.latency.count >= self.hedge_min_samples:
+            delay = self.latency.percentile(self.hedge_percentile)
+        return max(self.hedge_min_delay, delay)
+
+    def _may_hedge(self, value: Any) -> bool:
+        """Check whether a hedge fits the rate-limit budget without waiting."""
+        if self.limiter is None:
+            return True
+        return self.limiter.try_acquire(estimate_tokens(_prompt_text(value))) == 0
+
+    def _admit(self) -> None:
+        """Count a call and refuse it while the breaker is open."""
+        self._count("calls")
+        if not self.breaker.allow():
+            self._count("short_circuited")
+            raise CircuitOpen()
+
+    def _failed(self, error: BaseException) -> None:
+        """Record a failed call."""
+        self._count("deadline_exceeded" if isinstance(error, DeadlineExceeded) else "failures")
+        self.breaker.record_failure()
+
+    # ------------------------------------------------------------------
+    # Async path (the app's request path)
+    # ------------------------------------------------------------------
+    async def _arace(self, attempt: Callable[[], AsyncIterator], value: Any) -> Tuple[AsyncIterator, bool, Any]:
+        """
+        Run an attempt, hedging it if slow, until one produces its first item.
+
+        Returns:
+            Tuple[AsyncIterator, bool, Any]: Winning stream, whether it had
+            an item, and that first item
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + self.deadline
+        hedge_at = started + self.hedge_delay()
+        attempts: Dict[asyncio.Future, Tuple[AsyncIterator, float, bool]] = {}
+        hedged = not self.hedge
+        error: Optional[BaseException] = None
+
+        def launch(is_hedge: bool = False) -> None:
+            iterator = attempt().__aiter__()
+            attempts[asyncio.ensure_future(_first_item(iterator))] = (iterator, loop.time(), is_hedge)
+
+        launch()
+        try:
+            while True:
+                now = loop.time()
+                if now >= deadline:
+                    raise DeadlineExceeded(self.deadline)
+                wake = deadline if hedged else min(deadline, hedge_at)
+                done = set()
+                if attempts:
+                    done, _ = await asyncio.wait(attempts, timeout=max(0.0, wake - now),
+                                                 return_when=FIRST_COMPLETED)
+                for task in done:
+                    iterator, attempt_started, is_hedge = attempts.pop(task)
+                    try:
+                        has_item, item = task.result()
+                    except Exception as e:
+                        error = e
+                        continue
+                    self.latency.record(loop.time() - attempt_started)
+                    if is_hedge:
+                        self._count("hedge_wins")
+                    return iterator, has_item, item
+                if not attempts:
+                    # Every attempt failed; a pending hedge doubles as a retry
+                    if hedged or not self._may_hedge(value):
+                        raise error
+                    hedged = True
+                    self._count("hedges")
+                    launch(is_hedge=True)
+                elif not hedged and loop.time() >= hedge_at:
+                    hedged = True
+                    if self._may_hedge(value):
+                        self._count("hedges")
+                        launch(is_hedge=True)
+        finally:
+            for task, (iterator, _, _) in attempts.items():
+                asyncio.ensure_future(_discard(task, iterator))
+
+    async def _aguarded(self, attempt: Callable[[], AsyncIterator], value: Any) -> AsyncIterator:
+        """Stream an attempt through the breaker, deadline and hedging."""
+        self._admit()
+        try:
+            iterator, has_item, item = await self._arace(attempt, value)
+        except asyncio.CancelledError:
+            self.breaker.abandon()
+            raise
+        except Exception as e:
+            self._failed(e)
+            raise
+        self.breaker.record_success()
+        if not has_item:
+            return
+        try:
+            yield item
+            async for item in iterator:
+                yield item
+        except Exception:
+            self._count("failures")
+            self.breaker.record_failure()
+            raise
+        finally:
+            aclose = getattr(iterator, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    async def astream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs) -> AsyncIterator:
+        """Stream the model's answer with the protections applied."""
+        async for chunk in self._aguarded(lambda: self.llm.astream(input, config, **kwargs), input):
+            yield chunk
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs) -> Any:
+        """Get the model's answer with the protections applied."""
+        async def once():
+            yield await self.llm.ainvoke(input, config, **kwargs)
+
+        results = [result async for result in self._aguarded(once, input)]
+        return results[0]
+
+    # ------------------------------------------------------------------
+    # Sync path (playbook builder, batch)
+    # ------------------------------------------------------------------
+    def _race(self, call: Callable[[], Any], value: Any) -> Any:
+        """
+        Run a blocking call in a thread, hedging it if slow.
+
+        Threads cannot be cancelled, so losing or late attempts finish in
+        the background (bounded by the client timeout) and their results
+        are dropped. Each attempt gets its own thread so abandoned ones
+        never hold up later calls.
+        """
+        def launch(is_hedge: bool = False) -> None:
+            future = Future()
+
+            def run() -> None:
+                try:
+                    future.set_result(call())
+                except BaseException as e:
+                    future.set_exception(e)
+
+            threading.Thread(target=run, name="rag-llm-attempt", daemon=True).start()
+            attempts[future] = (time.monotonic(), is_hedge)
+
+        started = time.monotonic()
+        deadline = started + self.deadline
+        hedge_at = started + self.hedge_delay()
+        attempts: Dict[Future, Tuple[float, bool]] = {}
+        launch()
+        hedged = not self.hedge
+        error: Optional[BaseException] = None
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                raise DeadlineExceeded(self.deadline)
+            wake = deadline if hedged else min(deadline, hedge_at)
+            done = set()
+            if attempts:
+                done, _ = wait(attempts, timeout=max(0.0, wake - now), return_when=FIRST_COMPLETED)
+            for future in done:
+                attempt_started, is_hedge = attempts.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                self.latency.record(time.monotonic() - attempt_started)
+                if is_hedge:
+                    self._count("hedge_wins")
+                return result
+            if not attempts:
+                if hedged or not self._may_hedge(value):
+                    raise error
+                hedged = True
+                self._count("hedges")
+                launch(is_hedge=True)
+            elif not hedged and time.monotonic() >= hedge_at:
+                hedged = True
+                if self._may_hedge(value):
+                    self._count("hedges")
+                    launch(is_hedge=True)
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs) -> Any:
+        """Get the model's answer with the protections applied."""
+        self._admit()
+        try:
+            result = self._race(lambda: self.llm.invoke(input, config, **kwargs), input)
+        except Exception as e:
+            self._failed(e)
+            raise
+        self.breaker.record_success()
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report resilience counters.
+
+        Returns:
+            Dict[str, Any]: Call, hedge, deadline, failure and short-circuit
+            counts, the current hedge delay, first-output latency and the
+            breaker state
+        """
+        with self._counts_lock:
+            counts = dict(self._counts)
+        return {
+            **counts,
+            "hedge_delay": self.hedge_delay() if self.hedge else None,
+            "first_output_latency": self.latency.summary(),
+            "breaker": self.breaker.stats(),
+        }
+
+FAKE_ANSWER = (
+    "This is a simulated answer. During a flood, move to higher ground, "
+    "avoid walking or driving through flood water and call 1122 for rescue."
+)
+
+class FakeLLMError(RuntimeError):
+    """Failure injected by ``FakeLLM``."""
+
+class FakeLLM(Runnable):
+    """
+    Local chat model stand-in that injects latency and failures.
+
+    Each call waits a first-output delay (uniform around ``latency``, or
+    ``tail_latency`` with probability ``tail_probability``), then fails with
+    probability ``failure_rate`` or returns ``answer`` word by word.
+    """
+
+    def __init__(self, latency: float = 0.8, tail_probability: float = 0.05, tail_latency: float = 8.0,
+                 failure_rate: float = 0.0, token_interval: float = 0.02, answer: str = FAKE_ANSWER,
+                 seed: Optional[int] = None):
+        """
+        Initialize the fake model.
+
+        Args:
+            latency: Typical seconds before the first output
+            tail_probability: Probability of a slow call
+            tail_latency: Seconds before the first output of a slow call
+            failure_rate: Probability that a call fails
+            token_interval: Seconds between streamed words
+            answer: Text every call returns
+            seed: Random seed for reproducible runs
+        """
+        self.latency = latency
+        self.tail_probability = tail_probability
+        self.tail_latency = tail_latency
+        self.failure_rate = failure_rate
+        self.token_interval = token_interval
+        self.answer = answer
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _plan(self) -> Tuple[float, bool]:
+        """Draw the delay and outcome of one call."""
+        with self._lock:
+            self.calls += 1
+            if self._random.random() < self.tail_probability:
+                delay = self.tail_latency
+            else:
+                delay = self._random.uniform(0.5, 1.5) * self.latency
+            return delay, self._random.random() < self.failure_rate
+
+    def _words(self) -> List[str]:
+        """Split the answer into streamed fragments."""
+        words = self.answer.split(" ")
+        return [word + " " for word in words[:-1]] + words[-1:]
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs) -> AIMessage:
+        """Return the answer after the injected delay."""
+        delay, fail = self._plan()
+        time.sleep(delay)
+        if fail:
+            raise FakeLLMError("Injected LLM failure")
+        return AIMessage(content=self.answer)
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs) -> AIMessage:
+        """Return the answer after the injected delay."""
+        delay, fail = self._plan()
+        await asyncio.sleep(delay)
+        if fail:
+            raise FakeLLMError("Injected LLM failure")
+        return AIMessage(content=self.answer)
+
+    def stream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs) -> Iterator[AIMessageChunk]:
+        """Stream the answer after the injected delay."""
+        delay, fail = self._plan()
+        time.sleep(delay)
+        if fail:
+            raise FakeLLMError("Injected LLM failure")
+        for word in self._words():
+            yield AIMessageChunk(content=word)
+            time.sleep(self.token_interval)
+
+    async def astream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs) -> AsyncIterator[AIMessageChunk]:
+        """Stream the answer after the injected delay."""
+        delay, fail = self._plan()
+        await asyncio.sleep(delay)
+        if fail:
+            raise FakeLLMError("Injected LLM failure")
+        for word in self._words():
+            yield AIMessageChunk(content=word)
+            await asyncio.sleep(self.token_interval)
+
+def build_fake_llm(config: Dict[str, Any]) -> Runnable:
+    """
+    Build the fake chat model of a configuration.
+
+    Args:
+        config: Engine configuration (``fake_llm_*`` keys)
+
+    Returns:
+        Runnable: ``FakeLLM`` with the configured latency profile
+    """
+    return FakeLLM(
+        latency=config["fake_llm_latency"],
+        tail_probability=config["fake_llm_tail_probability"],
+        tail_latency=config["fake_llm_tail_latency"],
+        failure_rate=config["fake_llm_failure_rate"]
+    )
+
+async def _simulate(args: argparse.Namespace, hedge: bool) -> Dict[str, Any]:
+    """Send ``args.calls`` streamed requests through a wrapped fake model."""
+    llm = ResilientLLM(
+        FakeLLM(args.latency, args.tail_probability, args.tail_latency, args.failure_rate, seed=args.seed),
+        CircuitBreaker(args.failure_threshold, args.reset_timeout),
+        deadline=args.deadline,
+        hedge=hedge,
+        hedge_min_samples=args.min_samples
+    )
+    observed = LatencyTracker(window=args.calls)
+    outcomes = {"ok": 0, "deadline": 0, "circuit_open": 0, "error": 0}
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one() -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                async for _ in llm.astream("question"):
+                    observed.record(time.perf_counter() - started)
+                    break
+                outcomes["ok"] += 1
+            except DeadlineExceeded:
+                outcomes["deadline"] += 1
+            except CircuitOpen:
+                outcomes["circuit_open"] += 1
+            except Exception:
+                outcomes["error"] += 1
+
+    await asyncio.gather(*(one() for _ in range(args.calls)))
+    return {
+        "hedging": hedge,
+        **outcomes,
+        "p50": observed.percentile(50),
+        "p95": observed.percentile(95),
+        "p99": observed.percentile(99),
+        **{key: value for key, value in llm.stats().items() if key in ("hedges", "hedge_wins")},
+        "breaker_opens": llm.breaker.opens,
+    }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(prog="python -m rag.resilience", description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    simulate = commands.add_parser("simulate", help="Compare first-chunk latency with and without hedging on a fake LLM")
+    simulate.add_argument("--calls", type=int, default=200, help="Requests to send")
+    simulate.add_argument("--concurrency", type=int, default=8, help="Requests in flight")
+    simulate.add_argument("--latency", type=float, default=0.8, help="Typical first-output seconds")
+    simulate.add_argument("--tail-probability", type=float, default=0.05, help="Probability of a slow call")
+    simulate.add_argument("--tail-latency", type=float, default=8.0, help="First-output seconds of a slow call")
+    simulate.add_argument("--failure-rate", type=float, default=0.0, help="Probability of a failed call")
+    simulate.add_argument("--deadline", type=float, default=25, help="Per-call deadline in seconds")
+    simulate.add_argument("--failure-threshold", type=int, default=5, help="Failures that open the breaker")
+    simulate.add_argument("--reset-timeout", type=float, default=30, help="Seconds the breaker stays open")
+    simulate.add_argument("--min-samples", type=int, default=20, help="Samples before the p95 hedge delay is used")
+    simulate.add_argument("--seed", type=int, default=0, help="Random seed")
+
+    args = parser.parse_args(argv)
+    for hedge in (False, True):
+        result = asyncio.run(_simulate(args, hedge))
+        print("  ".join(
+            f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}"
+            for key, value in result.items()
+        ))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,370 @@
+"""
+Vector, lexical and hybrid retrievers.
+
+Every retriever returns copies of the chunks with their retrieval score
+in ``metadata["score"]``; ``HybridRetriever`` keeps the cosine score of
+the vector side there and puts the fused score in ``metadata["rrf_score"]``.
+``VectorRetriever`` also returns the stored
+chunk embedding in ``metadata["embedding"]`` so later stages can compare
+chunks without embedding them again.
+
+``VectorRetriever`` can choose k per query from the similarity scores
+(see ``adaptive_k``) and search only the shard of the query's disaster
+type (see ``ShardRouter``). ``LexicalRetriever`` answers from the local
+BM25 index only, without a network round trip. ``HybridRetriever`` runs vector
+search and BM25 and fuses both rankings with reciprocal rank fusion (RRF).
+"""
+import logging
+import hashlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+logger = logging.getLogger(__name__)
+
+# (chunk, score, stored embedding or None)
+SearchResult = Tuple[Document, float, Optional[np.ndarray]]
+
+def scored(doc: Document, score: float, embedding: Optional[np.ndarray] = None) -> Document:
+    """
+    Copy a chunk with its retrieval score (and embedding) attached.
+
+    Args:
+        doc: Retrieved chunk
+        score: Retrieval score
+        embedding: Stored chunk embedding, if known
+
+    Returns:
+        Document: Annotated copy of the chunk
+    """
+    metadata = dict(doc.metadata, score=float(score))
+    if embedding is not None:
+        metadata["embedding"] = embedding
+    return Document(page_content=doc.page_content, metadata=metadata, id=doc.id)
+
+class FaissSearch:
+    """
+    Search a LangChain FAISS store, reconstructing the stored vectors.
+
+    With ``index`` and ``positions`` set, searches a disaster type shard
+    of the snapshot instead and maps its rows back to the store's chunks.
+
+    With ``vectors`` set (the full-width embeddings of a compressed
+    snapshot), ``rescore`` times as many candidates are fetched from the
+    compressed index and re-ranked by their exact cosine similarity, so
+    scores compare with the same thresholds as an uncompressed index.
+    """
+
+    def __init__(self, vectorstore, index=None, positions: Optional[np.ndarray] = None,
+                 vectors: Optional[np.ndarray] = None, rescore: int = 4):
+        """
+        Args:
+            vectorstore: LangChain FAISS vector store
+            index: Shard index (None searches the whole store)
+            positions: Store position of each shard row
+            vectors: Full-width embedding of each store position, or None
+            rescore: Candidates fetched per result when rescoring
+        """
+        self.vectorstore = vectorstore
+        self.index = index if index is not None else vectorstore.index
+        self.positions = positions
+        self.vectors = vectors
+        self.rescore = max(1, rescore)
+
+    def __call__(self, vector: np.ndarray, k: int) -> List[SearchResult]:
+        """Return the ``k`` nearest chunks with scores and vectors."""
+        store = self.vectorstore
+        query = np.asarray(vector, dtype=np.float32)
+        fetch = k * self.rescore if self.vectors is not None else k
+        scores, rows = self.index.search(query[None, :], fetch)
+        rows = [int(row) for row in rows[0] if row >= 0]
+        positions = rows if self.positions is None else [int(self.positions[row]) for row in rows]
+        if self.vectors is not None:
+            vectors = np.asarray(self.vectors[positions], dtype=np.float32).reshape(len(positions), -1)
+            exact = vectors @ query
+            order = np.argsort(-exact, kind="stable")[:k]
+            return [
+                (store.docstore.search(store.index_to_docstore_id[positions[i]]), float(exact[i]), vectors[i])
+                for i in order
+            ]
+        try:
+            vectors = self.index.reconstruct_batch(np.array(rows, dtype=np.int64))
+        except RuntimeError:
+            vectors = [None] * len(rows)
+        return [
+            (store.docstore.search(store.index_to_docstore_id[p]), float(score), vec)
+            for p, score, vec in zip(positions, scores[0], vectors)
+        ]
+
+class PineconeSearch:
+    """
+    Query a Pinecone index, returning the stored vectors with the matches.
+    """
+
+    def __init__(self, index, text_key: str = "text", metadata_filter: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            index: Pinecone index handle
+            text_key: Metadata key holding the chunk text
+            metadata_filter: Pinecone metadata filter (e.g. one disaster type)
+        """
+        self.index = index
+        self.text_key = text_key
+        self.metadata_filter = metadata_filter
+
+    def __call__(self, vector: np.ndarray, k: int) -> List[SearchResult]:
+        """Return the ``k`` nearest chunks with scores and vectors."""
+        response = self.index.query(
+            vector=np.asarray(vector, dtype=np.float32).tolist(),
+            top_k=k,
+            include_metadata=True,
+            include_values=True,
+            filter=self.metadata_filter
+        )
+        results = []
+        for match in response["matches"]:
+            metadata = dict(match["metadata"] or {})
+            text = metadata.pop(self.text_key, None)
+            if text is None:
+                continue
+            values = match["values"]
+            embedding = np.asarray(values, dtype=np.float32) if values else None
+            results.append((Document(page_content=text, metadata=metadata, id=match["id"]), match["score"], embedding))
+        return results
+
+def pinecone_shards(index, disaster_types: List[str], text_key: str = "text") -> Dict[str, PineconeSearch]:
+    """
+    Build a filtered search for each disaster type that has tagged vectors.
+
+    A filter matching no vector would cost a round trip on every routed
+    query before the search is widened anyway, so each type is checked
+    once with ``describe_index_stats``. Indexes that cannot count by
+    filter (serverless) get no shards, and routing stays off.
+
+    Args:
+        index: Pinecone index handle
+        disaster_types: Candidate types (``disaster_type`` metadata values)
+        text_key: Metadata key holding the chunk text
+
+    Returns:
+        Dict[str, PineconeSearch]: Search per type with at least one vector
+    """
+    shards = {}
+    for disaster_type in disaster_types:
+        metadata_filter = {"disaster_type": {"$eq": disaster_type}}
+        try:
+            count = index.describe_index_stats(filter=metadata_filter).total_vector_count
+        except Exception as e:
+            logger.warning("Cannot count %s vectors in Pinecone (%s); disaster type routing is off",
+                           disaster_type, e)
+            return {}
+        if count:
+            shards[disaster_type] = PineconeSearch(index, text_key=text_key, metadata_filter=metadata_filter)
+    return shards
+
+class ShardRouter:
+    """
+    Route a query to the search of its disaster type.
+
+    The query is classified by term counts (see
+    ``emergency.classify_disaster_type``). A confident classification
+    searches only that type's shard; the search is widened to the whole
+    index when the classification is unsure, the type has no shard, or the
+    shard's best match scores below ``min_score``.
+    """
+
+    def __init__(self, search: Callable[[np.ndarray, int], List[SearchResult]],
+                 shards: Dict[str, Callable[[np.ndarray, int], List[SearchResult]]],
+                 classify: Callable[[str], Tuple[str, float]], min_confidence: float = 0.6,
+                 min_score: Optional[float] = None):
+        """
+        Args:
+            search: Search over the whole index
+            shards: Search per disaster type
+            classify: Returns a query's disaster type and confidence
+            min_confidence: Confidence needed to search a shard only
+            min_score: Best shard score below which the search is widened
+        """
+        self.search = search
+        self.shards = shards
+        self.classify = classify
+        self.min_confidence = min_confidence
+        self.min_score = min_score
+        self.routed = 0
+        self.widened = 0
+        self.unrouted = 0
+
+    def route(self, query: str) -> Optional[str]:
+        """Disaster type whose shard should answer the query, if any."""
+        disaster_type, confidence = self.classify(query)
+        if disaster_type in self.shards and confidence >= self.min_confidence:
+            return disaster_type
+        return None
+
+    def __call__(self, query: str, vector: np.ndarray, k: int) -> List[SearchResult]:
+        """Return the ``k`` nearest chunks from the shard or the whole index."""
+        disaster_type = self.route(query)
+        if disaster_type is None:
+            self.unrouted += 1
+            return self.search(vector, k)
+        results = self.shards[disaster_type](vector, k)
+        if results and (self.min_score is None or results[0][1] >= self.min_score):
+            self.routed += 1
+            return results
+        self.widened += 1
+        return self.search(vector, k)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report routing counters.
+
+        Returns:
+            Dict[str, Any]: Shards available, queries answered by a shard,
+            widened to the whole index, and not routed
+        """
+        return {
+            "shards": sorted(self.shards),
+            "routed": self.routed,
+            "widened": self.widened,
+            "unrouted": self.unrouted,
+        }
+
+def adaptive_k(scores: List[float], min_k: int = 1, max_k: int = 6,
+               threshold: Optional[float] = None, gap: Optional[float] = None) -> int:
+    """
+    Choose how many results to keep from their similarity scores.
+
+    Results below ``threshold`` are never kept, so an unrelated question
+    gets no context at all. Among the rest, the ranking is cut at the
+    first drop of at least ``gap`` between consecutive scores, but not
+    before ``min_k`` results.
+
+    Args:
+        scores: Similarity scores, best first
+        min_k: Results kept before the gap heuristic may cut
+        max_k: Maximum results kept
+        threshold: Minimum score of a kept result (None keeps all)
+        gap: Score drop that ends the ranking (None disables the cut)
+
+    Returns:
+        int: Number of leading results to keep
+    """
+    k = min(len(scores), max_k)
+    if threshold is not None:
+        k = next((i for i in range(k) if scores[i] < threshold), k)
+    if gap is not None:
+        for i in range(max(min_k, 1), k):
+            if scores[i - 1] - scores[i] >= gap:
+                return i
+    return k
+
+def _chunk_key(doc: Document) -> str:
+    """Identify a chunk by its text, which both indexes share."""
+    return hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest()
+
+def reciprocal_rank_fusion(rankings: List[List[Document]], k: int, rrf_k: int = 60) -> List[Document]:
+    """
+    Fuse several rankings of the same corpus.
+
+    Each chunk scores ``sum(1 / (rrf_k + rank))`` over the rankings it
+    appears in; chunks are matched by text. The first copy seen of a
+    chunk is kept with its metadata (including any ``score``), so put the
+    ranking that carries cosine scores and embeddings first.
+
+    Args:
+        rankings: Ranked document lists, best first
+        k: Number of documents to return
+        rrf_k: Rank smoothing constant
+
+    Returns:
+        List[Document]: Fused ranking, best first, with the fused score in
+        ``metadata["rrf_score"]``
+    """
+    scores: Dict[str, float] = {}
+    docs: Dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            key = _chunk_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            docs.setdefault(key, doc)
+    best = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [
+        Document(page_content=docs[key].page_content, metadata=dict(docs[key].metadata, rrf_score=scores[key]),
+                 id=docs[key].id)
+        for key in best
+    ]
+
+class VectorRetriever(BaseRetriever):
+    """
+    Vector search over the shared query embedding.
+
+    Uses the engine's cached query vector and returns cosine scores and
+    stored chunk embeddings with the chunks. With a ``router`` the search
+    is restricted to the query's disaster type. ``k`` is the maximum; with a
+    ``score_threshold`` or ``score_gap`` set, fewer chunks are returned
+    when the scores say so (see ``adaptive_k``).
+    """
+
+    search: Any
+    embeddings: Any
+    router: Any = None
+    k: int = 6
+    min_k: int = 1
+    score_threshold: Optional[float] = None
+    score_gap: Optional[float] = None
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        """Retrieve the nearest chunks."""
+        vector = self.embeddings.embed_query_array(query)
+        if self.router is not None:
+            results = self.router(query, vector, self.k)
+        else:
+            results = self.search(vector, self.k)
+        keep = adaptive_k(
+            [score for _, score, _ in results],
+            min_k=self.min_k,
+            max_k=self.k,
+            threshold=self.score_threshold,
+            gap=self.score_gap
+        )
+        return [scored(doc, score, embedding) for doc, score, embedding in results[:keep]]
+
+class LexicalRetriever(BaseRetriever):
+    """
+    Retriever backed by the local BM25 index.
+    """
+
+    index: Any
+    k: int = 6
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        """Retrieve the best BM25 matches."""
+        return [scored(self.index.documents[i], score) for i, score in self.index.search(query, self.k)]
+
+class HybridRetriever(BaseRetriever):
+    """
+    Retriever fusing vector search and BM25 with reciprocal rank fusion.
+
+    ``vector_retriever`` should return ``candidates`` documents; the same
+    number is taken from BM25 before fusing down to ``k``. When the vector
+    side returns nothing (no chunk cleared its score threshold), neither
+    does the fusion: BM25 matches any shared word, so lexical-only hits
+    would otherwise always fill the context.
+    """
+
+    vector_retriever: BaseRetriever
+    index: Any
+    k: int = 6
+    candidates: int = 20
+    rrf_k: int = 60
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        """Retrieve from both indexes and fuse the rankings."""
+        vector_docs = self.vector_retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+        if not vector_docs:
+            return []
+        lexical_docs = self.index.get_documents(query, self.candidates)
+        return reciprocal_rank_fusion([vector_docs, lexical_docs], self.k, self.rrf_k)
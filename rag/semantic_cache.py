@@ -0,0 +1,154 @@
+"""
+Semantic answer cache.
+
+Stores generated answers keyed by query embedding and output language, so
+near-identical questions ("what to do in a flood", "what should I do in
+a flood?") are answered without another Gemini call.
+"""
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import numpy as np
+
+class SemanticCache:
+    """
+    Bounded LRU/TTL cache of answers looked up by cosine similarity.
+
+    Query vectors live in a preallocated float32 matrix with one row per
+    slot, so the memory footprint is fixed at ``max_entries`` rows and a
+    lookup is a single matrix-vector product. Each response type can have
+    its own TTL; a TTL of 0 opts that type out of caching.
+    """
+
+    def __init__(self, dimension: int, threshold: float = 0.92, max_entries: int = 2048,
+                 ttl: float = 3600, type_ttls: Optional[Dict[str, float]] = None):
+        """
+        Initialize an empty cache.
+
+        Args:
+            dimension: Embedding dimension
+            threshold: Minimum cosine similarity for a hit
+            max_entries: Maximum number of cached answers
+            ttl: Default time to live in seconds
+            type_ttls: TTL overrides per response type (0 disables caching)
+        """
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.type_ttls = type_ttls or {}
+        self._vectors = np.zeros((max_entries, dimension), dtype=np.float32)
+        self._active = np.zeros(max_entries, dtype=bool)
+        self._languages = np.full(max_entries, "", dtype=object)
+        # slot -> (answer, stored_at, ttl), ordered from least to most recently used
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _ttl_for(self, response_type: str) -> float:
+        """Get the TTL of a response type."""
+        return self.type_ttls.get(response_type, self.ttl)
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        """Convert a vector to a unit-length float32 array."""
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _release(self, slot: int) -> None:
+        """Free a slot. Caller must hold the lock."""
+        self._active[slot] = False
+        self._languages[slot] = ""
+        self._entries.pop(slot, None)
+
+    def lookup(self, vector, output_lang: str, response_type: str = "information") -> Optional[str]:
+        """
+        Find a cached answer for a similar query.
+
+        Args:
+            vector: Query embedding
+            output_lang: Output language of the answer
+            response_type: Response type of the query
+
+        Returns:
+            Optional[str]: The cached answer, or None on a miss
+        """
+        max_age = self._ttl_for(response_type)
+        if max_age <= 0:
+            return None
+
+        query = self._normalize(vector)
+        now = time.time()
+        with self._lock:
+            candidates = np.flatnonzero(self._active & (self._languages == output_lang))
+            if len(candidates):
+                scores = self._vectors[candidates] @ query
+                best = int(np.argmax(scores))
+                slot = int(candidates[best])
+                if scores[best] >= self.threshold:
+                    answer, stored_at, ttl = self._entries[slot]
+                    # A shorter TTL of the asking type also applies
+                    if now - stored_at < min(ttl, max_age):
+                        self._entries.move_to_end(slot)
+                        self.hits += 1
+                        return answer
+                    if now - stored_at >= ttl:
+                        self._release(slot)
+            self.misses += 1
+            return None
+
+    def store(self, vector, output_lang: str, answer: str, response_type: str = "information") -> None:
+        """
+        Cache an answer.
+
+        Args:
+            vector: Query embedding
+            output_lang: Output language of the answer
+            answer: Generated answer
+            response_type: Response type of the query
+        """
+        ttl = self._ttl_for(response_type)
+        if ttl <= 0 or not answer:
+            return
+
+        with self._lock:
+            free = np.flatnonzero(~self._active)
+            if len(free):
+                slot = int(free[0])
+            else:
+                # Evict the least recently used answer
+                slot, _ = self._entries.popitem(last=False)
+                self.evictions += 1
+            self._vectors[slot] = self._normalize(vector)
+            self._active[slot] = True
+            self._languages[slot] = output_lang
+            self._entries[slot] = (answer, time.time(), ttl)
+
+    def clear(self) -> None:
+        """Drop every cached answer."""
+        with self._lock:
+            self._active[:] = False
+            self._languages[:] = ""
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Report cache counters.
+
+        Returns:
+            Dict[str, float]: Size, hits, misses, hit rate, evictions and bytes
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "vector_bytes": int(self._vectors.nbytes),
+        }
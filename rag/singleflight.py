@@ -0,0 +1,183 @@
+"""
+Singleflight coalescing of identical in-flight questions.
+
+During a local disaster many users ask the same question within seconds.
+Requests with the same key (normalized query, output language, response
+type) share one generation: the first request starts it, later ones
+subscribe to it and receive every token, including those already produced.
+
+Everything here runs on the engine's event loop, so no locking is needed.
+"""
+import time
+import asyncio
+from typing import Any, AsyncIterator, Callable, Dict, Hashable, List, Optional
+
+class Flight:
+    """
+    One in-flight generation and the tokens it has produced so far.
+    """
+
+    def __init__(self, key: Hashable):
+        """
+        Initialize an empty flight.
+
+        Args:
+            key: Coalescing key of the flight
+        """
+        self.key = key
+        self.parts: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def _wake(self) -> None:
+        """Wake every subscriber waiting for news."""
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def publish(self, part: str) -> None:
+        """Append a token for every subscriber."""
+        self.parts.append(part)
+        self._wake()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        """Mark the flight complete, optionally with the error that ended it."""
+        self.done = True
+        self.error = error
+        self._wake()
+
+    async def subscribe(self, timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """
+        Yield the flight's tokens from the beginning.
+
+        Args:
+            timeout: Seconds to wait for the whole answer (None waits forever)
+
+        Yields:
+            str: Answer text fragments
+
+        Raises:
+            TimeoutError: If the flight does not finish in time; the flight
+                itself keeps running for its other subscribers
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        position = 0
+        while True:
+            while position < len(self.parts):
+                yield self.parts[position]
+                position += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            changed = self._changed
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise TimeoutError("Timed out waiting for a coalesced answer")
+            try:
+                await asyncio.wait_for(changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                raise TimeoutError("Timed out waiting for a coalesced answer")
+
+class SingleFlight:
+    """
+    Coalesces concurrent requests with the same key into one generation.
+
+    The generation runs as its own task, so a subscriber that gives up
+    (timeout, closed browser tab) never cancels it for the others. Errors
+    are delivered to every subscriber of the failed flight, and the next
+    request with that key starts a fresh one.
+    """
+
+    def __init__(self, timeout: Optional[float] = None):
+        """
+        Initialize the coalescer.
+
+        Args:
+            timeout: Default seconds a subscriber waits for an answer
+        """
+        self.timeout = timeout
+        self._flights: Dict[Hashable, Flight] = {}
+        self.leaders = 0
+        self.followers = 0
+        self.errors = 0
+        self.timeouts = 0
+
+    async def _run(self, flight: Flight, factory: Callable[[], AsyncIterator[str]]) -> None:
+        """Drive a generation and publish its tokens to the flight."""
+        try:
+            async for part in factory():
+                flight.publish(part)
+        except Exception as e:
+            self.errors += 1
+            flight.finish(e)
+        else:
+            flight.finish()
+        finally:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+
+    def join(self, key: Hashable, factory: Callable[[], AsyncIterator[str]]) -> Flight:
+        """
+        Join the flight for a key, starting it if none is in flight.
+
+        Must be called on the event loop.
+
+        Args:
+            key: Coalescing key
+            factory: Callable returning the token generator (leader only)
+
+        Returns:
+            Flight: The shared flight
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = Flight(key)
+            self._flights[key] = flight
+            flight.task = asyncio.ensure_future(self._run(flight, factory))
+            self.leaders += 1
+        else:
+            self.followers += 1
+        flight.subscribers += 1
+        return flight
+
+    async def stream(self, key: Hashable, factory: Callable[[], AsyncIterator[str]],
+                     timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """
+        Stream the answer for a key, sharing an identical in-flight request.
+
+        Args:
+            key: Coalescing key
+            factory: Callable returning the token generator
+            timeout: Seconds to wait for the answer (defaults to ``self.timeout``)
+
+        Yields:
+            str: Answer text fragments
+        """
+        flight = self.join(key, factory)
+        try:
+            async for part in flight.subscribe(timeout if timeout is not None else self.timeout):
+                yield part
+        except TimeoutError:
+            self.timeouts += 1
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report coalescing counters.
+
+        Returns:
+            Dict[str, Any]: Flights in progress, leaders, followers,
+            coalescing rate (followers per request), errors and timeouts
+        """
+        requests = self.leaders + self.followers
+        return {
+            "in_flight": len(self._flights),
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "coalesce_rate": self.followers / requests if requests else 0.0,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+        }
@@ -0,0 +1,69 @@
+"""
+Background token streams.
+"""
+import time
+import queue
+import asyncio
+from typing import AsyncIterator, Callable, Iterator, Optional
+
+# Marks the end of a stream in the token queue
+_DONE = object()
+
+class AsyncStream:
+    """
+    Token iterator fed by an async generator on another thread's event loop.
+
+    The producer starts as soon as the stream is created, so its network
+    I/O overlaps whatever the caller does before iterating. Iteration raises
+    ``TimeoutError`` if the first token does not arrive within
+    ``first_token_timeout`` seconds; the producer keeps running in the
+    background so its result can still fill the caches.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, factory: Callable[[], AsyncIterator[str]],
+                 first_token_timeout: Optional[float] = None):
+        """
+        Start the stream.
+
+        Args:
+            loop: Running event loop (owned by another thread)
+            factory: Callable returning the async token generator
+            first_token_timeout: Seconds allowed before the first token
+        """
+        self.first_token_timeout = first_token_timeout
+        self.started = time.monotonic()
+        self._tokens: "queue.Queue" = queue.Queue()
+        self.future = asyncio.run_coroutine_threadsafe(self._produce(factory), loop)
+
+    async def _produce(self, factory: Callable[[], AsyncIterator[str]]) -> None:
+        """Push every token (or the raised exception), then the end marker."""
+        try:
+            async for token in factory():
+                self._tokens.put(token)
+        except Exception as e:
+            self._tokens.put(e)
+        else:
+            self._tokens.put(_DONE)
+
+    def __iter__(self) -> Iterator[str]:
+        """
+        Yield tokens as they arrive.
+
+        Raises:
+            TimeoutError: If the first token misses its deadline
+        """
+        first = True
+        while True:
+            timeout = None
+            if first and self.first_token_timeout is not None:
+                timeout = max(0.0, self.started + self.first_token_timeout - time.monotonic())
+            try:
+                item = self._tokens.get(timeout=timeout)
+            except queue.Empty:
+                raise TimeoutError("No response within the enrichment deadline")
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            first = False
+            yield item
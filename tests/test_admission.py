@@ -0,0 +1,121 @@
+"""Tests for the priority, fairness, shedding and budget rules of admission control."""
+import asyncio
+
+import pytest
+
+from rag import admission
+from rag.admission import AdmissionController, AdmissionRejected
+
+async def settle():
+    """Let queued tasks run until they block."""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+def request(controller: AdmissionController, granted: list, label: str, response_type: str = "information",
+            user: str = "anonymous") -> asyncio.Task:
+    async def run():
+        await controller.acquire(response_type, user)
+        granted.append(label)
+    return asyncio.ensure_future(run())
+
+def test_emergencies_are_served_first():
+    async def run():
+        controller = AdmissionController(max_concurrency=1)
+        await controller.acquire()
+        granted = []
+        tasks = [
+            request(controller, granted, "greeting", "greeting"),
+            request(controller, granted, "information", "information"),
+            request(controller, granted, "emergency", "emergency"),
+        ]
+        await settle()
+        for _ in tasks:
+            controller.release()
+            await settle()
+        await asyncio.gather(*tasks)
+        return granted
+
+    assert asyncio.run(run()) == ["emergency", "information", "greeting"]
+
+def test_users_are_served_round_robin():
+    async def run():
+        controller = AdmissionController(max_concurrency=1)
+        await controller.acquire()
+        granted = []
+        tasks = [request(controller, granted, f"a{i}", user="a") for i in range(3)]
+        tasks.append(request(controller, granted, "b0", user="b"))
+        await settle()
+        for _ in tasks:
+            controller.release()
+            await settle()
+        await asyncio.gather(*tasks)
+        return granted
+
+    assert asyncio.run(run()) == ["a0", "b0", "a1", "a2"]
+
+def test_full_queue_sheds_lower_priority_work():
+    async def run():
+        controller = AdmissionController(max_concurrency=1, max_queue=2)
+        await controller.acquire()
+        granted = []
+        heavy = [request(controller, granted, f"x{i}", "greeting", user="x") for i in range(2)]
+        await settle()
+
+        # Same priority: nothing to shed
+        with pytest.raises(AdmissionRejected) as full:
+            await controller.acquire("greeting", "y")
+        assert full.value.reason == "queue_full"
+
+        # An emergency takes the place of the heavy user's last greeting
+        urgent = request(controller, granted, "emergency", "emergency", user="z")
+        await settle()
+        with pytest.raises(AdmissionRejected) as shed:
+            await heavy[1]
+        assert shed.value.reason == "shed"
+
+        controller.release()
+        await settle()
+        controller.release()
+        await asyncio.gather(heavy[0], urgent)
+        return granted, controller.stats()["rejected"]
+
+    granted, rejected = asyncio.run(run())
+    assert granted == ["emergency", "x0"]
+    assert rejected == {"queue_full": 1, "deadline": 0, "shed": 1}
+
+def test_queue_deadline_rejects_waiting_requests():
+    async def run():
+        controller = AdmissionController(max_concurrency=1, queue_timeouts={"greeting": 0.05}, default_timeout=5)
+        await controller.acquire()
+        with pytest.raises(AdmissionRejected) as late:
+            await controller.acquire("greeting", "a")
+        return late.value.reason, controller.stats()
+
+    reason, stats = asyncio.run(run())
+    assert reason == "deadline"
+    assert stats["rejected"]["deadline"] == 1
+    assert stats["queued"] == {"emergency": 0, "information": 0, "greeting": 0}
+
+def test_low_budget_defers_all_but_emergencies_until_the_recheck(monkeypatch):
+    monkeypatch.setattr(admission, "BUDGET_RECHECK_INTERVAL", 0.01)
+    budget = [0.1]
+
+    async def run():
+        controller = AdmissionController(max_concurrency=2, budget=lambda: budget[0], reserve=0.2)
+        granted = []
+        deferred = request(controller, granted, "information")
+        await settle()
+        assert granted == [] and controller.deferred == 1
+
+        await asyncio.wait_for(controller.acquire("emergency", "b"), 1)
+        assert controller._recheck is not None
+
+        # Nothing is released: the recheck timer admits the deferred request
+        budget[0] = 1.0
+        await asyncio.wait_for(deferred, 1)
+        return granted, controller
+
+    granted, controller = asyncio.run(run())
+    assert granted == ["information"]
+    assert controller.active == 2
+    assert controller._recheck is None
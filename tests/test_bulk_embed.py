@@ -0,0 +1,56 @@
+"""Tests for the bulk re-embedding plan."""
+import pytest
+
+pytest.importorskip("langchain_community")
+
+from rag.bulk_embed import PLAN_FILE, make_plan, shard_sizes
+from rag.ingest import IngestError
+
+CONFIG = {
+    "chunk_size": 200,
+    "chunk_overlap": 20,
+    "embedding_backend": "huggingface",
+    "embedding_model": "all-MiniLM-L6-v2",
+    "onnx_model_dir": "data/onnx/all-MiniLM-L6-v2",
+}
+
+@pytest.fixture
+def source_dir(tmp_path):
+    source = tmp_path / "source"
+    source.mkdir()
+    (source / "flood.txt").write_text("Move to higher ground before the flood water rises. " * 20, encoding="utf-8")
+    (source / "fire.txt").write_text("Leave the building and stay low under the smoke. " * 20, encoding="utf-8")
+    return source
+
+def test_plan_is_reused_on_resume(tmp_path, source_dir):
+    work_dir = tmp_path / "work"
+    first = make_plan(str(work_dir), str(source_dir), CONFIG, shard_size=3)
+    second = make_plan(str(work_dir), str(source_dir), CONFIG, shard_size=3)
+
+    assert second == first
+    assert first["key"]["source_dir"] == str(source_dir)
+    assert sum(shard_sizes(first)) == first["count"]
+    assert (work_dir / PLAN_FILE).exists()
+
+def test_plan_with_other_settings_is_refused(tmp_path, source_dir):
+    work_dir = tmp_path / "work"
+    make_plan(str(work_dir), str(source_dir), CONFIG, shard_size=3)
+
+    with pytest.raises(IngestError):
+        make_plan(str(work_dir), str(source_dir), dict(CONFIG, chunk_size=300), shard_size=3)
+
+@pytest.mark.parametrize("change", ["edit", "add", "remove"])
+def test_plan_of_changed_source_is_refused(tmp_path, source_dir, change):
+    work_dir = tmp_path / "work"
+    make_plan(str(work_dir), str(source_dir), CONFIG, shard_size=3)
+
+    if change == "edit":
+        with open(source_dir / "flood.txt", "a", encoding="utf-8") as f:
+            f.write("Switch off the electricity at the mains.")
+    elif change == "add":
+        (source_dir / "storm.md").write_text("Stay indoors away from windows.", encoding="utf-8")
+    else:
+        (source_dir / "fire.txt").unlink()
+
+    with pytest.raises(IngestError, match="source files changed"):
+        make_plan(str(work_dir), str(source_dir), CONFIG, shard_size=3)
@@ -0,0 +1,62 @@
+"""Tests for deduplicating and packing retrieved chunks."""
+import numpy as np
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from langchain_core.documents import Document
+
+from rag.context import ContextBudgeter, estimate_tokens
+
+class CountingEmbeddings:
+    """Embedding stand-in mapping each text to a fixed vector."""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [self.vectors[text] for text in texts]
+
+def chunk(text: str, score: float, embedding=None) -> Document:
+    metadata = {"score": score}
+    if embedding is not None:
+        metadata["embedding"] = np.asarray(embedding, dtype=np.float32)
+    return Document(page_content=text, metadata=metadata)
+
+def test_near_duplicates_of_a_better_chunk_are_dropped():
+    embeddings = CountingEmbeddings({"bm25 hit": [0.0, 0.0, 1.0]})
+    budgeter = ContextBudgeter(embeddings, max_tokens=1000, dedupe_threshold=0.95)
+    docs = [
+        chunk("copy", 0.7, [1.0, 0.05, 0.0]),
+        chunk("original", 0.9, [1.0, 0.0, 0.0]),
+        chunk("other", 0.6, [0.0, 1.0, 0.0]),
+        chunk("bm25 hit", 0.0),
+    ]
+    selected, report = budgeter.assemble(docs)
+
+    assert [doc.page_content for doc in selected] == ["original", "other", "bm25 hit"]
+    assert report["duplicates"] == 1
+    # Only the chunk without a stored vector is embedded
+    assert embeddings.embedded == ["bm25 hit"]
+
+def test_chunks_are_packed_by_score_into_the_budget():
+    budgeter = ContextBudgeter(CountingEmbeddings({}), max_tokens=10, chars_per_token=1.0)
+    docs = [
+        chunk("a" * 6, 0.5, [1.0, 0.0, 0.0]),
+        chunk("b" * 8, 0.9, [0.0, 1.0, 0.0]),
+        chunk("c" * 2, 0.4, [0.0, 0.0, 1.0]),
+    ]
+    selected, report = budgeter.assemble(docs)
+
+    # "aaaaaa" no longer fits after "bbbbbbbb"; the smaller "cc" still does
+    assert [doc.page_content for doc in selected] == ["b" * 8, "c" * 2]
+    assert report["tokens_in"] == 16 and report["tokens_out"] == 10 and report["tokens_saved"] == 6
+
+def test_an_oversized_best_chunk_is_truncated_rather_than_dropped():
+    budgeter = ContextBudgeter(CountingEmbeddings({}), max_tokens=5, chars_per_token=1.0)
+    selected, _ = budgeter.assemble([chunk("x" * 20, 0.9, [1.0, 0.0])])
+
+    assert selected[0].page_content == "x" * 5
+    assert estimate_tokens("x" * 5, 1.0) == 5
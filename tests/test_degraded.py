@@ -0,0 +1,58 @@
+"""Tests for the extractive answers served without the LLM."""
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from langchain_core.documents import Document
+
+from rag.degraded import DEGRADED_NOTES, NO_EXCERPTS_NOTES, extractive_answer, split_sentences
+
+FLOOD = ("Move to higher ground as soon as the flood warning is issued. "
+         "Switch off the electricity at the mains before you leave. Page 4")
+FIRE = "Leave the building and stay low under the smoke. Move to higher ground as soon as the flood warning is issued."
+
+# Sentence -> vector; the question points along the first axis
+VECTORS = {
+    "Move to higher ground as soon as the flood warning is issued.": [1.0, 0.0, 0.0],
+    "Switch off the electricity at the mains before you leave.": [0.6, 0.8, 0.0],
+    "Leave the building and stay low under the smoke.": [0.0, 0.0, 1.0],
+}
+
+class SentenceEmbeddings:
+    """Embedding stand-in with fixed sentence vectors."""
+
+    def embed_documents(self, texts):
+        return [VECTORS[text] for text in texts]
+
+def bullets(answer: str):
+    return [line[2:] for line in answer.splitlines() if line.startswith("- ")]
+
+def test_sentences_are_split_and_fragments_dropped():
+    assert split_sentences(FLOOD) == [
+        "Move to higher ground as soon as the flood warning is issued.",
+        "Switch off the electricity at the mains before you leave.",
+    ]
+
+def test_sentences_are_ranked_by_similarity_to_the_question():
+    docs = [Document(page_content=FLOOD), Document(page_content=FIRE)]
+    answer = extractive_answer(docs, "English", SentenceEmbeddings(), query_vector=[1.0, 0.0, 0.0], min_score=0.2)
+
+    assert answer.startswith(DEGRADED_NOTES["English"])
+    # The repeated sentence appears once; the unrelated one is below min_score
+    assert bullets(answer) == [
+        "Move to higher ground as soon as the flood warning is issued.",
+        "Switch off the electricity at the mains before you leave.",
+    ]
+    assert "1122" in answer
+
+def test_without_embeddings_the_leading_sentences_are_used():
+    answer = extractive_answer([Document(page_content=FIRE)], "Urdu", max_points=1)
+
+    assert answer.startswith(DEGRADED_NOTES["Urdu"])
+    assert bullets(answer) == ["Leave the building and stay low under the smoke."]
+
+def test_no_excerpts_still_gives_the_emergency_contacts():
+    answer = extractive_answer([], "Sindhi")
+
+    assert answer.startswith(NO_EXCERPTS_NOTES["Sindhi"])
+    assert "1122" in answer
@@ -0,0 +1,44 @@
+"""Tests for compressed snapshots and exact rescoring."""
+import numpy as np
+import pytest
+
+pytest.importorskip("faiss")
+pytest.importorskip("langchain_community")
+
+from langchain_core.documents import Document
+
+from rag.local_index import load_snapshot, load_vectors, write_snapshot
+from rag.retrievers import FaissSearch
+
+def normalized(rows: int, width: int, seed: int) -> np.ndarray:
+    vectors = np.random.default_rng(seed).standard_normal((rows, width)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+@pytest.fixture
+def corpus(tmp_path):
+    vectors = normalized(300, 32, seed=0)
+    chunks = [Document(page_content=f"chunk {i}", metadata={"source": "guide.txt"}) for i in range(len(vectors))]
+    return str(tmp_path / "index"), vectors, chunks
+
+def test_compressed_search_returns_exact_cosine_scores(corpus):
+    index_dir, vectors, chunks = corpus
+    write_snapshot(index_dir, vectors, chunks, {}, compression="pca8")
+    store = load_snapshot(index_dir, embeddings=None)
+    query = normalized(1, 32, seed=1)[0]
+
+    compressed = FaissSearch(store)(query, 5)
+    rescored = FaissSearch(store, vectors=load_vectors(index_dir), rescore=8)(query, 5)
+
+    exact = vectors @ query
+    # The re-normalized projection inflates the raw scores
+    assert compressed[0][1] > exact.max()
+    for doc, score, vector in rescored:
+        position = int(doc.page_content.split()[1])
+        assert score == pytest.approx(exact[position], abs=1e-5)
+        np.testing.assert_allclose(vector, vectors[position])
+    assert [score for _, score, _ in rescored] == sorted((score for _, score, _ in rescored), reverse=True)
+
+def test_uncompressed_snapshot_has_no_extra_vectors(corpus):
+    index_dir, vectors, chunks = corpus
+    write_snapshot(index_dir, vectors, chunks, {})
+    assert load_vectors(index_dir) is None
@@ -0,0 +1,73 @@
+"""Tests for the ingestion ledger and target adoption."""
+import pytest
+
+pytest.importorskip("langchain_community")
+
+import numpy as np
+from langchain_core.documents import Document
+
+from rag.ingest import MAX_SQL_PARAMS, FaissSink, IngestError, IngestLedger, prepare_target
+from rag.local_index import verify_snapshot, write_snapshot
+
+class CountingSink:
+    """Sink stand-in holding a number of vectors."""
+
+    def __init__(self, vectors: int):
+        self.vectors = vectors
+
+    def count(self) -> int:
+        return self.vectors
+
+    def reset(self) -> None:
+        self.vectors = 0
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = IngestLedger(str(tmp_path / "ledger.sqlite"))
+    yield ledger
+    ledger.close()
+
+def test_mark_seen_handles_more_ids_than_sql_parameters(ledger):
+    ids = [f"chunk-{i}" for i in range(2 * MAX_SQL_PARAMS + 5)]
+    run = ledger.begin_run()
+    ledger.add([Document(page_content="", id=chunk) for chunk in ids[::2]], run)
+
+    assert ledger.mark_seen(ids, ledger.begin_run()) == set(ids[::2])
+
+def test_legacy_vectors_are_refused_until_reset(ledger):
+    sink = CountingSink(vectors=120)
+    with pytest.raises(IngestError):
+        prepare_target(sink, ledger)
+
+    prepare_target(sink, ledger, reset=True)
+    assert sink.count() == 0
+
+def test_completed_runs_skip_the_check(ledger):
+    run = ledger.begin_run()
+    ledger.finish_run(run, {})
+    prepare_target(CountingSink(vectors=120), ledger)
+
+def _store(ledger, texts):
+    run = ledger.begin_run()
+    chunks = [Document(page_content=text, metadata={"source": "guide.txt"}, id=f"chunk-{i}")
+              for i, text in enumerate(texts)]
+    vectors = np.eye(len(texts), 8, dtype=np.float32)
+    ledger.add(chunks, run, vectors)
+    ledger.finish_run(run, {})
+    return chunks, vectors
+
+def test_faiss_sink_replaces_a_snapshot_written_outside_the_ledger(tmp_path, ledger):
+    chunks, vectors = _store(ledger, ["Move to higher ground.", "Stay low under the smoke."])
+    index_dir = str(tmp_path / "index")
+    sink = FaissSink(index_dir, {"ingest": True})
+    sink.finish(ledger, changed=True)
+    written = verify_snapshot(index_dir)
+    assert written["ledger_fingerprint"] == ledger.fingerprint()
+
+    sink.finish(ledger, changed=False)
+    assert verify_snapshot(index_dir)["created_at"] == written["created_at"]
+
+    # A rebuild from the source (local_index sync) does not know the ledger
+    write_snapshot(index_dir, vectors[:1], chunks[:1], {"source_dir": "source"})
+    sink.finish(ledger, changed=False)
+    assert verify_snapshot(index_dir)["count"] == 2
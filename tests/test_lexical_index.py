@@ -0,0 +1,51 @@
+"""Tests for the BM25 index."""
+import numpy as np
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from langchain_core.documents import Document
+
+from rag.lexical_index import LEXICAL_FILES, LexicalIndex, write_lexical_index
+
+TEXTS = [
+    "Move to higher ground before the flood water rises.",
+    "Leave the building and stay low under the smoke.",
+    "If the flood water enters the house, switch off the electricity.",
+    "After the earthquake, check the building for cracks.",
+]
+
+def test_spilled_blocks_merge_into_the_same_index(tmp_path):
+    whole, spilled = tmp_path / "whole", tmp_path / "spilled"
+    whole.mkdir()
+    spilled.mkdir()
+    assert write_lexical_index(str(whole), TEXTS) == write_lexical_index(str(spilled), TEXTS, spill_postings=3)
+
+    for name in LEXICAL_FILES:
+        if name.endswith(".npy"):
+            np.testing.assert_array_equal(np.load(whole / name), np.load(spilled / name))
+    assert sorted(p.name for p in spilled.iterdir()) == sorted(LEXICAL_FILES)
+
+    documents = [Document(page_content=text) for text in TEXTS]
+    assert LexicalIndex(str(spilled), documents).search("flood water", 2) == \
+        LexicalIndex(str(whole), documents).search("flood water", 2)
+
+def _index(tmp_path, texts):
+    write_lexical_index(str(tmp_path), texts)
+    return LexicalIndex(str(tmp_path), [Document(page_content=text) for text in texts])
+
+def test_bm25_ranks_rarer_and_more_frequent_terms_higher(tmp_path):
+    index = _index(tmp_path, TEXTS)
+
+    assert [i for i, _ in index.search("flood", 4)] == [0, 2]
+    assert index.search("earthquake building", 1)[0][0] == 3
+    assert index.search("tsunami", 4) == []
+
+def test_exact_tokens_are_kept_and_collapsed_forms_are_a_fallback(tmp_path):
+    index = _index(tmp_path, ["We need food and water.", "Sailaab aa gaya, madad karo."])
+
+    assert "need" in index.vocab and "flood" not in index.vocab
+    assert [i for i, _ in index.search("need", 2)] == [0]
+    # "sailab" is not in the vocabulary and falls back to the collapsed term
+    assert [i for i, _ in index.search("sailab", 2)] == [1]
+    assert index.search("sailaab", 2)[0][1] == index.search("sailab", 2)[0][1]
@@ -0,0 +1,32 @@
+"""Tests for the token-level phrase matcher."""
+import pytest
+
+from rag.emergency import match_emergency
+from rag.phrase_matcher import PhraseMatcher
+
+def matched(phrases, text):
+    return [phrase for phrase, _ in PhraseMatcher((phrase, None) for phrase in phrases).find(text)]
+
+@pytest.mark.parametrize("phrases, text, expected", [
+    (["need help"], "I NEED, help!", ["need help"]),
+    (["bachao"], "bachaooo", ["bachao"]),
+    (["sailab"], "sailaab aa gaya", ["sailab"]),
+    (["help", "need help"], "i need help", ["help", "need help"]),
+    (["مدد"], "مَدَد", ["مدد"]),
+])
+def test_phrases_match(phrases, text, expected):
+    assert sorted(matched(phrases, text)) == sorted(expected)
+
+@pytest.mark.parametrize("phrases, text", [
+    (["need help"], "ned help"),
+    (["good"], "god"),
+    (["help"], "helpful"),
+    (["flood now"], "flood later now"),
+])
+def test_phrases_do_not_match(phrases, text):
+    assert matched(phrases, text) == []
+
+def test_emergency_detection_keeps_double_letters():
+    assert match_emergency("I need help").is_emergency
+    assert match_emergency("bachaooo").is_emergency
+    assert not match_emergency("good morning").is_emergency
@@ -0,0 +1,49 @@
+"""Tests for review gating of the offline playbooks."""
+from rag.playbooks import PlaybookStore, build_playbooks, main
+
+class Chain:
+    """Chain stand-in returning a fixed answer."""
+
+    def __init__(self, text: str):
+        self.text = text
+
+    def invoke(self, question: str) -> str:
+        return self.text
+
+class Engine:
+    """Engine stand-in answering every question with a fixed text."""
+
+    config = {"llm_model": "fake", "index_name": "test"}
+
+    def __init__(self, text: str):
+        self.text = text
+
+    def get_chain(self, output_lang: str) -> Chain:
+        return Chain(f"{self.text} ({output_lang})")
+
+def test_only_approved_playbooks_are_served(tmp_path):
+    path = str(tmp_path / "playbooks.json")
+    build_playbooks(Engine("Move to higher ground"), pairs=[("Flood", "English"), ("Flood", "Urdu")]).save(path)
+
+    assert len(PlaybookStore.load(path)) == 0
+    assert PlaybookStore.load(path, require_review=False).get("Flood", "Urdu") == "Move to higher ground (Urdu)"
+
+    assert main(["approve", "Flood", "English", "--path", path]) == 0
+    store = PlaybookStore.load(path)
+    assert store.get("Flood", "English") == "Move to higher ground (English)"
+    assert store.get("Flood", "Urdu") is None
+
+def test_rebuilt_playbooks_need_a_new_review(tmp_path):
+    path = str(tmp_path / "playbooks.json")
+    build_playbooks(Engine("Move to higher ground"), pairs=[("Flood", "English"), ("Fire", "English")]).save(path)
+    main(["approve", "--all", "--path", path])
+
+    previous = PlaybookStore.load(path, require_review=False)
+    rebuilt = build_playbooks(Engine("Leave the building"), previous, pairs=[("Fire", "English")])
+    rebuilt.save(path)
+
+    store = PlaybookStore.load(path)
+    assert rebuilt.version == previous.version + 1
+    # The untouched playbook keeps its approval, the regenerated one loses it
+    assert store.get("Flood", "English") == "Move to higher ground (English)"
+    assert store.get("Fire", "English") is None
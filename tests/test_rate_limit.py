@@ -0,0 +1,64 @@
+"""Tests for the RPM/TPM token buckets."""
+import pytest
+
+from rag import rate_limit
+from rag.rate_limit import RateLimited, TokenBucketLimiter
+
+class FakeClock:
+    """Stand-in for the ``time`` module; sleeping advances the clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self) -> float:
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, "time", clock)
+    return clock
+
+def test_try_acquire_takes_a_request_and_its_tokens(clock):
+    limiter = TokenBucketLimiter(rpm=2, tpm=1000)
+    assert limiter.try_acquire(300) == 0
+    assert limiter.try_acquire(300) == 0
+    # Both requests are used: the next one refills in 60 / rpm seconds
+    assert limiter.try_acquire(300) == pytest.approx(30)
+    assert limiter.remaining() == {"requests": 0, "tokens": 400, "fraction": 0.0}
+
+def test_buckets_refill_continuously_up_to_the_limit(clock):
+    limiter = TokenBucketLimiter(rpm=60, tpm=6000)
+    assert limiter.try_acquire(3000) == 0
+    # Asking for more than is left reports the wait for the missing tokens
+    assert limiter.try_acquire(4000) == pytest.approx(10)
+
+    clock.sleep(10)
+    assert limiter.remaining()["tokens"] == 4000
+    clock.sleep(600)
+    assert limiter.remaining() == {"requests": 60, "tokens": 6000, "fraction": 1.0}
+
+def test_charged_answer_tokens_delay_later_calls(clock):
+    limiter = TokenBucketLimiter(rpm=60, tpm=600)
+    assert limiter.try_acquire(100) == 0
+    limiter.charge(800)
+    assert limiter.remaining()["tokens"] == -300
+    assert limiter.try_acquire(100) == pytest.approx(40)
+
+def test_acquire_blocking_waits_within_max_wait_then_rejects(clock):
+    limiter = TokenBucketLimiter(rpm=1, tpm=1000, max_wait=10)
+    limiter.acquire_blocking(10)
+
+    with pytest.raises(RateLimited) as limited:
+        limiter.acquire_blocking(10)
+    assert limited.value.wait == pytest.approx(60)
+
+    limiter.acquire_blocking(10, max_wait=60)
+    assert clock.now == pytest.approx(1060)
+    assert (limiter.granted, limiter.waited, limiter.limited) == (2, 1, 1)
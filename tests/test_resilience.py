@@ -0,0 +1,102 @@
+"""Tests for the circuit breaker, hedging and deadlines of ResilientLLM."""
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from rag.resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, DeadlineExceeded, FakeLLM, ResilientLLM
+
+# With this seed and tail_probability=0.5, FakeLLM's first call is slow
+# (tail latency) and its second call is fast
+TAIL_THEN_FAST = 1
+
+class NoBudget:
+    """Rate limiter stand-in that never has budget to spare."""
+
+    def __init__(self):
+        self.asked = 0
+
+    def try_acquire(self, tokens: int) -> float:
+        self.asked += 1
+        return 1.0
+
+def tail_then_fast() -> FakeLLM:
+    return FakeLLM(latency=0.01, tail_probability=0.5, tail_latency=5.0, token_interval=0, seed=TAIL_THEN_FAST)
+
+def first_chunk(llm: ResilientLLM):
+    async def run():
+        async for chunk in llm.astream("question"):
+            return chunk
+    return asyncio.run(run())
+
+def test_breaker_opens_at_the_threshold():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.is_open()
+    assert not breaker.allow()
+
+def test_breaker_probe_success_closes_it():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    breaker.configure(failure_threshold=1, reset_timeout=0)
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    # Only one probe at a time
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.failures == 0
+    assert breaker.allow()
+
+def test_breaker_probe_failure_reopens_it():
+    breaker = CircuitBreaker(failure_threshold=5, reset_timeout=0)
+    for _ in range(5):
+        breaker.record_failure()
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.opens == 2
+
+def test_hedge_beats_a_tail_latency_attempt():
+    llm = ResilientLLM(tail_then_fast(), CircuitBreaker(), deadline=2, hedge_delay=0.05, hedge_min_delay=0.05)
+    started = time.monotonic()
+    chunk = first_chunk(llm)
+
+    assert chunk.content
+    assert time.monotonic() - started < 1
+    stats = llm.stats()
+    assert stats["hedges"] == 1 and stats["hedge_wins"] == 1
+
+def test_hedge_is_skipped_without_rate_limit_budget():
+    limiter = NoBudget()
+    llm = ResilientLLM(tail_then_fast(), CircuitBreaker(), deadline=0.3, hedge_delay=0.05,
+                       hedge_min_delay=0.05, limiter=limiter)
+    with pytest.raises(DeadlineExceeded):
+        first_chunk(llm)
+
+    assert limiter.asked == 1
+    assert llm.stats()["hedges"] == 0
+    assert llm.llm.calls == 1
+
+def test_deadline_is_raised_before_the_first_chunk():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    llm = ResilientLLM(FakeLLM(latency=0.01, tail_probability=1.0, tail_latency=5.0, seed=0), breaker,
+                       deadline=0.1, hedge=False)
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        first_chunk(llm)
+
+    assert time.monotonic() - started < 1
+    assert llm.stats()["deadline_exceeded"] == 1
+    assert breaker.state == OPEN
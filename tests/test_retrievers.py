@@ -0,0 +1,125 @@
+"""Tests for adaptive k, shard routing, rank fusion and the hybrid retriever."""
+from typing import List
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from rag.retrievers import HybridRetriever, ShardRouter, VectorRetriever, adaptive_k, reciprocal_rank_fusion, scored
+
+def doc(text: str, score: float = None) -> Document:
+    chunk = Document(page_content=text, metadata={"source": "guide.txt"})
+    return chunk if score is None else scored(chunk, score)
+
+class FixedRetriever(BaseRetriever):
+    """Retriever returning a fixed ranking."""
+
+    docs: List[Document]
+
+    def _get_relevant_documents(self, query: str, *, run_manager) -> List[Document]:
+        return self.docs
+
+class FixedIndex:
+    """BM25 stand-in returning a fixed ranking."""
+
+    def __init__(self, docs: List[Document]):
+        self.docs = docs
+
+    def get_documents(self, query: str, k: int) -> List[Document]:
+        return self.docs[:k]
+
+class QueryVectors:
+    """Embedding stand-in returning one fixed query vector."""
+
+    def embed_query_array(self, query: str):
+        return [1.0, 0.0]
+
+def test_adaptive_k_drops_results_below_the_threshold():
+    assert adaptive_k([0.8, 0.5, 0.2], max_k=6, threshold=0.3) == 2
+    assert adaptive_k([0.25, 0.2], max_k=6, threshold=0.3) == 0
+    assert adaptive_k([0.9, 0.8, 0.7], max_k=2) == 2
+
+def test_adaptive_k_cuts_at_the_first_large_gap_after_min_k():
+    scores = [0.82, 0.55, 0.53, 0.3]
+    assert adaptive_k(scores, min_k=1, gap=0.2) == 1
+    # The gap right after the first result is ignored when min_k is 2
+    assert adaptive_k(scores, min_k=2, gap=0.2) == 3
+    assert adaptive_k(scores, min_k=1, gap=0.2, threshold=0.9) == 0
+
+def test_vector_retriever_returns_no_context_for_unrelated_questions():
+    results = [(doc("a"), 0.21, None), (doc("b"), 0.18, None)]
+    retriever = VectorRetriever(search=lambda vector, k: results[:k], embeddings=QueryVectors(),
+                                k=6, score_threshold=0.3)
+    assert retriever.invoke("what is the capital of France") == []
+
+class Search:
+    """Search stand-in returning fixed results and counting calls."""
+
+    def __init__(self, *scores):
+        self.results = [(doc(f"chunk {score}"), score, None) for score in scores]
+        self.calls = 0
+
+    def __call__(self, vector, k):
+        self.calls += 1
+        return self.results[:k]
+
+def router(whole: Search, flood: Search, confidence: float = 0.9) -> ShardRouter:
+    return ShardRouter(whole, {"Flood": flood}, lambda query: ("Flood", confidence),
+                       min_confidence=0.6, min_score=0.3)
+
+def test_confident_query_searches_only_its_shard():
+    whole, flood = Search(0.7), Search(0.8)
+    shard_router = router(whole, flood)
+
+    assert shard_router("flood water rising", [1.0], 3)[0][1] == 0.8
+    assert (whole.calls, flood.calls) == (0, 1)
+    assert shard_router.stats()["routed"] == 1
+
+def test_unsure_query_searches_the_whole_index():
+    whole, flood = Search(0.7), Search(0.8)
+    shard_router = router(whole, flood, confidence=0.4)
+
+    assert shard_router("help", [1.0], 3)[0][1] == 0.7
+    assert (whole.calls, flood.calls) == (1, 0)
+    assert shard_router.stats()["unrouted"] == 1
+
+def test_weak_or_empty_shard_results_widen_the_search():
+    for flood in (Search(0.2), Search()):
+        whole = Search(0.7)
+        shard_router = router(whole, flood)
+
+        assert shard_router("flood", [1.0], 3)[0][1] == 0.7
+        assert (whole.calls, flood.calls) == (1, 1)
+        assert shard_router.stats()["widened"] == 1
+
+def test_rrf_rewards_chunks_found_by_both_rankings():
+    vector = [doc("a", 0.9), doc("b", 0.8), doc("c", 0.7)]
+    lexical = [doc("c"), doc("d"), doc("a")]
+    fused = reciprocal_rank_fusion([vector, lexical], k=3, rrf_k=60)
+
+    assert [d.page_content for d in fused] == ["a", "c", "b"]
+    assert fused[0].metadata["rrf_score"] == pytest.approx(1 / 61 + 1 / 63)
+    # The first ranking's copy is kept, cosine score included
+    assert [d.metadata["score"] for d in fused] == [0.9, 0.7, 0.8]
+
+def test_hybrid_keeps_cosine_scores_and_marks_lexical_only_hits():
+    retriever = HybridRetriever(
+        vector_retriever=FixedRetriever(docs=[doc("a", 0.62)]),
+        index=FixedIndex([doc("b"), doc("a")]),
+        k=2, candidates=5,
+    )
+    fused = retriever.invoke("flood now")
+
+    assert {d.page_content: d.metadata.get("score") for d in fused} == {"a": 0.62, "b": None}
+    assert all("rrf_score" in d.metadata for d in fused)
+
+def test_hybrid_returns_nothing_when_no_vector_hit_clears_the_threshold():
+    retriever = HybridRetriever(
+        vector_retriever=FixedRetriever(docs=[]),
+        index=FixedIndex([doc("b"), doc("c")]),
+        k=2, candidates=5,
+    )
+    assert retriever.invoke("what is the capital of France") == []
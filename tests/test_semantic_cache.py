@@ -0,0 +1,60 @@
+"""Tests for the TTL and LRU rules of the semantic answer cache."""
+import numpy as np
+import pytest
+
+from rag import semantic_cache
+from rag.semantic_cache import SemanticCache
+
+class FakeClock:
+    """Stand-in for the ``time`` module."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(semantic_cache, "time", clock)
+    return clock
+
+def axis(i: int, dimension: int = 4) -> np.ndarray:
+    return np.eye(dimension, dtype=np.float32)[i]
+
+def test_similar_query_in_the_same_language_hits(clock):
+    cache = SemanticCache(dimension=4, threshold=0.9)
+    cache.store(axis(0), "English", "Move to higher ground.")
+
+    assert cache.lookup(axis(0) + 0.1 * axis(1), "English") == "Move to higher ground."
+    assert cache.lookup(axis(0), "Urdu") is None
+    assert cache.lookup(axis(1), "English") is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+def test_entries_expire_after_their_ttl(clock):
+    cache = SemanticCache(dimension=4, ttl=60, type_ttls={"emergency": 10, "greeting": 0})
+    cache.store(axis(0), "English", "Call 1122.", "emergency")
+    cache.store(axis(1), "English", "Stay indoors.")
+    cache.store(axis(2), "English", "Hello!", "greeting")
+
+    clock.now += 30
+    assert cache.lookup(axis(0), "English", "emergency") is None
+    assert cache.lookup(axis(1), "English") == "Stay indoors."
+    # A shorter TTL of the asking type applies to an older answer
+    assert cache.lookup(axis(1), "English", "emergency") is None
+    # TTL 0: never stored, never looked up
+    assert cache.lookup(axis(2), "English", "greeting") is None
+    assert cache.stats()["size"] == 1
+
+def test_least_recently_used_answer_is_evicted(clock):
+    cache = SemanticCache(dimension=4, max_entries=2)
+    cache.store(axis(0), "English", "first")
+    cache.store(axis(1), "English", "second")
+    assert cache.lookup(axis(0), "English") == "first"
+
+    cache.store(axis(2), "English", "third")
+    assert cache.lookup(axis(1), "English") is None
+    assert cache.lookup(axis(0), "English") == "first"
+    assert cache.lookup(axis(2), "English") == "third"
+    assert cache.evictions == 1
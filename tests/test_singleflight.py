@@ -0,0 +1,74 @@
+"""Tests for coalescing identical in-flight questions."""
+import asyncio
+
+import pytest
+
+from rag.singleflight import SingleFlight
+
+class Generation:
+    """Token generator counting how often it is started."""
+
+    def __init__(self, tokens, delay: float = 0.01, error: Exception = None):
+        self.tokens = tokens
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        for token in self.tokens:
+            await asyncio.sleep(self.delay)
+            yield token
+        if self.error is not None:
+            raise self.error
+
+async def collect(stream):
+    return [part async for part in stream]
+
+def test_followers_share_one_generation_from_the_first_token():
+    generation = Generation(["Move ", "to ", "higher ", "ground."])
+
+    async def run():
+        flights = SingleFlight()
+        leader = asyncio.ensure_future(collect(flights.stream("flood", generation)))
+        await asyncio.sleep(0.025)
+        # Joins after two tokens and still receives them
+        follower = collect(flights.stream("flood", generation))
+        return await asyncio.gather(leader, follower), flights.stats()
+
+    answers, stats = asyncio.run(run())
+    assert answers[0] == answers[1] == ["Move ", "to ", "higher ", "ground."]
+    assert generation.calls == 1
+    assert stats["leaders"] == 1 and stats["followers"] == 1 and stats["in_flight"] == 0
+
+def test_an_error_reaches_every_subscriber_and_the_next_request_retries():
+    failing = Generation(["Move "], error=RuntimeError("quota exceeded"))
+
+    async def run():
+        flights = SingleFlight()
+        results = await asyncio.gather(
+            collect(flights.stream("flood", failing)),
+            collect(flights.stream("flood", failing)),
+            return_exceptions=True,
+        )
+        retry = await collect(flights.stream("flood", Generation(["Stay safe."])))
+        return results, retry, flights.stats()
+
+    results, retry, stats = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert failing.calls == 1 and stats["errors"] == 1
+    assert retry == ["Stay safe."]
+
+def test_a_timed_out_subscriber_does_not_cancel_the_flight():
+    slow = Generation(["Move ", "to ", "higher ", "ground."], delay=0.03)
+
+    async def run():
+        flights = SingleFlight()
+        patient = asyncio.ensure_future(collect(flights.stream("flood", slow)))
+        with pytest.raises(TimeoutError):
+            await collect(flights.stream("flood", slow, timeout=0.04))
+        return await patient, flights.stats()
+
+    answer, stats = asyncio.run(run())
+    assert answer == ["Move ", "to ", "higher ", "ground."]
+    assert stats["timeouts"] == 1 and slow.calls == 1